@@ -0,0 +1,368 @@
+#######################################
+# Biblioteca
+#######################################
+
+# Manipulação dos dados
+import pandas as pd
+
+# Armazenamento colunar (Parquet / Arrow IPC)
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+# Arquivos
+import os
+import shutil
+import uuid
+
+# Arquivo de funções (ferramentas.py)
+import ferramentas as fr
+
+# Acumuladores combináveis (ingestao.py)
+import ingestao
+
+# Chave inteira da semana (ano * 100 + semana do ano)
+from periodos import COLUNA_DA_SEMANA, semana_do_pedido
+
+# Tipos das colunas do DataFrame limpo
+from esquema import ESQUEMA, aplicar_esquema
+
+# Colunas usadas pelo cubo pré-agregado, pelos esboços de quantis e pelos perfis dos entregadores
+from cubo import DIMENSOES_DO_CUBO, MEDIDAS_DO_CUBO
+from quantis import DIMENSOES_DOS_ESBOCOS, MEDIDAS_DOS_ESBOCOS
+from entregadores import MEDIDAS_DOS_PERFIS, CONTAGENS_DOS_PERFIS, VALORES_DOS_PERFIS
+
+#######################################
+# Configuração
+#######################################
+
+DIRETORIO_DO_DATASET = 'curry_colunar'
+
+# Acumuladores (ingestao.py) dos dados gravados, guardados junto do dataset
+# com a lista dos arquivos de dados que eles contam.
+# O '_' no início faz o pyarrow ignorar o arquivo ao abrir o dataset.
+ARQUIVO_DOS_ACUMULADORES = '_acumuladores.pickle'
+
+# 'parquet' (compactado, lido pelo DuckDB) ou 'ipc' (Arrow/Feather, leitura sem conversão)
+FORMATOS = ['parquet', 'ipc']
+
+# Partições (diretórios no estilo 'coluna=valor'). A semana é a chave criada
+# na limpeza (ano * 100 + semana do ano), então um período vira um intervalo de inteiros.
+ESQUEMA_DAS_PARTICOES = pa.schema([
+  (COLUNA_DA_SEMANA, pa.int32()),
+  ('Tipo de área', pa.string()),
+])
+
+# Colunas lidas por cada função de ferramentas.py que recebe 'df'.
+# As funções que recebem 'cubo' usam 'construir_cubo', e as que recebem
+# 'esbocos' usam 'construir_esbocos'.
+COLUNAS_DAS_ANALISES = {
+  'construir_cubo': DIMENSOES_DO_CUBO + MEDIDAS_DO_CUBO,
+  'construir_esbocos': DIMENSOES_DOS_ESBOCOS + MEDIDAS_DOS_ESBOCOS,
+  'construir_perfis': ['ID do entregador', 'Data do pedido'] + MEDIDAS_DOS_PERFIS + CONTAGENS_DOS_PERFIS + VALORES_DOS_PERFIS,
+  'pedidos_por_entregador_por_semana': ['ID do entregador', 'Semana do pedido'],
+  'localizacao_central_por_area_e_trafego': ['Tipo de área', 'Densidade de tráfego', 'Latitude da entrega', 'Longitude da entrega'],
+  'densidade_dos_pedidos': [
+    'Latitude do restaurante', 'Longitude do restaurante', 'Célula do restaurante',
+    'Latitude da entrega', 'Longitude da entrega', 'Célula da entrega', 'Tempo de entrega (min)'],
+  'quantidade_de_entregadores_por_idade': ['ID do entregador', 'Idade do entregador'],
+  'condicao_veiculos': ['ID do entregador', 'Condição do veículo'],
+  'avaliacao_media_por_entregador': ['ID do entregador', 'Avaliação do entregador'],
+  'ranking_de_entregadores': ['Tipo de área', 'ID do entregador', 'Tempo de entrega (min)'],
+  'tempo_medio_de_entrega_por_idade_do_entregador': ['Idade do entregador', 'Tempo de entrega (min)'],
+  'tempo_medio_de_entrega_por_entregas_multiplas': ['Entregas multiplas', 'Tempo de entrega (min)'],
+  'tempo_medio_de_entrega_por_avaliacao_dos_entregadores': ['Avaliação do entregador', 'Tempo de entrega (min)'],
+  'quantidade_de_entregadores_unicos': ['ID do entregador'],
+  'indicadores_por_restaurante': [
+    'Latitude do restaurante', 'Longitude do restaurante', 'Célula do restaurante', 'ID do entregador',
+    'Distância (km)', 'Tempo de entrega (min)', 'Avaliação do entregador'],
+}
+
+#######################################
+# Gravação
+#######################################
+
+def _tabela_particionada(df):
+  df = df.reset_index(drop=True).assign(**{
+    COLUNA_DA_SEMANA: semana_do_pedido(df['Data do pedido']).to_numpy(),
+    'Tipo de área': df['Tipo de área'].astype('string').to_numpy(),
+  })
+  return pa.Table.from_pandas(df, preserve_index=False)
+
+def _arquivos_de_dados(diretorio, formato):
+  '''
+  Arquivos de dados do dataset (os que o pyarrow lê), relativos ao diretório.
+  '''
+  return sorted(os.path.relpath(arquivo, diretorio) for arquivo in abrir_dataset(diretorio, formato).files)
+
+def _gravar_acumuladores(acumuladores, diretorio, formato):
+  arquivo = os.path.join(diretorio, ARQUIVO_DOS_ACUMULADORES)
+  temporario = '{}.{}.tmp'.format(arquivo, os.getpid())
+  pd.to_pickle(dict(acumuladores, arquivos=_arquivos_de_dados(diretorio, formato)), temporario)
+  os.replace(temporario, arquivo)
+
+def gravar_dataset(df, diretorio=DIRETORIO_DO_DATASET, formato='parquet'):
+  '''
+  Grava o DataFrame limpo (saída de limpeza_dos_dados) particionado por
+  semana do pedido e tipo de área, junto com os seus acumuladores.
+  O dataset é montado em um diretório temporário e trocado de uma vez, para
+  que uma leitura nunca encontre um dataset pela metade.
+  '''
+  if formato not in FORMATOS:
+    raise ValueError('Formato desconhecido: {} (use {})'.format(formato, FORMATOS))
+  tabela = _tabela_particionada(df)
+
+  diretorio = os.path.abspath(diretorio)
+  temporario = '{}.{}.tmp'.format(diretorio, os.getpid())
+  antigo = '{}.{}.antigo'.format(diretorio, os.getpid())
+  shutil.rmtree(temporario, ignore_errors=True)
+  ds.write_dataset(
+    tabela,
+    temporario,
+    format=formato,
+    partitioning=ds.partitioning(ESQUEMA_DAS_PARTICOES, flavor='hive'),
+    existing_data_behavior='error')
+  _gravar_acumuladores(ingestao.agregar_bloco(df), temporario, formato)
+  if os.path.exists(diretorio):
+    os.replace(diretorio, antigo)
+  os.replace(temporario, diretorio)
+  shutil.rmtree(antigo, ignore_errors=True)
+  return diretorio
+
+#######################################
+# Leitura
+#######################################
+# A projeção (colunas) e os filtros são entregues ao pyarrow: filtros sobre
+# as colunas das partições descartam diretórios inteiros sem abri-los, e os
+# demais usam as estatísticas de cada grupo de linhas do Parquet.
+# As linhas voltam agrupadas por partição, e não na ordem do CSV.
+#######################################
+
+def abrir_dataset(diretorio=DIRETORIO_DO_DATASET, formato='parquet'):
+  return ds.dataset(
+    diretorio,
+    format=formato,
+    partitioning=ds.partitioning(ESQUEMA_DAS_PARTICOES, flavor='hive'))
+
+def expressao_dos_filtros(filtros=None, periodo=None):
+  '''
+  Expressão do pyarrow para os filtros da barra lateral
+  ({dimensão: valores selecionados}) e para um período (data inicial, data final).
+  Retorna None quando não há nada a filtrar.
+  '''
+  termos = []
+  for dimensao, valores in (filtros or {}).items():
+    termos.append(pc.field(dimensao).isin([str(valor) for valor in valores]))
+  if periodo is not None:
+    inicio, fim = pd.Series(pd.to_datetime(list(periodo)))
+    semanas = semana_do_pedido(pd.Series([inicio, fim]))
+    # Semanas: descarta as partições fora do período; datas: o corte exato
+    termos.append(pc.field(COLUNA_DA_SEMANA) >= int(semanas[0]))
+    termos.append(pc.field(COLUNA_DA_SEMANA) <= int(semanas[1]))
+    termos.append(pc.field('Data do pedido') >= pa.scalar(inicio, pa.timestamp('ns')))
+    termos.append(pc.field('Data do pedido') <= pa.scalar(fim, pa.timestamp('ns')))
+  if not termos:
+    return None
+  expressao = termos[0]
+  for termo in termos[1:]:
+    expressao = expressao & termo
+  return expressao
+
+def ler_dataset(colunas=None, filtros=None, periodo=None, diretorio=DIRETORIO_DO_DATASET, formato='parquet'):
+  '''
+  Lê do dataset apenas 'colunas' (todas, se None) das linhas que atendem
+  aos filtros, já com os tipos de esquema.py.
+  '''
+  dataset = abrir_dataset(diretorio, formato)
+  if colunas is None:
+    # Na ordem do esquema: as colunas das partições voltam por último do pyarrow
+    colunas = sorted(dataset.schema.names, key=lambda nome: list(ESQUEMA).index(nome) if nome in ESQUEMA else len(ESQUEMA))
+  tabela = dataset.to_table(columns=list(colunas), filter=expressao_dos_filtros(filtros, periodo))
+  return aplicar_esquema(tabela.to_pandas())
+
+def ler_para_analise(nome, filtros=None, periodo=None, diretorio=DIRETORIO_DO_DATASET, formato='parquet'):
+  '''
+  Lê apenas as colunas usadas pela função 'nome' de ferramentas.py
+  (ver COLUNAS_DAS_ANALISES).
+  '''
+  return ler_dataset(COLUNAS_DAS_ANALISES.get(nome), filtros, periodo, diretorio, formato)
+
+#######################################
+# Anexação incremental
+#######################################
+# Um lote novo de pedidos (um dia, uma semana) é limpo sozinho e gravado
+# como arquivos novos dentro das partições; as linhas já gravadas não são
+# lidas de novo, e os acumuladores são combinados com os do lote.
+#######################################
+
+def carregar_acumuladores(diretorio=DIRETORIO_DO_DATASET, formato='parquet'):
+  '''
+  Acumuladores dos dados gravados. São recalculados uma vez a partir do
+  dataset se o arquivo não existir (dataset gravado por outra ferramenta),
+  se for de outra versão do formato (ver ingestao.VERSAO_DOS_ACUMULADORES)
+  ou se os arquivos de dados não forem os que ele conta (ex.: anexar_lote
+  interrompido depois de mover as linhas e antes de gravar os acumuladores).
+  '''
+  arquivo = os.path.join(diretorio, ARQUIVO_DOS_ACUMULADORES)
+  if os.path.exists(arquivo):
+    acumuladores = pd.read_pickle(arquivo)
+    arquivos = acumuladores.pop('arquivos', None)
+    if (acumuladores.get('versao') == ingestao.VERSAO_DOS_ACUMULADORES
+        and arquivos == _arquivos_de_dados(diretorio, formato)):
+      return acumuladores
+  if not os.path.exists(diretorio):
+    return ingestao.novos_acumuladores()
+  acumuladores = ingestao.agregar_bloco(ler_dataset(diretorio=diretorio, formato=formato))
+  _gravar_acumuladores(acumuladores, diretorio, formato)
+  return acumuladores
+
+def _entregas_gravadas(ids, diretorio, formato):
+  '''
+  IDs de 'ids' que já estão no dataset. Lê apenas a coluna de IDs, filtrada.
+  '''
+  if not os.path.exists(diretorio):
+    return set()
+  tabela = abrir_dataset(diretorio, formato).to_table(
+    columns=['ID da entrega'],
+    filter=pc.field('ID da entrega').isin(list(ids)))
+  return set(tabela.column('ID da entrega').to_pylist())
+
+def _anexar_arquivos(tabela, diretorio, formato):
+  '''
+  Grava 'tabela' em um diretório temporário e move cada arquivo para a sua
+  partição no dataset com os.replace, para nunca expor um arquivo pela metade.
+  '''
+  if os.path.exists(diretorio):
+    # Mesmos tipos dos arquivos existentes (ex.: códigos int8 x int16 das categorias)
+    esquema = abrir_dataset(diretorio, formato).schema
+    tabela = tabela.select(esquema.names).cast(esquema)
+  temporario = '{}.{}.lote'.format(os.path.abspath(diretorio), os.getpid())
+  shutil.rmtree(temporario, ignore_errors=True)
+  ds.write_dataset(
+    tabela,
+    temporario,
+    format=formato,
+    partitioning=ds.partitioning(ESQUEMA_DAS_PARTICOES, flavor='hive'),
+    basename_template='lote-{}-{{i}}.{}'.format(uuid.uuid4().hex, 'parquet' if formato == 'parquet' else 'arrow'))
+  for pasta, _, arquivos in os.walk(temporario):
+    destino = os.path.join(diretorio, os.path.relpath(pasta, temporario))
+    os.makedirs(destino, exist_ok=True)
+    for arquivo in arquivos:
+      os.replace(os.path.join(pasta, arquivo), os.path.join(destino, arquivo))
+  shutil.rmtree(temporario, ignore_errors=True)
+
+def anexar_lote(lote, diretorio=DIRETORIO_DO_DATASET, formato='parquet'):
+  '''
+  Anexa ao dataset um lote de pedidos brutos (caminho de um CSV no formato
+  do curry.csv, ou o DataFrame lido por ferramentas.ler_dados).
+  # 1. Limpa apenas as linhas do lote (inclusive o cálculo das distâncias).
+  # 2. Retira as entregas repetidas dentro do lote e as que já estão gravadas.
+  # 3. Grava as linhas novas como arquivos novos nas partições.
+  # 4. Combina os acumuladores gravados com os do lote e os grava com a
+  #    nova lista de arquivos. Se o processo parar entre 3 e 4, a lista não
+  #    bate e carregar_acumuladores os recalcula.
+  Retorna (quantidade de linhas anexadas, acumuladores atualizados).
+  '''
+  if isinstance(lote, str):
+    lote = fr.ler_dados(lote)
+
+  # 1. Limpeza do lote
+  df = fr.limpeza_dos_dados(lote)
+
+  # 2. Entregas repetidas
+  df = df.drop_duplicates(subset='ID da entrega', keep='last')
+  gravadas = _entregas_gravadas(df['ID da entrega'].astype(str), diretorio, formato)
+  if gravadas:
+    df = df[~df['ID da entrega'].isin(gravadas)]
+  acumuladores = carregar_acumuladores(diretorio, formato)
+  if df.empty:
+    return 0, acumuladores
+
+  # 3. Arquivos novos nas partições
+  _anexar_arquivos(_tabela_particionada(df), diretorio, formato)
+
+  # 4. Acumuladores
+  acumuladores = ingestao.combinar_acumuladores(acumuladores, ingestao.agregar_bloco(df))
+  _gravar_acumuladores(acumuladores, diretorio, formato)
+  return len(df), acumuladores
+
+#######################################
+# DuckDB (opcional)
+#######################################
+# O DuckDB lê o mesmo dataset do pyarrow, com a projeção e os filtros
+# empurrados para a leitura, e faz os agrupamentos sem montar um DataFrame
+# com as linhas. Só é importado quando usado: o painel não depende dele.
+#######################################
+
+def _importar_duckdb():
+  try:
+    import duckdb
+  except ImportError as erro:
+    raise ImportError('O motor DuckDB é opcional: instale com "pip install duckdb".') from erro
+  return duckdb
+
+def _nome_sql(coluna):
+  return '"{}"'.format(coluna.replace('"', '""'))
+
+def _dataset_sem_dicionarios(diretorio, formato):
+  # O DuckDB 0.8 lê errado (e às vezes derruba o processo) colunas
+  # dictionary do Arrow divididas em vários lotes, como as categóricas de
+  # um dataset particionado. O pyarrow as entrega como texto na leitura.
+  dataset = abrir_dataset(diretorio, formato)
+  esquema = pa.schema([
+    campo.with_type(campo.type.value_type) if pa.types.is_dictionary(campo.type) else campo
+    for campo in dataset.schema])
+  return ds.dataset(
+    diretorio,
+    schema=esquema,
+    format=formato,
+    partitioning=ds.partitioning(ESQUEMA_DAS_PARTICOES, flavor='hive'))
+
+def consultar_com_duckdb(sql, parametros=None, diretorio=DIRETORIO_DO_DATASET, formato='parquet'):
+  '''
+  Executa 'sql' no DuckDB, com o dataset disponível como a tabela 'pedidos'
+  (as colunas categóricas como texto).
+  '''
+  duckdb = _importar_duckdb()
+  conexao = duckdb.connect()
+  try:
+    conexao.register('pedidos', _dataset_sem_dicionarios(diretorio, formato))
+    return conexao.execute(sql, parametros or []).df()
+  finally:
+    conexao.close()
+
+def agregar_com_duckdb(dimensoes, medida=None, filtros=None, diretorio=DIRETORIO_DO_DATASET, formato='parquet'):
+  '''
+  Mesmo resultado de cubo.agregar: 'Quantidade' de pedidos e, se 'medida'
+  for informada, 'Média' e 'Desvio padrão' (amostral) por 'dimensoes'.
+  Sem dimensões, uma única linha com o total dos pedidos filtrados.
+  '''
+  if isinstance(dimensoes, str):
+    dimensoes = [dimensoes]
+  colunas = ', '.join(_nome_sql(dimensao) for dimensao in dimensoes)
+  agregados = ['count(*) AS "Quantidade"']
+  if medida is not None:
+    agregados.append('avg({0}) AS "Média"'.format(_nome_sql(medida)))
+    agregados.append('stddev_samp({0}) AS "Desvio padrão"'.format(_nome_sql(medida)))
+
+  condicoes = []
+  parametros = []
+  for dimensao, valores in (filtros or {}).items():
+    valores = [str(valor) for valor in valores]
+    if not valores:
+      condicoes.append('false')
+      continue
+    condicoes.append('CAST({} AS VARCHAR) IN ({})'.format(_nome_sql(dimensao), ', '.join('?' * len(valores))))
+    parametros += valores
+  # Linhas com alguma dimensão vazia ficam de fora, como no groupby do pandas
+  condicoes += ['{} IS NOT NULL'.format(_nome_sql(dimensao)) for dimensao in dimensoes]
+
+  sql = 'SELECT {} FROM pedidos WHERE {}'.format(
+    ', '.join(([colunas] if dimensoes else []) + agregados), ' AND '.join(condicoes) or 'true')
+  if dimensoes:
+    sql += ' GROUP BY {}'.format(colunas)
+  df_aux = aplicar_esquema(consultar_com_duckdb(sql, parametros, diretorio, formato))
+  if not dimensoes:
+    return df_aux
+  # Ordem das categorias (esquema.py), e não a ordem alfabética do SQL
+  return df_aux.sort_values(dimensoes).reset_index(drop=True)
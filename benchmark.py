@@ -0,0 +1,306 @@
+#######################################
+# Biblioteca
+#######################################
+
+# Manipulação dos dados
+import numpy as np
+import pandas as pd
+
+# Medições
+import gc
+import time
+import tracemalloc
+
+# Arquivos, linha de comando e resultados
+import argparse
+import inspect
+import json
+import os
+import platform
+import subprocess
+import tempfile
+
+# Arquivo de funções (ferramentas.py) e agregação dos painéis (consultas.py)
+import ferramentas as fr
+import consultas
+
+# Índice dos filtros, cubo pré-agregado, esboços de quantis e perfis dos entregadores
+import indice_de_filtros as indice
+import cubo as cb
+import quantis as qt
+import entregadores as ent
+
+#######################################
+# Configuração
+#######################################
+
+# Tamanhos usados quando nenhum é informado na linha de comando
+LINHAS_PADRAO = [10_000, 100_000]
+
+# Execuções de cada etapa; o tempo registrado é o menor e a mediana
+REPETICOES = 3
+
+# Linhas geradas por vez ao gravar o CSV sintético
+LINHAS_POR_BLOCO = 1_000_000
+
+# Seleção típica da barra lateral usada na etapa de filtros
+FILTROS_DE_EXEMPLO = {
+  'Densidade de tráfego': ['Baixo', 'Médio', 'Alto'],
+  'Tipo de área': ['Metropolitana', 'Urbana'],
+  'Condição climática': ['Ensolarado', 'Nublado', 'Nebuloso', 'Ventoso'],
+  'Festival': ['Não'],
+}
+
+# Argumentos além do 'df'/'cubo'/'esbocos' de algumas funções de análise
+ARGUMENTOS_DAS_ANALISES = {
+  'arquivo_dos_dados_filtrados': ('CSV compactado (gzip)',),
+  # Centro da região dos restaurantes sintéticos
+  'restaurantes_no_raio': (20.0, 80.5, 50.0),
+}
+
+# Funções de ferramentas.py que não são de análise
+FUNCOES_IGNORADAS = ['limpeza_dos_dados']
+
+#######################################
+# Gerador de dados sintéticos
+#######################################
+# Mesmo formato do curry.csv do Kaggle: nomes das colunas em inglês,
+# espaços no fim dos textos, 'NaN ' nas informações faltando, o prefixo
+# 'conditions ' no clima e o tempo como '(min) NN'. Inclui também os
+# valores que a limpeza não traduz (bicycle, condição do veículo 3).
+#######################################
+
+def _com_ausentes(gerador, valores, proporcao, ausente='NaN '):
+  valores = valores.astype(object)
+  valores[gerador.random(len(valores)) < proporcao] = ausente
+  return valores
+
+def _horarios(minutos):
+  tabela = np.array(['{:02d}:{:02d}:00'.format(m // 60, m % 60) for m in range(24 * 60)], dtype=object)
+  return tabela[minutos % (24 * 60)]
+
+def gerar_dados_brutos(linhas, semente=0, inicio=0, proporcao_de_ausentes=0.02):
+  '''
+  DataFrame com 'linhas' pedidos no formato bruto esperado por limpeza_dos_dados.
+  'inicio' é o número do primeiro pedido, para gerar blocos com IDs diferentes.
+  '''
+  gerador = np.random.default_rng(semente)
+  n = linhas
+
+  # Restaurantes fixos (mesma semente = mesmos restaurantes) e entregas ao redor deles
+  restaurantes = np.random.default_rng(0).uniform([9, 72], [31, 89], size=(300, 2))
+  restaurante = gerador.integers(0, len(restaurantes), n)
+  latitude, longitude = restaurantes[restaurante, 0], restaurantes[restaurante, 1]
+
+  # Entregadores: 'INDORES13DEL02' etc., ligados ao restaurante
+  entregadores = np.array(['{}RES{:02d}DEL{:02d} '.format(
+    ['INDO', 'BANG', 'COIMB', 'CHEN', 'HYD', 'RANCHI', 'MYS', 'DEH'][i % 8], i % 20, i % 4)
+    for i in range(1320)], dtype=object)
+
+  datas = pd.Timestamp('2022-02-11') + pd.to_timedelta(gerador.integers(0, 54, n), unit='D')
+  minutos = gerador.integers(8 * 60, 24 * 60, n)
+
+  return pd.DataFrame({
+    'ID': pd.Series(np.arange(inicio, inicio + n)).map('0x{:x} '.format).to_numpy(),
+    'Delivery_person_ID': entregadores[gerador.integers(0, len(entregadores), n)],
+    'Delivery_person_Age': _com_ausentes(gerador, gerador.integers(20, 40, n).astype(str), proporcao_de_ausentes),
+    'Delivery_person_Ratings': _com_ausentes(gerador, np.round(gerador.uniform(2.5, 5, n), 1).astype(str), proporcao_de_ausentes),
+    'Restaurant_latitude': latitude.round(6),
+    'Restaurant_longitude': longitude.round(6),
+    'Delivery_location_latitude': (latitude + gerador.uniform(-0.2, 0.2, n)).round(6),
+    'Delivery_location_longitude': (longitude + gerador.uniform(-0.2, 0.2, n)).round(6),
+    'Order_Date': datas.strftime('%d-%m-%Y'),
+    'Time_Orderd': _com_ausentes(gerador, _horarios(minutos), proporcao_de_ausentes, 'NaN'),
+    'Time_Order_picked': _horarios(minutos + gerador.choice([5, 10, 15], n)),
+    'Weatherconditions': 'conditions ' + gerador.choice(
+      ['Sunny', 'Stormy', 'Sandstorms', 'Cloudy', 'Fog', 'Windy', 'NaN'], n).astype(object),
+    'Road_traffic_density': _com_ausentes(gerador, gerador.choice(['Low ', 'Medium ', 'High ', 'Jam '], n), proporcao_de_ausentes),
+    'Vehicle_condition': gerador.choice([0, 1, 2, 3], n, p=[0.33, 0.33, 0.33, 0.01]),
+    'Type_of_order': gerador.choice(['Snack ', 'Drinks ', 'Buffet ', 'Meal '], n),
+    'Type_of_vehicle': gerador.choice(['motorcycle ', 'scooter ', 'electric_scooter ', 'bicycle '], n, p=[0.58, 0.33, 0.08, 0.01]),
+    'multiple_deliveries': _com_ausentes(gerador, gerador.integers(0, 4, n).astype(str), proporcao_de_ausentes),
+    'Festival': _com_ausentes(gerador, gerador.choice(['No ', 'Yes '], n, p=[0.98, 0.02]), proporcao_de_ausentes),
+    'City': _com_ausentes(gerador, gerador.choice(['Metropolitian ', 'Urban ', 'Semi-Urban '], n, p=[0.75, 0.22, 0.03]), proporcao_de_ausentes),
+    'Time_taken(min)': '(min) ' + gerador.integers(10, 55, n).astype(str).astype(object),
+  })
+
+def gravar_csv_sintetico(caminho, linhas, semente=0, linhas_por_bloco=LINHAS_POR_BLOCO):
+  '''
+  Grava um CSV sintético com 'linhas' pedidos, gerado em blocos para que
+  10 milhões de linhas não precisem caber em memória de uma vez.
+  '''
+  for numero, inicio in enumerate(range(0, linhas, linhas_por_bloco)):
+    bloco = gerar_dados_brutos(min(linhas_por_bloco, linhas - inicio), semente + numero, inicio)
+    bloco.to_csv(caminho, index=False, mode='w' if numero == 0 else 'a', header=numero == 0)
+  return caminho
+
+#######################################
+# Medição
+#######################################
+
+def medir(funcao, *args, repeticoes=REPETICOES, **kwargs):
+  '''
+  Executa 'funcao' 'repeticoes' vezes e uma vez a mais sob o tracemalloc.
+  Retorna o menor tempo, a mediana (em segundos) e o pico de memória
+  alocada (em MB) durante a execução.
+  O tracemalloc vê as alocações do Python e do NumPy (não as do pyarrow), e
+  deixa a execução mais lenta, por isso fica fora das medições de tempo.
+  '''
+  tempos = []
+  gc.collect()
+  for _ in range(repeticoes):
+    inicio = time.perf_counter()
+    funcao(*args, **kwargs)
+    tempos.append(time.perf_counter() - inicio)
+
+  gc.collect()
+  tracemalloc.start()
+  try:
+    funcao(*args, **kwargs)
+    _, pico = tracemalloc.get_traced_memory()
+  finally:
+    tracemalloc.stop()
+
+  return {
+    'segundos': min(tempos),
+    'mediana': float(np.median(tempos)),
+    'pico_de_memoria_mb': pico / 2**20,
+  }
+
+def funcoes_de_analise():
+  '''
+  {nome: função} de todas as funções de ferramentas.py que recebem 'df', 'cubo' ou 'esbocos'
+  (incluindo as tabelas que ferramentas.py importa de consultas.py).
+  '''
+  funcoes = {}
+  for nome, funcao in inspect.getmembers(fr, inspect.isfunction):
+    if funcao.__module__ not in (fr.__name__, consultas.__name__) or nome.startswith('_') or nome in FUNCOES_IGNORADAS:
+      continue
+    parametros = list(inspect.signature(funcao).parameters)
+    if parametros and parametros[0] in ('df', 'cubo', 'esbocos'):
+      funcoes[nome] = funcao
+  return funcoes
+
+def executar(linhas, repeticoes=REPETICOES, semente=0, diretorio=None):
+  '''
+  Mede, para um CSV sintético de 'linhas' pedidos:
+  # 1. A leitura do CSV (ler_dados) e a limpeza (limpeza_dos_dados).
+  # 2. A montagem do índice dos filtros, do cubo, dos esboços e dos perfis, e a aplicação dos filtros.
+  # 3. Cada função de análise de ferramentas.py, sobre os dados filtrados.
+  As funções memorizadas não usam o cache aqui: os DataFrames não têm a
+  impressão digital dos filtros (ver memoizacao.marcar).
+  '''
+  resultados = {}
+  with tempfile.TemporaryDirectory(dir=diretorio) as temporario:
+    caminho = gravar_csv_sintetico(os.path.join(temporario, 'curry.csv'), linhas, semente)
+
+    # 1. Leitura e limpeza
+    resultados['ler_dados'] = medir(fr.ler_dados, caminho, repeticoes=repeticoes)
+    bruto = fr.ler_dados(caminho)
+  resultados['limpeza_dos_dados'] = medir(fr.limpeza_dos_dados, bruto, repeticoes=repeticoes)
+  df = fr.limpeza_dos_dados(bruto)
+  del bruto
+
+  # 2. Filtros, cubo, esboços e perfis
+  resultados['construir_indice'] = medir(indice.construir_indice, df, repeticoes=repeticoes)
+  indice_dos_filtros = indice.construir_indice(df)
+  resultados['filtrar'] = medir(indice.filtrar, df, FILTROS_DE_EXEMPLO, indice_dos_filtros, repeticoes=repeticoes)
+  resultados['construir_cubo'] = medir(cb.construir_cubo, df, repeticoes=repeticoes)
+  cubo = indice.filtrar(cb.construir_cubo(df), FILTROS_DE_EXEMPLO)
+  resultados['construir_esbocos'] = medir(qt.construir_esbocos, df, repeticoes=repeticoes)
+  esbocos = indice.filtrar(qt.construir_esbocos(df), FILTROS_DE_EXEMPLO)
+  resultados['construir_perfis'] = medir(ent.construir_perfis, df, repeticoes=repeticoes)
+  df = indice.filtrar(df, FILTROS_DE_EXEMPLO, indice_dos_filtros)
+
+  # 3. Funções de análise
+  for nome, funcao in funcoes_de_analise().items():
+    dados = {'cubo': cubo, 'esbocos': esbocos}.get(list(inspect.signature(funcao).parameters)[0], df)
+    resultados[nome] = medir(funcao, dados, *ARGUMENTOS_DAS_ANALISES.get(nome, ()), repeticoes=repeticoes)
+
+  return {'linhas': linhas, 'linhas_limpas': len(df), 'etapas': resultados}
+
+#######################################
+# Resultados
+#######################################
+
+def _commit_atual():
+  try:
+    return subprocess.run(
+      ['git', 'rev-parse', '--short', 'HEAD'],
+      cwd=os.path.dirname(os.path.abspath(__file__)),
+      capture_output=True, text=True, check=True).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+def ambiente():
+  return {
+    'commit': _commit_atual(),
+    'data': pd.Timestamp.now().isoformat(timespec='seconds'),
+    'python': platform.python_version(),
+    'pandas': pd.__version__,
+    'numpy': np.__version__,
+    'maquina': platform.platform(),
+  }
+
+def comparar(anterior, atual, limite=1.10):
+  '''
+  Tabela com a razão entre os tempos de 'atual' e 'anterior' (dois JSONs do
+  benchmark) para cada tamanho e etapa. 'Regressão' marca as razões acima de 'limite'.
+  '''
+  linhas = []
+  anteriores = {execucao['linhas']: execucao['etapas'] for execucao in anterior['execucoes']}
+  for execucao in atual['execucoes']:
+    for etapa, medida in execucao['etapas'].items():
+      antes = anteriores.get(execucao['linhas'], {}).get(etapa)
+      if antes is None:
+        continue
+      razao = medida['segundos'] / antes['segundos'] if antes['segundos'] else np.nan
+      linhas.append({
+        'Linhas': execucao['linhas'],
+        'Etapa': etapa,
+        'Anterior (s)': antes['segundos'],
+        'Atual (s)': medida['segundos'],
+        'Razão': razao,
+        'Pico anterior (MB)': antes['pico_de_memoria_mb'],
+        'Pico atual (MB)': medida['pico_de_memoria_mb'],
+        'Regressão': razao > limite,
+      })
+  return pd.DataFrame(linhas)
+
+#######################################
+# Linha de comando
+#######################################
+# python benchmark.py --linhas 10000 1000000 --saida resultados.json
+# python benchmark.py --comparar anterior.json atual.json
+#######################################
+
+def main(argumentos=None):
+  parser = argparse.ArgumentParser(description='Benchmark da limpeza, dos filtros e das funções de análise.')
+  parser.add_argument('--linhas', type=int, nargs='+', default=LINHAS_PADRAO, help='tamanhos dos CSVs sintéticos (10k a 10M)')
+  parser.add_argument('--repeticoes', type=int, default=REPETICOES)
+  parser.add_argument('--semente', type=int, default=0)
+  parser.add_argument('--saida', default='benchmark.json', help='arquivo JSON com os resultados')
+  parser.add_argument('--comparar', nargs=2, metavar=('ANTERIOR', 'ATUAL'), help='compara dois JSONs em vez de medir')
+  argumentos = parser.parse_args(argumentos)
+
+  if argumentos.comparar:
+    medicoes = []
+    for caminho in argumentos.comparar:
+      with open(caminho, encoding='utf-8') as arquivo:
+        medicoes.append(json.load(arquivo))
+    anterior, atual = medicoes
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+      print(comparar(anterior, atual).round(4).to_string(index=False))
+    return
+
+  resultado = {'ambiente': ambiente(), 'repeticoes': argumentos.repeticoes, 'execucoes': []}
+  for linhas in argumentos.linhas:
+    execucao = executar(linhas, argumentos.repeticoes, argumentos.semente)
+    resultado['execucoes'].append(execucao)
+    for etapa, medida in execucao['etapas'].items():
+      print('{:>10} {:<60} {:>9.4f} s {:>9.1f} MB'.format(linhas, etapa, medida['segundos'], medida['pico_de_memoria_mb']))
+  with open(argumentos.saida, 'w', encoding='utf-8') as arquivo:
+    json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,227 @@
+#######################################
+# Biblioteca
+#######################################
+
+# Manipulação dos dados
+import pandas as pd
+
+# Leitura do cache mapeada em memória (Arrow IPC / Feather v2)
+import pyarrow as pa
+
+# Arquivos, hash e reconstrução em segundo plano
+import hashlib
+import logging
+import os
+import threading
+
+# Arquivo de funções (ferramentas.py)
+import ferramentas as fr
+
+# Tipos das colunas do DataFrame limpo
+from esquema import aplicar_esquema, segue_o_esquema
+
+# Limpeza em vários processos para CSVs grandes
+import limpeza_paralela
+
+logger = logging.getLogger(__name__)
+
+#######################################
+# Configuração
+#######################################
+
+DIRETORIO_DO_CACHE = '.cache_dos_dados'
+
+# Tamanho dos blocos lidos para calcular o hash do CSV
+TAMANHO_DO_BLOCO_DE_LEITURA = 1 << 20
+
+# Situações de cada carregamento
+ACERTO_MEMORIA = 'acerto (memória)'
+ACERTO_DISCO = 'acerto (disco)'
+FALHA = 'falha (limpeza refeita)'
+OBSOLETO = 'obsoleto (reconstruindo em segundo plano)'
+
+# Atributo (DataFrame.attrs) com a chave dos dados carregados
+ATRIBUTO_DA_VERSAO = 'versao_dos_dados'
+
+# Atributo (DataFrame.attrs) com o arquivo mapeado de onde vêm as colunas
+ATRIBUTO_DO_ARQUIVO = 'arquivo_dos_dados'
+
+#######################################
+# Estado do processo
+#######################################
+
+# caminho absoluto do CSV -> {'estado': (tamanho, mtime), 'chave': str, 'df': DataFrame}
+_memoria = {}
+# caminho absoluto do CSV -> Thread da reconstrução em andamento
+_reconstrucoes = {}
+_trava = threading.Lock()
+
+#######################################
+# Impressão digital do CSV
+#######################################
+
+def estado_do_arquivo(caminho):
+  '''
+  Retorna (tamanho, mtime) do arquivo, que é barato de obter a cada rerun.
+  '''
+  info = os.stat(caminho)
+  return info.st_size, info.st_mtime_ns
+
+def hash_do_arquivo(caminho):
+  sha = hashlib.sha256()
+  with open(caminho, 'rb') as arquivo:
+    for bloco in iter(lambda: arquivo.read(TAMANHO_DO_BLOCO_DE_LEITURA), b''):
+      sha.update(bloco)
+  return sha.hexdigest()
+
+def impressao_digital(caminho, estado=None):
+  '''
+  Chave do cache: tamanho, mtime e hash do conteúdo do CSV, mais a versão da limpeza.
+  '''
+  tamanho, mtime = estado or estado_do_arquivo(caminho)
+  texto = '{}|{}|{}|v{}'.format(tamanho, mtime, hash_do_arquivo(caminho), fr.VERSAO_DA_LIMPEZA)
+  return hashlib.sha256(texto.encode()).hexdigest()[:16]
+
+#######################################
+# Cache em disco (Feather)
+#######################################
+
+def _prefixo(caminho):
+  return os.path.splitext(os.path.basename(caminho))[0] + '-'
+
+def _arquivo_do_cache(caminho, chave, diretorio):
+  return os.path.join(diretorio, _prefixo(caminho) + chave + '.feather')
+
+#######################################
+# Dados publicados (mapeados em memória)
+#######################################
+# O cache é gravado em Arrow IPC sem compressão, e é lido com mmap: as
+# colunas do DataFrame são visões somente leitura do arquivo, sem cópia.
+# Todas as sessões do Streamlit e todos os processos que abrem o mesmo
+# arquivo compartilham as mesmas páginas do cache do sistema operacional.
+# Cada versão dos dados tem o seu arquivo (a chave faz parte do nome), então
+# quem ainda usa a versão anterior continua lendo o arquivo antigo.
+#######################################
+
+def abrir_mapeado(arquivo):
+  '''
+  Abre um arquivo publicado como DataFrame somente leitura, sem copiar as colunas.
+  Pode ser chamado de outros processos com o valor de df.attrs[ATRIBUTO_DO_ARQUIVO].
+  '''
+  tabela = pa.ipc.open_file(pa.memory_map(arquivo, 'r')).read_all()
+  df = tabela.to_pandas(
+    split_blocks=True,
+    types_mapper={pa.string(): pd.StringDtype('pyarrow')}.get)
+  # Arquivos antigos (comprimidos ou de outro esquema) ainda são aceitos, com cópia
+  if not segue_o_esquema(df):
+    df = aplicar_esquema(df)
+  df.attrs[ATRIBUTO_DO_ARQUIVO] = os.path.abspath(arquivo)
+  return df
+
+def _ler_do_disco(caminho, chave, diretorio):
+  arquivo = _arquivo_do_cache(caminho, chave, diretorio)
+  if not os.path.exists(arquivo):
+    return None
+  return abrir_mapeado(arquivo)
+
+def _gravar_no_disco(df, caminho, chave, diretorio):
+  os.makedirs(diretorio, exist_ok=True)
+  arquivo = _arquivo_do_cache(caminho, chave, diretorio)
+  # Grava em um arquivo temporário e troca de uma vez, para nunca expor um arquivo pela metade
+  temporario = '{}.{}.tmp'.format(arquivo, os.getpid())
+  # Sem compressão, para que o arquivo possa ser mapeado em memória sem cópia
+  df.reset_index(drop=True).to_feather(temporario, compression='uncompressed')
+  os.replace(temporario, arquivo)
+  # Remove as versões anteriores do mesmo CSV. No Linux/macOS quem ainda as
+  # tem mapeadas continua lendo normalmente; no Windows a remoção fica para depois.
+  for nome in os.listdir(diretorio):
+    if nome.startswith(_prefixo(caminho)) and nome.endswith('.feather') and os.path.join(diretorio, nome) != arquivo:
+      try:
+        os.remove(os.path.join(diretorio, nome))
+      except OSError:
+        logger.debug('Versão anterior %s ainda em uso', nome)
+  return arquivo
+
+#######################################
+# Carregamento
+#######################################
+
+def _guardar_na_memoria(caminho, estado, chave, df):
+  # A chave acompanha o DataFrame, para identificar a versão dos dados sem olhar o conteúdo
+  df.attrs[ATRIBUTO_DA_VERSAO] = chave
+  with _trava:
+    _memoria[caminho] = {'estado': estado, 'chave': chave, 'df': df}
+
+def _limpar(caminho):
+  # CSVs grandes (backfills) são limpos em paralelo, com o mesmo resultado
+  if os.path.getsize(caminho) >= limpeza_paralela.TAMANHO_PARA_PARALELO and limpeza_paralela.PROCESSOS > 1:
+    # O dashboard roda em um servidor com várias threads: um fork copiaria
+    # travas seguradas por outras threads, então os processos são novos
+    return limpeza_paralela.limpar_em_paralelo(caminho, contexto='spawn')
+  return fr.limpeza_dos_dados(fr.ler_dados(caminho))
+
+def _reconstruir(caminho, estado, chave, diretorio):
+  try:
+    arquivo = _gravar_no_disco(_limpar(caminho), caminho, chave, diretorio)
+    _guardar_na_memoria(caminho, estado, chave, abrir_mapeado(arquivo))
+    logger.info('Cache de %s reconstruído (chave %s)', caminho, chave)
+  except Exception:
+    logger.exception('Falha ao reconstruir o cache de %s', caminho)
+  finally:
+    with _trava:
+      _reconstrucoes.pop(caminho, None)
+
+def carregar_dados_limpos(caminho, diretorio=DIRETORIO_DO_CACHE):
+  '''
+  Retorna (df, situacao) com o DataFrame limpo do CSV 'caminho'.
+  # 1. Se o arquivo não mudou (tamanho e mtime), devolve o DataFrame da memória.
+  # 2. Caso contrário calcula a chave (com o hash do conteúdo) e procura no disco.
+  # 3. Se a chave mudou e já existe uma versão anterior na memória, devolve a anterior
+  #    e reconstrói em segundo plano.
+  # 4. Sem nenhuma versão disponível, refaz a limpeza e grava no disco.
+  # O DataFrame devolvido é sempre a versão mapeada do arquivo (ver abrir_mapeado).
+  '''
+  caminho = os.path.abspath(caminho)
+  estado = estado_do_arquivo(caminho)
+
+  # 1. Memória
+  with _trava:
+    entrada = _memoria.get(caminho)
+  if entrada is not None and entrada['estado'] == estado:
+    logger.debug('Cache de %s: %s', caminho, ACERTO_MEMORIA)
+    return entrada['df'], ACERTO_MEMORIA
+
+  # Uma reconstrução já está em andamento, evita recalcular o hash a cada rerun
+  with _trava:
+    reconstruindo = caminho in _reconstrucoes
+  if entrada is not None and reconstruindo:
+    return entrada['df'], OBSOLETO
+
+  # 2. Disco
+  chave = impressao_digital(caminho, estado)
+  df = _ler_do_disco(caminho, chave, diretorio)
+  if df is not None:
+    _guardar_na_memoria(caminho, estado, chave, df)
+    logger.info('Cache de %s: %s', caminho, ACERTO_DISCO)
+    return df, ACERTO_DISCO
+
+  # 3. Versão anterior + reconstrução em segundo plano
+  if entrada is not None:
+    thread = threading.Thread(
+      target=_reconstruir, args=(caminho, estado, chave, diretorio), daemon=True)
+    with _trava:
+      iniciar = caminho not in _reconstrucoes
+      if iniciar:
+        _reconstrucoes[caminho] = thread
+    if iniciar:
+      thread.start()
+    logger.info('Cache de %s: %s', caminho, OBSOLETO)
+    return entrada['df'], OBSOLETO
+
+  # 4. Nenhuma versão disponível
+  # O DataFrame limpo é descartado: as sessões usam a versão mapeada do arquivo
+  arquivo = _gravar_no_disco(_limpar(caminho), caminho, chave, diretorio)
+  df = abrir_mapeado(arquivo)
+  _guardar_na_memoria(caminho, estado, chave, df)
+  logger.info('Cache de %s: %s', caminho, FALHA)
+  return df, FALHA
@@ -0,0 +1,359 @@
+#######################################
+# Biblioteca
+#######################################
+
+# Manipulação dos dados
+import pandas as pd
+
+# Cubo pré-agregado (cubo.py)
+from cubo import agregar
+
+# Esboços de quantis (medianas e percentis) por grupo (quantis.py)
+from quantis import agregar_esbocos, nome_do_quantil
+
+# Chaves inteiras de tempo (dia, semana, hora) e séries temporais
+import periodos
+
+# Grade espacial das coordenadas (mapas de calor e de agrupamentos)
+import grade_espacial as grade
+
+# Dimensão dos restaurantes e buscas por raio (restaurantes.py)
+import restaurantes as rs
+
+# Perfis dos entregadores (entregadores.py) e a seleção sem filtros (indice_de_filtros.py)
+import entregadores as ent
+import indice_de_filtros as indice
+
+# Cache dos resultados das funções de consulta
+from memoizacao import memorizar
+
+#######################################
+# Consultas
+#######################################
+# Empresa / Entregador / Restaurante
+#######################################
+# A agregação de cada painel do dashboard, sem o Plotly e sem o folium:
+# cada função devolve a tabela (ou o valor) que o painel mostra, com as
+# mesmas colunas. ferramentas.py desenha os gráficos e os mapas a partir
+# destas tabelas; o serviço (servico.py), o relatório e os scripts usam as
+# consultas diretamente. A numeração segue as opções das abas.
+# Como em ferramentas.py, as funções recebem 'cubo', 'esbocos' ou 'df' e
+# @memorizar guarda o resultado por seleção de filtros (memoizacao.py).
+#######################################
+
+#######################################
+# Empresa
+#######################################
+
+# 1. Quantidade de pedidos por dia.
+@memorizar
+def pedidos_por_dia(cubo):
+  return agregar(cubo, 'Data do pedido').rename(columns={'Quantidade':'ID da entrega'})
+
+# 2. Quantidade de pedidos por semana
+@memorizar
+def pedidos_por_semana(cubo):
+  # Pedidos de cada dia do cubo, somados pela semana do ano
+  return periodos.contar_por_periodo(cubo, 'semana', pesos='Quantidade').rename(columns={'Quantidade':'ID da entrega'})
+
+# 3. Distribuição dos pedidos por tipo de área.
+@memorizar
+def pedidos_por_tipo_de_area(cubo):
+  return agregar(cubo, 'Tipo de área').rename(columns={'Quantidade':'ID da entrega'})
+
+# 4. Distribuição dos pedidos por densidade de tráfego.
+@memorizar
+def pedidos_por_tipo_de_trafego(cubo):
+  return agregar(cubo, 'Densidade de tráfego').rename(columns={'Quantidade':'ID da entrega'})
+
+# 5. Comparação do volume de pedidos por tipo de área e de tráfego.
+@memorizar
+def pedidos_por_tipo_de_area_e_tipo_de_trafego(cubo):
+  # Só as combinações com pedidos, como o groupby original: valores retirados pelos filtros não viram barras vazias
+  df_aux = agregar(cubo, ['Densidade de tráfego','Tipo de área']).rename(columns={'Quantidade':'ID da entrega'})
+  # O Plotly agrupa as colunas categóricas por todas as categorias, então as sem pedidos também saem
+  for coluna in ['Densidade de tráfego','Tipo de área']:
+    if isinstance(df_aux[coluna].dtype, pd.CategoricalDtype):
+      df_aux[coluna] = df_aux[coluna].cat.remove_unused_categories()
+  return df_aux
+
+# 6. A quantidade de pedidos por entregador por semana.
+@memorizar
+def pedidos_por_entregador_por_semana(df):
+  # Contando o número de entregas por semana (chave da semana criada na limpeza, sem alterar o df)
+  A = periodos.contar_por_periodo(df, 'semana').rename(columns={'Quantidade':'ID da entrega'})
+  # Contando o número de entregadores únicos por semana
+  B = periodos.distintos_por_periodo(df, 'ID do entregador', 'semana').rename(columns={'Quantidade':'ID do entregador'})
+  # Fazendo um join entre os dataframes A e B, com base na coluna 'Semana'
+  df_aux = pd.merge(A,B, how = 'inner')
+  # Criando uma nova coluna 'Pedido por entregador', que indica a média de entregas por entregador em cada semana
+  df_aux['Pedido por entregador'] = df_aux['ID da entrega'] / df_aux['ID do entregador']
+  return df_aux
+
+# 7. A localização central de cada tipo de área por densidade de tráfego.
+@memorizar
+def localizacao_central_por_area_e_trafego(df):
+  df_aux = df.loc[:,['Tipo de área', 'Densidade de tráfego', 'Latitude da entrega', 'Longitude da entrega']].groupby(['Tipo de área','Densidade de tráfego'], observed=True).median().reset_index()
+  return df_aux.dropna()
+
+# 8. A densidade dos pedidos no mapa (mapa de calor ou agrupamentos).
+# Os pontos são agregados por célula da grade espacial (grade_espacial.py),
+# no nível que corresponde ao zoom e só dentro dos limites visíveis: o mapa
+# enviado ao navegador cresce com as células na tela, não com as linhas.
+ZOOM_INICIAL = 5
+# Máximo de células por modo: cada agrupamento vira um marcador no HTML,
+# bem mais pesado que um ponto do mapa de calor
+MODOS_DO_MAPA = {
+  'Mapa de calor': grade.LIMITE_DE_CELULAS,
+  'Agrupamentos': 400,
+}
+
+@memorizar
+def celulas_no_mapa(df, local='entrega', zoom=ZOOM_INICIAL, limites=None, modo='Mapa de calor'):
+  df_aux, nivel = grade.agregar_celulas(
+    df, local, grade.nivel_para_zoom(zoom), limites,
+    medida='Tempo de entrega (min)', limite_de_celulas=MODOS_DO_MAPA[modo])
+  df_aux.attrs['nivel'] = nivel
+  return df_aux
+
+#######################################
+# Entregador
+#######################################
+# Sem nenhum filtro ativo (a seleção tem todas as linhas carregadas), os
+# painéis 1. a 3. e 6. e 7. e a quantidade de entregadores únicos dos
+# Restaurantes saem dos perfis dos entregadores (entregadores.py), montados
+# uma vez por carga dos dados; com filtros, agrupam as linhas selecionadas.
+#######################################
+
+def _perfis_sem_filtro(df):
+  origem = indice.origem_sem_filtro(df)
+  if origem is None:
+    return None
+  return ent.obter_perfis(origem, tabela=False)
+
+# Pedidos de cada entregador (linhas) por valor de 'coluna' (colunas, no tipo de df[coluna]),
+# só com os valores que têm pedidos, como o groupby(observed=True)
+def _contagens_dos_perfis(perfis, df, coluna):
+  prefixo = ent.coluna_da_contagem(coluna, '')
+  colunas = [nome for nome in perfis.columns if nome.startswith(prefixo)]
+  valores = [nome[len(prefixo):] for nome in colunas]
+  if isinstance(df[coluna].dtype, pd.CategoricalDtype):
+    valores = pd.CategoricalIndex(valores, dtype=df[coluna].dtype)
+  else:
+    valores = pd.Index(pd.to_numeric(valores).astype(df[coluna].dtype))
+  contagens = perfis[colunas].set_axis(valores.rename(coluna), axis=1)
+  return contagens.loc[:, contagens.sum().to_numpy() > 0].sort_index(axis=1)
+
+# 1. A quantidade de entregadores por idade.
+@memorizar
+def quantidade_de_entregadores_por_idade(df):
+  perfis = _perfis_sem_filtro(df)
+  if perfis is not None:
+    return (_contagens_dos_perfis(perfis, df, 'Idade do entregador') > 0).sum().rename('ID do entregador').reset_index()
+  return df.loc[:,['ID do entregador','Idade do entregador']].groupby('Idade do entregador', observed=True).nunique().reset_index()
+
+# 2. A pior e a melhor condição de veículos.
+@memorizar
+def condicao_veiculos(df):
+  perfis = _perfis_sem_filtro(df)
+  if perfis is not None:
+    return (_contagens_dos_perfis(perfis, df, 'Condição do veículo') > 0).sum().rename('ID do entregador').reset_index()
+  return df.loc[:, ['ID do entregador', 'Condição do veículo'] ].groupby('Condição do veículo', observed=True).nunique().reset_index()
+
+# 3. Quantidade de entregadores por avaliação.
+@memorizar
+def avaliacao_media_por_entregador(df):
+  perfis = _perfis_sem_filtro(df)
+  if perfis is not None:
+    df_aux = _contagens_dos_perfis(perfis, df, 'Avaliação do entregador').sum().rename('ID do entregador')
+    return df_aux.sort_index(ascending=False).reset_index()
+  return df.loc[:,['ID do entregador','Avaliação do entregador']].groupby('Avaliação do entregador', observed=True).count().sort_values(by='Avaliação do entregador', ascending=False).reset_index()
+
+# 4. A avaliação média e o desvio padrão por densidade de tráfego.
+@memorizar
+def avaliacao_media_e_desvio_padrao_por_tipo_de_trafego(esbocos):
+  df_aux = agregar_esbocos(esbocos, 'Densidade de tráfego', 'Avaliação do entregador')
+  df_aux = df_aux[['Densidade de tráfego','Média','Mediana','Desvio padrão']]
+  df_aux.columns=['Densidade de tráfego','Avaliação média do entregador','Mediana','Desvio padrão (min)']
+  df_aux.index +=1
+  return df_aux
+
+# 5. A avaliação média e o desvio padrão por condições climáticas.
+@memorizar
+def avaliacao_media_e_desvio_padrao_por_condicao_climatica(esbocos):
+  df_aux = agregar_esbocos(esbocos, 'Condição climática', 'Avaliação do entregador')
+  df_aux = df_aux[['Condição climática','Média','Mediana','Desvio padrão']]
+  df_aux.columns=['Condição climática','Avaliação média do entregador','Mediana','Desvio padrão (min)']
+  df_aux.index +=1
+  return df_aux
+
+# 6. e 7. Os entregadores mais rápidos e mais lentos por tipo de área.
+# Uma única passada agrupa por (tipo de área, entregador); a seleção dos N
+# primeiros e dos N últimos de cada área é parcial (nsmallest/nlargest).
+@memorizar
+def ranking_de_entregadores(df, n=10, minimo_de_entregas=1):
+  perfis = _perfis_sem_filtro(df)
+  if perfis is not None:
+    # Pedidos e soma do tempo por (tipo de área, entregador), nos perfis
+    entregas = _contagens_dos_perfis(perfis, df, 'Tipo de área')
+    somas = perfis[[ent.coluna_da_soma_por_area(area) for area in entregas.columns]].set_axis(entregas.columns, axis=1)
+    df_aux = pd.DataFrame({'soma': somas.T.stack(), 'size': entregas.T.stack()})
+    df_aux = df_aux[df_aux['size'] > 0]
+    df_aux = pd.DataFrame({'mean': df_aux['soma'] / df_aux['size'], 'size': df_aux['size']})
+  else:
+    df_aux = df.groupby(['Tipo de área','ID do entregador'], observed=True)['Tempo de entrega (min)'].agg(['mean','size'])
+  # Ignora entregadores com poucas entregas, que dominariam o ranking
+  df_aux = df_aux[df_aux['size'] >= minimo_de_entregas]
+  rankings = []
+  for area, grupo in df_aux.groupby(level='Tipo de área', observed=True):
+    for ordem, selecao in (('Mais rápidos', grupo.nsmallest(n, 'mean')), ('Mais lentos', grupo.nlargest(n, 'mean'))):
+      rankings.append(pd.DataFrame({
+        'Tipo de área': area,
+        'Ordem': ordem,
+        'Posição': range(1, len(selecao) + 1),
+        'ID do entregador': selecao.index.get_level_values('ID do entregador').astype(str),
+        'Tempo de entrega (min)': selecao['mean'].astype(int).to_numpy(),
+        'Entregas': selecao['size'].to_numpy(),
+      }))
+  colunas = ['Tipo de área','Ordem','Posição','ID do entregador','Tempo de entrega (min)','Entregas']
+  if not rankings:
+    return pd.DataFrame(columns=colunas)
+  return pd.concat(rankings, ignore_index=True)
+
+# Tabela de uma área e de uma ordem ('Mais rápidos' ou 'Mais lentos'), numerada a partir de 1
+def top_entregadores(ranking, area, ordem):
+  df_aux = ranking[(ranking['Tipo de área'] == area) & (ranking['Ordem'] == ordem)]
+  df_aux = df_aux.loc[:,['ID do entregador','Tempo de entrega (min)']].reset_index(drop=True)
+  df_aux.index += 1
+  return df_aux
+
+# 8. a 11. e 15. Tempo médio das entregas por uma dimensão do cubo, em minutos inteiros
+def _tempo_medio_no_cubo(cubo, dimensao, ordenar=True):
+  df_aux = agregar(cubo, dimensao, 'Tempo de entrega (min)')
+  df_aux['Tempo de entrega (min)'] = df_aux['Média'].astype(int)
+  df_aux = df_aux.loc[:,[dimensao,'Tempo de entrega (min)']]
+  if ordenar:
+    df_aux = df_aux.sort_values(by='Tempo de entrega (min)',ascending=True)
+  return df_aux.reset_index(drop=True)
+
+# 8. Tempo médio das entregas por densidade de tráfego
+@memorizar
+def tempo_medio_por_tipo_de_trafego(cubo):
+  return _tempo_medio_no_cubo(cubo, 'Densidade de tráfego')
+
+# 9. Tempo médio das entregas por tipo de área
+@memorizar
+def tempo_medio_das_entregas_por_tipo_de_area(cubo):
+  return _tempo_medio_no_cubo(cubo, 'Tipo de área')
+
+# 10. Tempo médio de entrega por tipo de veículo
+@memorizar
+def tempo_medio_de_entrega_por_tipo_de_veiculo(cubo):
+  return _tempo_medio_no_cubo(cubo, 'Tipo de veículo', ordenar=False)
+
+# 11. Tempo médio de entrega por condição do veículo
+@memorizar
+def tempo_medio_de_entrega_por_condicao_do_veiculo(cubo):
+  return _tempo_medio_no_cubo(cubo, 'Condição do veículo', ordenar=False)
+
+# 12. Tempo médio de entrega por idade do entregador
+@memorizar
+def tempo_medio_de_entrega_por_idade_do_entregador(df):
+  return df.loc[:,['Idade do entregador','Tempo de entrega (min)']].groupby('Idade do entregador', observed=True).mean().astype(int).reset_index()
+
+# 13. Tempo médio de entrega por entregas multiplas.
+@memorizar
+def tempo_medio_de_entrega_por_entregas_multiplas(df):
+  return df.loc[:,['Entregas multiplas','Tempo de entrega (min)']].groupby('Entregas multiplas', observed=True).mean().astype(int).sort_values(by='Tempo de entrega (min)',ascending=True).reset_index()
+
+# 14. Tempo médio de entrega por avaliação dos entregadores.
+@memorizar
+def tempo_medio_de_entrega_por_avaliacao_dos_entregadores(df):
+  return df.loc[:,['Avaliação do entregador','Tempo de entrega (min)']].groupby('Avaliação do entregador', observed=True).mean().astype(int).reset_index()
+
+# 15. Tempo médio de entrega por condição climática.
+@memorizar
+def tempo_medio_de_entrega_por_condicao_climatica(cubo):
+  return _tempo_medio_no_cubo(cubo, 'Condição climática')
+
+#######################################
+# Restaurante
+#######################################
+
+# 1. A quantidade de entregadores únicos.
+@memorizar
+def quantidade_de_entregadores_unicos(df):
+  perfis = _perfis_sem_filtro(df)
+  if perfis is not None:
+    return len(perfis)
+  return df['ID do entregador'].nunique()
+
+# 2. A distância média dos resturantes e dos locais de entrega.
+@memorizar
+def distancia_media_dos_restaurantes_e_dos_locais_de_entrega(esbocos):
+    df_aux = agregar_esbocos(esbocos, [], 'Distância (km)').loc[0, ['Média', 'Mediana', 'Desvio padrão']]
+    df_aux = df_aux.astype(float).round(3).rename('Distância (km)')
+    df_aux = df_aux.rename(index={'Desvio padrão': 'Desvio Padrão'}).reset_index()
+    df_aux = df_aux.rename(columns={'index': 'Estatística'})
+    df_aux.index += 1
+    return df_aux
+
+# 3. a 7. O tempo médio, a mediana e o desvio padrão de entrega por uma dimensão dos esboços
+def _tempo_medio_e_desvio_padrao(esbocos, dimensao):
+  df_aux = agregar_esbocos(esbocos, dimensao, 'Tempo de entrega (min)')
+  df_aux = pd.concat([df_aux[dimensao], df_aux[['Média','Mediana','Desvio padrão']].round(3).astype(int)], axis=1)
+  df_aux.columns=[dimensao,'Tempo médio de entrega (min)','Mediana','Desvio padrão']
+  df_aux.index += 1
+  return df_aux
+
+# 3. O tempo médio e o desvio padrão de entrega por tipo de área.
+@memorizar
+def tempo_medio_e_desvio_padrao_por_tipo_de_area(esbocos):
+  return _tempo_medio_e_desvio_padrao(esbocos, 'Tipo de área')
+
+# 4. O tempo médio e o desvio padrão de entrega por tipo de pedido.
+@memorizar
+def tempo_medio_e_desvio_padrao_por_tipo_de_pedido(esbocos):
+  return _tempo_medio_e_desvio_padrao(esbocos, 'Tipo de pedido')
+
+# 5. O tempo médio e o desvio padrão de entrega por densidade de tráfego.
+@memorizar
+def tempo_medio_e_desvio_padrao_por_tipo_de_trafego(esbocos):
+  return _tempo_medio_e_desvio_padrao(esbocos, 'Densidade de tráfego')
+
+# 6. O tempo médio e desvio padrão de entrega durantes os Festivais.
+@memorizar
+def tempo_medio_e_desvio_padrao_durante_o_festival(esbocos):
+  return _tempo_medio_e_desvio_padrao(esbocos, 'Festival')
+
+# 7. O tempo médio e o desvio padrão de entrega por condições climáticas.
+@memorizar
+def tempo_medio_e_desvio_padrao_por_condicao_climatica(esbocos):
+  return _tempo_medio_e_desvio_padrao(esbocos, 'Condição climática')
+
+# 8. Os percentis do tempo de entrega por densidade de tráfego.
+# A cauda (p90/p99) mostra os atrasos que a média esconde.
+@memorizar
+def percentis_do_tempo_de_entrega_por_tipo_de_trafego(esbocos, quantis=(0.5, 0.9, 0.99)):
+  df_aux = agregar_esbocos(esbocos, 'Densidade de tráfego', 'Tempo de entrega (min)', quantis)
+  nomes = [nome_do_quantil(q) for q in quantis]
+  df_aux = pd.concat([df_aux[['Densidade de tráfego', 'Quantidade']], df_aux[nomes].round(1)], axis=1)
+  df_aux.columns = ['Densidade de tráfego', 'Quantidade de pedidos'] + ['{} (min)'.format(nome) for nome in nomes]
+  df_aux.index += 1
+  return df_aux
+
+# 9. Os indicadores de cada restaurante.
+@memorizar
+def indicadores_por_restaurante(df):
+  return rs.construir_restaurantes(df)
+
+# Índice espacial dos restaurantes da seleção, guardado pela impressão digital dos filtros
+@memorizar
+def _indice_dos_restaurantes(df):
+  return rs.indice_dos_restaurantes(indicadores_por_restaurante(df))
+
+# 10. Os restaurantes a até 'raio_km' de um ponto, com os seus indicadores.
+@memorizar
+def restaurantes_no_raio(df, latitude, longitude, raio_km=rs.RAIO_PADRAO):
+  return rs.restaurantes_no_raio(
+    indicadores_por_restaurante(df), latitude, longitude, raio_km, _indice_dos_restaurantes(df))
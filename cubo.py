@@ -0,0 +1,117 @@
+#######################################
+# Biblioteca
+#######################################
+
+# Manipulação dos dados
+import numpy as np
+import pandas as pd
+
+# Cubo guardado por DataFrame carregado
+import threading
+import weakref
+
+#######################################
+# Configuração
+#######################################
+
+# Dimensões do cubo: os filtros da barra lateral e as colunas agrupadas pelos gráficos
+DIMENSOES_DO_CUBO = [
+  'Densidade de tráfego',
+  'Tipo de área',
+  'Condição climática',
+  'Festival',
+  'Tipo de veículo',
+  'Tipo de pedido',
+  'Condição do veículo',
+  'Data do pedido',
+]
+
+# Medidas com soma e soma dos quadrados em cada célula
+MEDIDAS_DO_CUBO = [
+  'Tempo de entrega (min)',
+  'Avaliação do entregador',
+  'Distância (km)',
+]
+
+def coluna_da_soma(medida):
+  return 'Soma: ' + medida
+
+def coluna_da_soma_dos_quadrados(medida):
+  return 'Soma dos quadrados: ' + medida
+
+#######################################
+# Construção do cubo
+#######################################
+# Uma linha por combinação de valores das dimensões que existe nos dados,
+# com a quantidade de pedidos e, para cada medida, a soma e a soma dos
+# quadrados. Linhas com alguma dimensão vazia (NaN) também formam células,
+# para que os totais das demais dimensões continuem iguais aos das linhas.
+#######################################
+
+def construir_cubo(df, dimensoes=DIMENSOES_DO_CUBO, medidas=MEDIDAS_DO_CUBO):
+  categorias = {dimensao: pd.Categorical(df[dimensao]) for dimensao in dimensoes}
+  # Agrupa pelos códigos inteiros das categorias (NaN = -1)
+  chaves = [categorias[dimensao].codes for dimensao in dimensoes]
+
+  valores = {'Quantidade': np.ones(len(df), dtype=np.int64)}
+  for medida in medidas:
+    x = df[medida].to_numpy(dtype=np.float64)
+    valores[coluna_da_soma(medida)] = x
+    valores[coluna_da_soma_dos_quadrados(medida)] = x * x
+  celulas = pd.DataFrame(valores).groupby(chaves, sort=False).sum()
+
+  cubo = {}
+  for i, dimensao in enumerate(dimensoes):
+    codigos = celulas.index.get_level_values(i).to_numpy()
+    original = df[dimensao]
+    if isinstance(original.dtype, pd.CategoricalDtype):
+      cubo[dimensao] = pd.Categorical.from_codes(codigos, dtype=original.dtype)
+    else:
+      cubo[dimensao] = pd.Categorical.from_codes(codigos, categorias[dimensao].categories).astype(original.dtype)
+  for coluna in celulas.columns:
+    cubo[coluna] = celulas[coluna].to_numpy()
+  return pd.DataFrame(cubo)
+
+_cubos = {}
+_trava = threading.Lock()
+
+def obter_cubo(df):
+  '''
+  Devolve o cubo de 'df', construindo-o apenas na primeira vez que o
+  DataFrame é visto. O cubo é descartado junto com o DataFrame.
+  '''
+  chave = id(df)
+  with _trava:
+    entrada = _cubos.get(chave)
+  if entrada is not None and entrada[0]() is df:
+    return entrada[1]
+  cubo = construir_cubo(df)
+  with _trava:
+    _cubos[chave] = (weakref.ref(df, lambda _: _cubos.pop(chave, None)), cubo)
+  return cubo
+
+#######################################
+# Consulta ao cubo
+#######################################
+
+def agregar(cubo, dimensoes, medida=None, observed=True):
+  '''
+  Soma as células do cubo por 'dimensoes' (roll-up).
+  Retorna a 'Quantidade' de pedidos e, se 'medida' for informada, a 'Média'
+  e o 'Desvio padrão' (amostral, como o pandas) da medida em cada grupo.
+  '''
+  colunas = ['Quantidade']
+  if medida is not None:
+    soma = coluna_da_soma(medida)
+    soma_dos_quadrados = coluna_da_soma_dos_quadrados(medida)
+    colunas += [soma, soma_dos_quadrados]
+  df_aux = cubo.groupby(dimensoes, observed=observed)[colunas].sum()
+  if medida is not None:
+    n = df_aux['Quantidade']
+    with np.errstate(invalid='ignore', divide='ignore'):
+      media = df_aux[soma] / n
+      variancia = (df_aux[soma_dos_quadrados] - df_aux[soma] * media) / (n - 1)
+    df_aux['Média'] = media
+    df_aux['Desvio padrão'] = np.sqrt(variancia.clip(lower=0))
+    df_aux = df_aux.drop(columns=[soma, soma_dos_quadrados])
+  return df_aux.reset_index()
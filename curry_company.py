@@ -2,313 +2,553 @@
 # Bibliotecas
 ################################################
 
-# Manipulação dos dados
-import pandas as pd
+# O plotly, o folium e o streamlit_folium só são importados quando um
+# gráfico ou o mapa é desenhado (ver ferramentas.py e a aba 1. Empresa).
 
-# Gráficos
-import plotly.express as px
+# Arquivo de funções (ferramentas.py)
+import ferramentas
 
-# Mapa
-import folium
+# Tempo, linhas e memória de cada etapa da execução (instrumentacao.py)
+import instrumentacao as inst
 
-# Arquivo de funções (ferramentas.py)
-import ferramentas as fr
+# Cache dos dados limpos (cache_dos_dados.py)
+import cache_dos_dados as cache
 
-# Streamlit para visualização web
-import streamlit as st
-from streamlit_folium import folium_static
+# Índice dos filtros da barra lateral (indice_de_filtros.py)
+import indice_de_filtros as indice
 
-################################################
-# Upload e limpeza dos dados
-################################################
+# Cubo pré-agregado (cubo.py)
+import cubo as cb
 
-df = pd.read_csv('curry.csv')
-df = fr.limpeza_dos_dados(df)
+# Grade espacial do mapa de densidade (grade_espacial.py)
+import grade_espacial as grade
 
-################################################
-# Streamlit Configuração da Página
-################################################
+# Esboços de quantis por grupo (quantis.py)
+import quantis as qt
 
-st.set_page_config(
-    page_title="Curry Company", 
-    page_icon="🛵", 
-    menu_items=None,
-    layout="wide"
-    )
+# Perfis dos entregadores (entregadores.py)
+import entregadores as ent
 
-################################################
-# Streamlit Sidebar
-################################################
-# Logo da empresa
-################################################
+# Dimensão dos restaurantes e buscas por raio (restaurantes.py)
+import restaurantes as rs
 
-st.sidebar.image('logo.png', width=300)
-st.sidebar.write('---')
+# Cache dos resultados das funções de análise (memoizacao.py)
+import memoizacao as memo
 
-################################################
+# Painéis pré-calculados pelo relatório (paineis.py e relatorio.py)
+import paineis
+
+# Streamlit para visualização web
+import streamlit as st
 
 ################################################
-# Filtros:
-################################################
-# 1. Densidade de tráfego
-# 2. Tipo de área
-# 3. Condição climática  
+# Instrumentação
 ################################################
+# Cada chamada a uma função de ferramentas.py é medida como uma etapa.
+# O perfil (cProfile/pyinstrument) é pedido no painel de depuração e
+# cobre uma única execução.
+fr = inst.cronometrar_modulo(ferramentas, 'ferramentas')
+try:
+    perfil = inst.iniciar_perfil(st.session_state.pop('perfilar', None))
+except ImportError as erro:
+    # Perfilador opcional que deixou de estar instalado: o erro aparece no painel de depuração
+    perfil = None
+    st.session_state['relatorio_do_perfil'] = str(erro)
+inst.iniciar_execucao()
+# Uma exceção ou um st.experimental_rerun() no meio da página não pode deixar
+# a execução aberta nem o perfilador ligado na thread do script
+try:
+    ################################################
+    # Upload e limpeza dos dados
+    ################################################
+
+    # A limpeza só é refeita quando o CSV ou a versão da limpeza mudam
+    with inst.etapa('carregar_dados_limpos', 'carga') as medida:
+        df, situacao_do_cache = cache.carregar_dados_limpos('curry.csv')
+        medida['linhas'] = len(df)
+        medida['detalhe'] = situacao_do_cache
+
+    ################################################
+    # Streamlit Configuração da Página
+    ################################################
+
+    st.set_page_config(
+        page_title="Curry Company", 
+        page_icon="🛵", 
+        menu_items=None,
+        layout="wide"
+        )
+
+    ################################################
+    # Streamlit Sidebar
+    ################################################
+    # Logo da empresa
+    ################################################
+
+    st.sidebar.image('logo.png', width=300)
+    st.sidebar.write('---')
+
+    ################################################
+
+    ################################################
+    # Filtros:
+    ################################################
+    # 1. Densidade de tráfego
+    # 2. Tipo de área
+    # 3. Condição climática  
+    # 4. Festival
+    ################################################
+    # As opções (todas selecionadas no início) vêm de paineis.OPCOES_DOS_FILTROS,
+    # as mesmas do relatório e do serviço.
+    opcoes = paineis.OPCOES_DOS_FILTROS
+
+    # 1. Densidade de tráfego
+    filtro_de_trafego = st.sidebar.multiselect(
+        'Densidade de tráfego:',
+        opcoes['Densidade de tráfego'],
+        default=opcoes['Densidade de tráfego'])
+
+    # 2. Tipo de área
+    filtro_de_area = st.sidebar.multiselect(
+        'Tipo de área:',
+        opcoes['Tipo de área'],
+        default=opcoes['Tipo de área'])
+
+    # 3. Condição climática
+    filtro_de_clima = st.sidebar.multiselect(
+        'Condição climática:',
+        opcoes['Condição climática'],
+        default=opcoes['Condição climática'])
+
+    # 4. Festival
+    filtro_de_festival = st.sidebar.multiselect(
+        'Festival:',
+        opcoes['Festival'],
+        default=opcoes['Festival'])
+
+
+    # Filtrando o DataFrame
+    # O índice é montado uma vez por carga dos dados; cada seleção combina os
+    # bitmaps dos valores escolhidos e copia o DataFrame uma única vez.
+    filtros = {
+        'Densidade de tráfego': filtro_de_trafego,
+        'Tipo de área': filtro_de_area,
+        'Condição climática': filtro_de_clima,
+        'Festival': filtro_de_festival,
+    }
+    # O cubo e os esboços de quantis também são montados uma vez por carga e
+    # filtrados pelas mesmas dimensões
+    with inst.etapa('filtros', 'filtros', len(df)) as medida:
+        cubo = indice.filtrar(cb.obter_cubo(df), filtros)
+        esbocos = indice.filtrar(qt.obter_esbocos(df), filtros)
+        # Os perfis dos entregadores cobrem todos os pedidos (ver a opção 16. dos Entregadores)
+        perfis = ent.obter_perfis(df)
+        # Assim como a dimensão dos restaurantes (ver a opção 10. dos Restaurantes)
+        restaurantes = rs.obter_restaurantes(df)
+        # As buscas por raio usam os índices espaciais do DataFrame carregado
+        df_carregado = df
+        df = indice.filtrar(df, filtros)
+        medida['detalhe'] = '{} linhas selecionadas'.format(len(df))
+
+    # Impressão digital da seleção, usada como chave pelas funções memorizadas
+    chave_dos_filtros = memo.impressao_dos_filtros(df.attrs.get(cache.ATRIBUTO_DA_VERSAO), filtros)
+    memo.marcar(cubo, chave_dos_filtros)
+    memo.marcar(esbocos, chave_dos_filtros)
+    memo.marcar(df, chave_dos_filtros)
+
+    # Painéis já calculados por relatorio.py para esta seleção e esta versão dos
+    # dados são lidos do disco; os demais (e os mapas) são calculados na hora
+    fr = paineis.com_artefatos(fr, chave_dos_filtros)
+
+    ################################################################
+    # Botão de Download
+    ################################################################
+    # O arquivo só é gerado depois do clique em 'Gerar arquivo', a partir dos
+    # dados já carregados (sem acesso à rede), e fica guardado até a seleção mudar.
+    st.sidebar.write('---')
+    dados_do_download = st.sidebar.radio(
+        'Download dos dados',
+        ['Filtrados (limpos)', 'Originais (curry.csv)'])
+    formato_do_download = st.sidebar.selectbox('Formato do arquivo', list(fr.FORMATOS_DE_DOWNLOAD))
+    pedido_de_download = (dados_do_download, formato_do_download, chave_dos_filtros)
+
+    if st.sidebar.button('Gerar arquivo'):
+        st.session_state['pedido_de_download'] = pedido_de_download
+
+    if st.session_state.get('pedido_de_download') == pedido_de_download:
+        extensao, tipo_mime = fr.FORMATOS_DE_DOWNLOAD[formato_do_download]
+        if dados_do_download == 'Originais (curry.csv)':
+            arquivo = fr.arquivo_original('curry.csv', formato_do_download)
+            nome_do_arquivo = 'curry' + extensao
+        else:
+            arquivo = fr.arquivo_dos_dados_filtrados(df, formato_do_download)
+            nome_do_arquivo = 'curry_filtrado' + extensao
+        st.sidebar.download_button(
+            label="Download do arquivo ({})".format(nome_do_arquivo),
+            data=arquivo,
+            file_name=nome_do_arquivo,
+            mime=tipo_mime
+        )
+
+    ################################################
+    # Visão geral
+    ################################################
+    # A última opção de cada aba mostra todos os painéis juntos. Os painéis
+    # são calculados em paralelo (paineis.calcular_em_paralelo) e cada um é
+    # desenhado no seu lugar assim que fica pronto.
+    ################################################
+
+    VISAO_GERAL = 'Visão geral: todos os painéis.'
+
+    def desenhar_painel(lugar, painel, resultado):
+        if painel['tipo'] == 'grafico':
+            lugar.plotly_chart(resultado, use_container_width=True)
+        elif painel['tipo'] == 'tabela':
+            lugar.dataframe(resultado, use_container_width=True)
+        elif painel['tipo'] == 'valor':
+            lugar.header(resultado)
+        else:
+            from streamlit_folium import folium_static
+            with lugar.container():
+                folium_static(resultado, width=500, height=400)
+
+    def mostrar_visao_geral(aba):
+        selecionados = [painel for painel in paineis.PAINEIS if painel['aba'] == aba]
+        # Um lugar reservado por painel, em duas colunas, na ordem das opções
+        colunas = st.columns(2)
+        lugares = {}
+        for posicao, painel in enumerate(selecionados):
+            with colunas[posicao % 2]:
+                st.markdown('**{}. {}**'.format(painel['opcao'], painel['titulo']))
+                lugares[painel['funcao']] = st.empty()
+                lugares[painel['funcao']].caption('Calculando...')
+        dados = {'df': df, 'cubo': cubo, 'esbocos': esbocos}
+        with inst.etapa('visao_geral', 'paineis', len(df)) as medida:
+            for painel, resultado, erro in paineis.calcular_em_paralelo(fr, selecionados, dados):
+                if erro is not None:
+                    lugares[painel['funcao']].error('Falha ao calcular o painel: {}'.format(erro))
+                else:
+                    desenhar_painel(lugares[painel['funcao']], painel, resultado)
+            medida['detalhe'] = '{} painéis'.format(len(selecionados))
+
+    ################################################
+    # PÁGINA
+    ################################################
+    # 1. Empresa
+    # 2. Entregadores
+    # 3. Restaurantes
+    ################################################
+
+    # Título
+    st.markdown('# Dashboard de Análise de Dados')
+   
+    #Criando as 3 abas 
+    tab1, tab2, tab3 = st.tabs([
+        '**1. Empresa**',
+        '**2. Entregadores**',
+        '**3. Restaurantes**'
+    ])
+
+    #######################################
+    # 1. Empresa
+    #######################################
+    # 1. Quantidade de pedidos por dia.
+    # 2. Quantidade de pedidos por semana.
+    # 3. Distribuição dos pedidos por tipo de área.
+    # 4. Distribuição dos pedidos por densidade de tráfego.
+    # 5. Comparação do volume de pedidos por tipo de área e densidade de tráfego.
+    # 6. A quantidade de pedidos por entregador por semana.
+    # 7. A localização central de cada tipo de área por densidade de tráfego.
+    # 8. A densidade dos pedidos no mapa.
+    # Visão geral: todos os painéis.
+    #######################################
+    with tab1:
+        opcao = st.selectbox(
+            'Escolha o que deseja ver:',(
+                '1. Quantidade de pedidos por dia.',
+                '2. Quantidade de pedidos por semana.',
+                '3. Distribuição dos pedidos por tipo de área.',
+                '4. Distribuição dos pedidos por densidade de tráfego.',
+                '5. Comparação do volume de pedidos por tipo de área e densidade de tráfego.',
+                '6. A quantidade de pedidos por entregador por semana.',
+                '7. A localização central de cada tipo de área por densidade de tráfego.',
+                '8. A densidade dos pedidos no mapa.',
+                VISAO_GERAL))
+    
+        if opcao == VISAO_GERAL:
+            mostrar_visao_geral('Empresa')
+
+        elif opcao == '1. Quantidade de pedidos por dia.':
+            st.plotly_chart( fr.pedidos_por_dia(cubo), ue_container_width=True)
+
+        elif opcao == '2. Quantidade de pedidos por semana.':
+            st.plotly_chart( fr.pedidos_por_semana(cubo), ue_container_width=True)
+
+        elif opcao == '3. Distribuição dos pedidos por tipo de área.':
+            st.plotly_chart( fr.pedidos_por_tipo_de_area(cubo), ue_container_width=True) 
+
+        elif opcao == '4. Distribuição dos pedidos por densidade de tráfego.':
+            st.plotly_chart( fr.pedidos_por_tipo_de_trafego(cubo), ue_container_width=True)    
+
+        elif opcao == '5. Comparação do volume de pedidos por tipo de área e densidade de tráfego.':
+            st.plotly_chart( fr.pedidos_por_tipo_de_area_e_tipo_de_trafego(cubo), ue_container_width=True)
+
+        elif opcao == '6. A quantidade de pedidos por entregador por semana.':
+            st.plotly_chart( fr.pedidos_por_entregador_por_semana(df), ue_container_width=True)
+
+        elif opcao == '7. A localização central de cada tipo de área por densidade de tráfego.':
+            from streamlit_folium import folium_static
+            mapa = fr.localizacao_central_por_area_e_trafego(df)
+            with inst.etapa('folium_static', 'folium'):
+                folium_static( mapa )
+
+        elif opcao == '8. A densidade dos pedidos no mapa.':
+            from streamlit_folium import st_folium
+            col1, col2 = st.columns(2)
+            modo = col1.radio('Modo do mapa', list(fr.MODOS_DO_MAPA), horizontal=True)
+            local = col2.radio(
+                'Pontos', list(grade.COORDENADAS), horizontal=True,
+                format_func={'entrega': 'Locais de entrega', 'restaurante': 'Restaurantes'}.get)
+
+            # O zoom e os limites já enviados ficam na sessão. O mapa só é refeito
+            # quando o zoom muda ou quando a área visível sai desses limites.
+            vista = st.session_state.setdefault('vista_do_mapa', {'zoom': fr.ZOOM_INICIAL, 'limites': None, 'centro': None})
+            mapa = fr.densidade_dos_pedidos(df, modo, local, vista['zoom'], vista['limites'], vista['centro'])
+            with inst.etapa('st_folium', 'folium'):
+                saida = st_folium(
+                    mapa, key='densidade_dos_pedidos', zoom=vista['zoom'], center=vista['centro'],
+                    width=700, height=500, returned_objects=['zoom', 'bounds'])
+            celulas = fr.celulas_no_mapa(df, local, vista['zoom'], vista['limites'], modo)
+            st.caption('{} células no nível {} da grade.'.format(len(celulas), celulas.attrs['nivel']))
+
+            limites = (saida or {}).get('bounds') or {}
+            sudoeste, nordeste = limites.get('_southWest') or {}, limites.get('_northEast') or {}
+            if saida and saida.get('zoom') is not None and sudoeste.get('lat') is not None and nordeste.get('lat') is not None:
+                visiveis = (sudoeste['lat'], sudoeste['lng'], nordeste['lat'], nordeste['lng'])
+                if saida['zoom'] != vista['zoom'] or not grade.contem(vista['limites'], visiveis):
+                    vista.update(
+                        zoom=saida['zoom'],
+                        limites=grade.ampliar_limites(visiveis),
+                        centro=[(visiveis[0] + visiveis[2]) / 2, (visiveis[1] + visiveis[3]) / 2])
+                    st.experimental_rerun()
+
+    #######################################
+    # 2. Entregador
+    #######################################
+    # 1. A quantidade de entregadores por idade.
+    # 2. A quantidade de veículos em cada condição.
+    # 3. A avaliação médida por entregador.
+    # 4. A avaliação média e o desvio padrão por densidade de tráfego.
+    # 5. A avaliação média e o desvio padrão por condições climáticas.
+    # 6. Os entregadores mais rápidos por tipo de área.
+    # 7. Os entregadores mais lentos por tipo de área.
+    # 8. Tempo médio das entregas por densidade de tráfego.
+    # 9. Tempo médio das entregas por tipo de área.
+    # 10. Tempo médio de entrega por tipo de veículo.
+    # 11. Tempo médio de entrega por condição do veículo.
+    # 12. Tempo médio de entrega por idade do entregador.
+    # 13. Tempo médio de entrega por entregas multiplas.
+    # 14. Tempo médio de entrega por avaliação dos entregadores.
+    # 15. Tempo médio de entrega por condição climática.
+    # 16. O perfil de um entregador.
+    # Visão geral: todos os painéis.
+    #######################################
+    with tab2:
+        opcao = st.selectbox(
+            'Escolha o que deseja ver:',(
+                '1. A quantidade de entregadores por idade.',
+                '2. A quantidade de veículos em cada condição.',
+                '3. A avaliação média por entregador.',
+                '4. A avaliação média e o desvio padrão por densidade de tráfego.',
+                '5. A avaliação média e o desvio padrão por condições climáticas.',
+                '6. Os entregadores mais rápidos por tipo de área.',
+                '7. Os entregadores mais lentos por tipo de área.',
+                '8. Tempo médio das entregas por densidade de tráfego.',
+                '9. Tempo médio das entregas por tipo de área.',
+                '10. Tempo médio de entrega por tipo de veículo.',
+                '11. Tempo médio de entrega por condição do veículo.',
+                '12. Tempo médio de entrega por idade do entregador.',
+                '13. Tempo médio de entrega por entregas multiplas.',
+                '14. Tempo médio de entrega por avaliação dos entregadores.',
+                '15. Tempo médio de entrega por condição climática.',
+                '16. O perfil de um entregador.',
+                VISAO_GERAL
+                ))
+    
+        if opcao == VISAO_GERAL:
+            mostrar_visao_geral('Entregadores')
 
-# 1. Densidade de tráfego
-filtro_de_trafego = st.sidebar.multiselect(
-    'Densidade de tráfego:',
-    ['Baixo','Médio','Alto','Engarrafado'],
-    default=['Baixo','Médio','Alto','Engarrafado'])
+        elif opcao == '1. A quantidade de entregadores por idade.':
+                st.plotly_chart( fr.quantidade_de_entregadores_por_idade(df), ue_container_width=True)
 
-# 2. Tipo de área
-filtro_de_area = st.sidebar.multiselect(
-    'Tipo de área:',
-    ['Urbana','Semi-urbana','Metropolitana'],
-    default=['Urbana','Semi-urbana','Metropolitana'])
+        elif opcao == '2. A quantidade de veículos em cada condição.':
+            st.plotly_chart( fr.condicao_veiculos(df), ue_container_width=True)
 
-# 3. Condição climática
-filtro_de_clima = st.sidebar.multiselect(
-    'Condição climática:',
-    ['Ensolarado','Nublado','Nebuloso','Ventoso','Tempestuoso','Tempestades de areia'],
-    default=['Ensolarado','Nublado','Nebuloso','Ventoso','Tempestuoso','Tempestades de areia'])
+        elif opcao == '3. A avaliação média por entregador.':
+            st.plotly_chart( fr.avaliacao_media_por_entregador(df), ue_container_width=True)
 
-# 4. Festival
-filtro_de_festival = st.sidebar.multiselect(
-    'Festival:',
-    ['Sim','Não'],
-    default=['Sim','Não'])
+        elif opcao == '4. A avaliação média e o desvio padrão por densidade de tráfego.':
+            st.table( fr.avaliacao_media_e_desvio_padrao_por_tipo_de_trafego(esbocos) ) 
 
+        elif opcao == '5. A avaliação média e o desvio padrão por condições climáticas.':
+            st.table( fr.avaliacao_media_e_desvio_padrao_por_condicao_climatica(esbocos))    
 
-# Filtrando o DataFrame
-linhas_filtradas = df['Densidade de tráfego'].isin( filtro_de_trafego )
-df = df.loc[ linhas_filtradas, : ]
+        elif opcao in ('6. Os entregadores mais rápidos por tipo de área.', '7. Os entregadores mais lentos por tipo de área.'):
+            ordem = 'Mais rápidos' if opcao.startswith('6.') else 'Mais lentos'
+            col1, col2 = st.columns(2, gap='small')
+            with col1:
+                n = st.number_input('Quantidade de entregadores:', min_value=1, max_value=100, value=10)
+            with col2:
+                minimo = st.number_input('Mínimo de entregas por entregador:', min_value=1, value=1)
+            ranking = fr.ranking_de_entregadores(df, n=int(n), minimo_de_entregas=int(minimo))
+            col1, col2, col3 = st.columns(3, gap='small')
+            for coluna, area in zip((col1, col2, col3), ('Urbana', 'Semi-urbana', 'Metropolitana')):
+                with coluna:
+                    st.table( fr.top_entregadores(ranking, area, ordem).rename(columns={'ID do entregador':area}) )
 
-linhas_filtradas = df['Tipo de área'].isin( filtro_de_area )
-df = df.loc[ linhas_filtradas, : ]
+        elif opcao == '8. Tempo médio das entregas por densidade de tráfego.':
+            st.plotly_chart( fr.tempo_medio_por_tipo_de_trafego(cubo), ue_container_width=True)
 
-linhas_filtradas = df['Condição climática'].isin( filtro_de_clima )
-df = df.loc[ linhas_filtradas, : ]
+        elif opcao == '9. Tempo médio das entregas por tipo de área.':
+            st.plotly_chart( fr.tempo_medio_das_entregas_por_tipo_de_area(cubo), ue_container_width=True) 
 
-linhas_filtradas = df['Festival'].isin( filtro_de_festival )
-df = df.loc[ linhas_filtradas, : ]
+        elif opcao == '10. Tempo médio de entrega por tipo de veículo.':
+            st.plotly_chart( fr.tempo_medio_de_entrega_por_tipo_de_veiculo(cubo), ue_container_width=True)    
 
-################################################################
-# Botão de Download
-################################################################
-st.sidebar.write('---')
-url = "https://raw.githubusercontent.com/CassioCandidoRibeiro/curry_company/main/curry.csv"
-arquivo = fr.download_csv(url)
-st.sidebar.download_button(
-    label="Download do arquivo (.csv) utlizado",
-    data=arquivo,
-    file_name="curry.csv",
-    mime="text/csv"
-)
+        elif opcao == '11. Tempo médio de entrega por condição do veículo.':
+            st.plotly_chart( fr.tempo_medio_de_entrega_por_condicao_do_veiculo(cubo), ue_container_width=True)
 
-################################################
-# PÁGINA
-################################################
-# 1. Empresa
-# 2. Entregadores
-# 3. Restaurantes
-################################################
+        elif opcao == '12. Tempo médio de entrega por idade do entregador.':
+            st.plotly_chart( fr.tempo_medio_de_entrega_por_idade_do_entregador(df), ue_container_width=True)
 
-# Título
-st.markdown('# Dashboard de Análise de Dados')
-   
-#Criando as 3 abas 
-tab1, tab2, tab3 = st.tabs([
-    '**1. Empresa**',
-    '**2. Entregadores**',
-    '**3. Restaurantes**'
-])
-
-#######################################
-# 1. Empresa
-#######################################
-# 1. Quantidade de pedidos por dia.
-# 2. Quantidade de pedidos por semana.
-# 3. Distribuição dos pedidos por tipo de área.
-# 4. Distribuição dos pedidos por densidade de tráfego.
-# 5. Comparação do volume de pedidos por tipo de área e densidade de tráfego.
-# 6. A quantidade de pedidos por entregador por semana.
-# 7. A localização central de cada tipo de área por densidade de tráfego.
-#######################################
-with tab1:
-    opcao = st.selectbox(
-        'Escolha o que deseja ver:',(
-            '1. Quantidade de pedidos por dia.',
-            '2. Quantidade de pedidos por semana.',
-            '3. Distribuição dos pedidos por tipo de área.',
-            '4. Distribuição dos pedidos por densidade de tráfego.',
-            '5. Comparação do volume de pedidos por tipo de área e densidade de tráfego.',
-            '6. A quantidade de pedidos por entregador por semana.',
-            '7. A localização central de cada tipo de área por densidade de tráfego.'))
-    
-    if opcao == '1. Quantidade de pedidos por dia.':
-        st.plotly_chart( fr.pedidos_por_dia(df), ue_container_width=True)
-
-    elif opcao == '2. Quantidade de pedidos por semana.':
-        st.plotly_chart( fr.pedidos_por_semana(df), ue_container_width=True)
-
-    elif opcao == '3. Distribuição dos pedidos por tipo de área.':
-        st.plotly_chart( fr.pedidos_por_tipo_de_area(df), ue_container_width=True) 
-
-    elif opcao == '4. Distribuição dos pedidos por densidade de tráfego.':
-        st.plotly_chart( fr.pedidos_por_tipo_de_trafego(df), ue_container_width=True)    
-
-    elif opcao == '5. Comparação do volume de pedidos por tipo de área e densidade de tráfego.':
-        st.plotly_chart( fr.pedidos_por_tipo_de_area_e_tipo_de_trafego(df), ue_container_width=True)
-
-    elif opcao == '6. A quantidade de pedidos por entregador por semana.':
-        st.plotly_chart( fr.pedidos_por_entregador_por_semana(df), ue_container_width=True)
-
-    elif opcao == '7. A localização central de cada tipo de área por densidade de tráfego.':
-        folium_static( fr.localizacao_central_por_area_e_trafego(df) )
-
-#######################################
-# 2. Entregador
-#######################################
-# 1. A quantidade de entregadores por idade.
-# 2. A quantidade de veículos em cada condição.
-# 3. A avaliação médida por entregador.
-# 4. A avaliação média e o desvio padrão por densidade de tráfego.
-# 5. A avaliação média e o desvio padrão por condições climáticas.
-# 6. Os 10 entregadores mais rápidos por tipo de área.
-# 7. Os 10 entregadores mais lentos por tipo de área.
-# 8. Tempo médio das entregas por densidade de tráfego.
-# 9. Tempo médio das entregas por tipo de área.
-# 10. Tempo médio de entrega por tipo de veículo.
-# 11. Tempo médio de entrega por condição do veículo.
-# 12. Tempo médio de entrega por idade do entregador.
-# 13. Tempo médio de entrega por entregas multiplas.
-# 14. Tempo médio de entrega por avaliação dos entregadores.
-# 15. Tempo médio de entrega por condição climática.
-#######################################
-with tab2:
-    opcao = st.selectbox(
-        'Escolha o que deseja ver:',(
-            '1. A quantidade de entregadores por idade.',
-            '2. A quantidade de veículos em cada condição.',
-            '3. A avaliação média por entregador.',
-            '4. A avaliação média e o desvio padrão por densidade de tráfego.',
-            '5. A avaliação média e o desvio padrão por condições climáticas.',
-            '6. Os 10 entregadores mais rápidos por tipo de área.',
-            '7. Os 10 entregadores mais lentos por tipo de área.',
-            '8. Tempo médio das entregas por densidade de tráfego.',
-            '9. Tempo médio das entregas por tipo de área.',
-            '10. Tempo médio de entrega por tipo de veículo.',
-            '11. Tempo médio de entrega por condição do veículo.',
-            '12. Tempo médio de entrega por idade do entregador.',
-            '13. Tempo médio de entrega por entregas multiplas.',
-            '14. Tempo médio de entrega por avaliação dos entregadores.',
-            '15. Tempo médio de entrega por condição climática.'
-            ))
-    
-    if opcao == '1. A quantidade de entregadores por idade.':
-            st.plotly_chart( fr.quantidade_de_entregadores_por_idade(df), ue_container_width=True)
-
-    elif opcao == '2. A quantidade de veículos em cada condição.':
-        st.plotly_chart( fr.condicao_veiculos(df), ue_container_width=True)
-
-    elif opcao == '3. A avaliação média por entregador.':
-        st.plotly_chart( fr.avaliacao_media_por_entregador(df), ue_container_width=True)
-
-    elif opcao == '4. A avaliação média e o desvio padrão por densidade de tráfego.':
-        st.table( fr.avaliacao_media_e_desvio_padrao_por_tipo_de_trafego(df) ) 
-
-    elif opcao == '5. A avaliação média e o desvio padrão por condições climáticas.':
-        st.table( fr.avaliacao_media_e_desvio_padrao_por_condicao_climatica(df))    
-
-    elif opcao == '6. Os 10 entregadores mais rápidos por tipo de área.':
-        col1, col2, col3 = st.columns(3, gap='small')
-        with col1:
-            st.table( fr.top10_entregadores_mais_rapidos_urbana(df).rename(columns={'ID do entregador':'Urbana'}) )
-        with col2:
-            st.table( fr.top10_entregadores_mais_rapidos_semi_urbana(df).rename(columns={'ID do entregador':'Semi-urbana'}) )
-        with col3:
-            st.table( fr.top10_entregadores_mais_rapidos_metropolitana(df).rename(columns={'ID do entregador':'Metropolitana'}) )
-        
-    elif opcao == '7. Os 10 entregadores mais lentos por tipo de área.':
-        col1, col2, col3 = st.columns(3, gap='small')
-        with col1:
-            st.table( fr.top10_entregadores_mais_lentos_urbana(df).rename(columns={'ID do entregador':'Urbana'}) )
-        with col2:
-            st.table( fr.top10_entregadores_mais_lentos_semi_urbana(df).rename(columns={'ID do entregador':'Semi-urbana'}) )
-        with col3:
-            st.table( fr.top10_entregadores_mais_lentos_metropolitana(df).rename(columns={'ID do entregador':'Metropolitana'}) )
-
-    elif opcao == '8. Tempo médio das entregas por densidade de tráfego.':
-        st.plotly_chart( fr.tempo_medio_por_tipo_de_trafego(df), ue_container_width=True)
-
-    elif opcao == '9. Tempo médio das entregas por tipo de área.':
-        st.plotly_chart( fr.tempo_medio_das_entregas_por_tipo_de_area(df), ue_container_width=True) 
-
-    elif opcao == '10. Tempo médio de entrega por tipo de veículo.':
-        st.plotly_chart( fr.tempo_medio_de_entrega_por_tipo_de_veiculo(df), ue_container_width=True)    
-
-    elif opcao == '11. Tempo médio de entrega por condição do veículo.':
-        st.plotly_chart( fr.tempo_medio_de_entrega_por_condicao_do_veiculo(df), ue_container_width=True)
-
-    elif opcao == '12. Tempo médio de entrega por idade do entregador.':
-        st.plotly_chart( fr.tempo_medio_de_entrega_por_idade_do_entregador(df), ue_container_width=True)
-
-    elif opcao == '13. Tempo médio de entrega por entregas multiplas.':
-        st.plotly_chart( fr.tempo_medio_de_entrega_por_entregas_multiplas(df), ue_container_width=True)
-
-    elif opcao == '14. Tempo médio de entrega por avaliação dos entregadores.':
-        st.plotly_chart( fr.tempo_medio_de_entrega_por_avaliacao_dos_entregadores(df), ue_container_width=True)
+        elif opcao == '13. Tempo médio de entrega por entregas multiplas.':
+            st.plotly_chart( fr.tempo_medio_de_entrega_por_entregas_multiplas(df), ue_container_width=True)
+
+        elif opcao == '14. Tempo médio de entrega por avaliação dos entregadores.':
+            st.plotly_chart( fr.tempo_medio_de_entrega_por_avaliacao_dos_entregadores(df), ue_container_width=True)
     
-    elif opcao == '15. Tempo médio de entrega por condição climática.':
-        st.plotly_chart( fr.tempo_medio_de_entrega_por_condicao_climatica(df), ue_container_width=True)
-
-
-#######################################
-# 3. Restaurante
-#######################################
-# 1. A quantidade de entregadores únicos.
-# 2. A distância média dos resturantes e dos locais de entrega.
-# 3. O tempo médio e o desvio padrão de entrega por tipo de área.
-# 4. O tempo médio e o desvio padrão de entrega por tipo de área e tipo de pedido.
-# 5. O tempo médio e o desvio padrão de entrega por tipo de área e densidade de tráfego.
-# 6. O tempo médio de entrega durantes os Festivais.
-# 7. O tempo médio e o desvio padrão de entrega por condições climáticas.
-#######################################
-with tab3:
-    opcao= st.selectbox(
-        'Escolha o que deseja ver:',(
-            '1. A quantidade de entregadores únicos.',
-            '2. A distância média dos resturantes e dos locais de entrega.',
-            '3. O tempo médio e o desvio padrão de entrega por tipo de área.',
-            '4. O tempo médio e o desvio padrão de entrega por tipo de pedido.',
-            '5. O tempo médio e o desvio padrão de entrega por densidade de tráfego.',
-            '6. O tempo médio de entrega durantes os Festivais.',
-            '7. O tempo médio e o desvio padrão de entrega por condições climáticas.'))
+        elif opcao == '15. Tempo médio de entrega por condição climática.':
+            st.plotly_chart( fr.tempo_medio_de_entrega_por_condicao_climatica(cubo), ue_container_width=True)
+
+        elif opcao == '16. O perfil de um entregador.':
+            # A tabela dos perfis é montada uma vez por carga dos dados; cada
+            # consulta é uma busca pelo ID no índice
+            entregador = st.selectbox('ID do entregador:', perfis.index)
+            perfil_do_entregador = ent.perfil_do_entregador(perfis, entregador)
+            if perfil_do_entregador is not None:
+                col1, col2, col3, col4 = st.columns(4)
+                col1.metric('Entregas', int(perfil_do_entregador['Entregas']))
+                col2.metric('Avaliação média', perfil_do_entregador['Avaliação média'])
+                col3.metric('Tempo médio (min)', perfil_do_entregador['Tempo médio de entrega (min)'])
+                col4.metric('Distância média (km)', perfil_do_entregador['Distância média (km)'])
+                st.table(perfil_do_entregador.astype(str).rename(entregador))
+            st.caption('Todos os pedidos do entregador, sem os filtros da barra lateral.')
+
+
+    #######################################
+    # 3. Restaurante
+    #######################################
+    # 1. A quantidade de entregadores únicos.
+    # 2. A distância média dos resturantes e dos locais de entrega.
+    # 3. O tempo médio e o desvio padrão de entrega por tipo de área.
+    # 4. O tempo médio e o desvio padrão de entrega por tipo de área e tipo de pedido.
+    # 5. O tempo médio e o desvio padrão de entrega por tipo de área e densidade de tráfego.
+    # 6. O tempo médio de entrega durantes os Festivais.
+    # 7. O tempo médio e o desvio padrão de entrega por condições climáticas.
+    # 8. Os percentis do tempo de entrega por densidade de tráfego.
+    # 9. Os indicadores de cada restaurante.
+    # 10. Os restaurantes e as entregas em um raio.
+    # Visão geral: todos os painéis.
+    #######################################
+    with tab3:
+        opcao= st.selectbox(
+            'Escolha o que deseja ver:',(
+                '1. A quantidade de entregadores únicos.',
+                '2. A distância média dos resturantes e dos locais de entrega.',
+                '3. O tempo médio e o desvio padrão de entrega por tipo de área.',
+                '4. O tempo médio e o desvio padrão de entrega por tipo de pedido.',
+                '5. O tempo médio e o desvio padrão de entrega por densidade de tráfego.',
+                '6. O tempo médio de entrega durantes os Festivais.',
+                '7. O tempo médio e o desvio padrão de entrega por condições climáticas.',
+                '8. Os percentis do tempo de entrega por densidade de tráfego.',
+                '9. Os indicadores de cada restaurante.',
+                '10. Os restaurantes e as entregas em um raio.',
+                VISAO_GERAL))
     
-    if opcao == '1. A quantidade de entregadores únicos.':
-        st.header( fr.quantidade_de_entregadores_unicos(df) )
+        if opcao == VISAO_GERAL:
+            mostrar_visao_geral('Restaurantes')
+
+        elif opcao == '1. A quantidade de entregadores únicos.':
+            st.header( fr.quantidade_de_entregadores_unicos(df) )
+
+        elif opcao == '2. A distância média dos resturantes e dos locais de entrega.':
+            st.table( fr.distancia_media_dos_restaurantes_e_dos_locais_de_entrega(esbocos) )    
+
+        elif opcao == '3. O tempo médio e o desvio padrão de entrega por tipo de área.':
+            st.table( fr.tempo_medio_e_desvio_padrao_por_tipo_de_area(esbocos))        
+
+        elif opcao == '4. O tempo médio e o desvio padrão de entrega por tipo de pedido.':
+            st.table( fr.tempo_medio_e_desvio_padrao_por_tipo_de_pedido(esbocos))
 
-    elif opcao == '2. A distância média dos resturantes e dos locais de entrega.':
-        st.table( fr.distancia_media_dos_restaurantes_e_dos_locais_de_entrega(df) )    
+        elif opcao == '5. O tempo médio e o desvio padrão de entrega por densidade de tráfego.':
+            st.table( fr.tempo_medio_e_desvio_padrao_por_tipo_de_trafego(esbocos))    
 
-    elif opcao == '3. O tempo médio e o desvio padrão de entrega por tipo de área.':
-        st.table( fr.tempo_medio_e_desvio_padrao_por_tipo_de_area(df))        
+        elif opcao == '6. O tempo médio de entrega durantes os Festivais.':
+            st.table( fr.tempo_medio_e_desvio_padrao_durante_o_festival(esbocos))   
 
-    elif opcao == '4. O tempo médio e o desvio padrão de entrega por tipo de pedido.':
-        st.table( fr.tempo_medio_e_desvio_padrao_por_tipo_de_pedido(df))
+        elif opcao == '7. O tempo médio e o desvio padrão de entrega por condições climáticas.':
+            st.table( fr.tempo_medio_e_desvio_padrao_por_condicao_climatica(esbocos))
 
-    elif opcao == '5. O tempo médio e o desvio padrão de entrega por densidade de tráfego.':
-        st.table( fr.tempo_medio_e_desvio_padrao_por_tipo_de_trafego(df))    
+        elif opcao == '8. Os percentis do tempo de entrega por densidade de tráfego.':
+            st.table( fr.percentis_do_tempo_de_entrega_por_tipo_de_trafego(esbocos))
+            st.caption('Medianas e percentis aproximados (t-digest, ver quantis.py).')
 
-    elif opcao == '6. O tempo médio de entrega durantes os Festivais.':
-        st.table( fr.tempo_medio_e_desvio_padrao_durante_o_festival(df))   
+        elif opcao == '9. Os indicadores de cada restaurante.':
+            st.dataframe( fr.indicadores_por_restaurante(df), use_container_width=True)
+            st.caption('Restaurantes identificados pelas coordenadas (células de ~20 m, ver restaurantes.py).')
 
-    elif opcao == '7. O tempo médio e o desvio padrão de entrega por condições climáticas.':
-        st.table( fr.tempo_medio_e_desvio_padrao_por_condicao_climatica(df)) 
+        elif opcao == '10. Os restaurantes e as entregas em um raio.':
+            # O centro é um restaurante da dimensão montada na carga dos dados;
+            # as buscas usam o índice da grade e não percorrem todas as linhas
+            col1, col2 = st.columns(2)
+            centro = col1.selectbox('Centro (ID do restaurante):', restaurantes.index)
+            raio_km = col2.slider('Raio (km)', min_value=0.5, max_value=50.0, value=rs.RAIO_PADRAO, step=0.5)
+            latitude, longitude = restaurantes.loc[centro, ['Latitude', 'Longitude']]
+            proximos = fr.restaurantes_no_raio(df, float(latitude), float(longitude), raio_km)
+            col1, col2, col3 = st.columns(3)
+            col1.metric('Restaurantes no raio', len(proximos))
+            col2.metric('Entregas no raio', len(rs.entregas_no_raio(df_carregado, latitude, longitude, raio_km, filtros)))
+            col3.metric('Pedidos do restaurante', len(rs.entregas_do_restaurante(df_carregado, centro, filtros)))
+            st.dataframe(proximos, use_container_width=True)
+finally:
+    registro = inst.finalizar_execucao()
+    if perfil is not None:
+        st.session_state['relatorio_do_perfil'] = inst.terminar_perfil(perfil)
 
 
 
+################################################
+# Depuração
+################################################
+# Tempo de cada etapa desta execução, métricas do processo e perfil.
+st.sidebar.write('---')
+depuracao = st.sidebar.checkbox('Painel de depuração', key='depuracao')
+
+if depuracao:
+    with st.sidebar.expander('Tempo por etapa', expanded=True):
+        st.write('Execução: {:.0f} ms, memória residente: {:.0f} MB'.format(
+            registro['segundos'] * 1000, registro['memoria_residente_mb']))
+        st.dataframe(inst.tabela(registro))
+        st.download_button('Registro da execução (JSON)', inst.para_json(registro), 'execucao.json', 'application/json')
+        st.download_button('Métricas (Prometheus)', inst.metricas_prometheus(), 'metricas.txt', 'text/plain')
+        perfilador = st.selectbox('Perfilador', inst.perfiladores_disponiveis())
+        if st.button('Perfilar a próxima execução'):
+            st.session_state['perfilar'] = perfilador
+            st.experimental_rerun()
+    if st.session_state.get('relatorio_do_perfil'):
+        with st.sidebar.expander('Perfil da última execução perfilada'):
+            st.text(st.session_state['relatorio_do_perfil'])
+
 ################################################
 # Rodapé
 st.markdown('---')
@@ -0,0 +1,194 @@
+#######################################
+# Biblioteca
+#######################################
+
+# Manipulação dos dados
+import numpy as np
+import pandas as pd
+
+# Nomes das colunas de soma e de soma dos quadrados, os mesmos do cubo
+from cubo import coluna_da_soma, coluna_da_soma_dos_quadrados
+
+# Perfis guardados por DataFrame carregado
+import threading
+import weakref
+
+#######################################
+# Configuração
+#######################################
+
+# Medidas com quantidade, soma e soma dos quadrados por entregador
+MEDIDAS_DOS_PERFIS = [
+  'Idade do entregador',
+  'Avaliação do entregador',
+  'Tempo de entrega (min)',
+  'Distância (km)',
+]
+
+# Colunas categóricas com a quantidade de pedidos de cada valor por entregador
+CONTAGENS_DOS_PERFIS = [
+  'Tipo de veículo',
+  'Condição do veículo',
+  'Tipo de área',
+]
+
+# Colunas numéricas com a quantidade de pedidos de cada valor presente nos dados
+VALORES_DOS_PERFIS = [
+  'Idade do entregador',
+  'Avaliação do entregador',
+]
+
+# Datas do primeiro e do último pedido de cada entregador
+DATAS_DOS_PERFIS = ['Primeiro pedido', 'Último pedido']
+
+def coluna_da_quantidade(medida):
+  return 'Quantidade: ' + medida
+
+def coluna_da_contagem(coluna, valor):
+  return '{} = {}'.format(coluna, valor)
+
+# Soma do tempo de entrega dos pedidos de cada tipo de área (rankings dos entregadores)
+def coluna_da_soma_por_area(area):
+  return '{} | {}'.format(coluna_da_soma('Tempo de entrega (min)'), coluna_da_contagem('Tipo de área', area))
+
+#######################################
+# Construção dos perfis
+#######################################
+# Uma linha por entregador, indexada pelo 'ID do entregador', com apenas
+# valores que se combinam entre blocos de dados: quantidades e somas (que
+# se somam) e as datas do primeiro e do último pedido (mínimo e máximo).
+# Os dados do Kaggle repetem o mesmo ID com idades e veículos diferentes,
+# então a idade é a média e o veículo é o mais frequente.
+# As quantidades por valor (idade, avaliação, veículo, área) e a soma do
+# tempo por área respondem aos painéis dos entregadores sem filtros
+# (consultas.py) sem agrupar as linhas.
+#######################################
+
+def construir_perfis(df):
+  validos = df['ID do entregador'].notna().to_numpy()
+  df = df[validos]
+  ids = df['ID do entregador'].astype(str).to_numpy()
+
+  valores = {'Entregas': np.ones(len(df), dtype=np.int64)}
+  for medida in MEDIDAS_DOS_PERFIS:
+    x = df[medida].to_numpy(dtype=np.float64)
+    presente = ~np.isnan(x)
+    x = np.where(presente, x, 0.0)
+    valores[coluna_da_quantidade(medida)] = presente.astype(np.int64)
+    valores[coluna_da_soma(medida)] = x
+    valores[coluna_da_soma_dos_quadrados(medida)] = x * x
+  for coluna in CONTAGENS_DOS_PERFIS:
+    for valor in df[coluna].cat.categories:
+      valores[coluna_da_contagem(coluna, valor)] = (df[coluna] == valor).to_numpy(dtype=np.int64)
+  for coluna in VALORES_DOS_PERFIS:
+    for valor in np.sort(df[coluna].dropna().unique()):
+      valores[coluna_da_contagem(coluna, valor)] = (df[coluna] == valor).to_numpy(dtype=np.int64)
+  tempo = valores[coluna_da_soma('Tempo de entrega (min)')]
+  for area in df['Tipo de área'].cat.categories:
+    valores[coluna_da_soma_por_area(area)] = np.where(df['Tipo de área'] == area, tempo, 0.0)
+
+  grupos = pd.DataFrame(valores).groupby(ids)
+  perfis = grupos.sum()
+  datas = df['Data do pedido'].groupby(ids).agg(['min', 'max'])
+  perfis['Primeiro pedido'] = datas['min']
+  perfis['Último pedido'] = datas['max']
+  return perfis.rename_axis('ID do entregador')
+
+def combinar_perfis(a, b):
+  '''
+  Junta os perfis de dois blocos de dados, em qualquer ordem.
+  '''
+  if a.empty:
+    return b
+  if b.empty:
+    return a
+  somas_a, somas_b = a.drop(columns=DATAS_DOS_PERFIS), b.drop(columns=DATAS_DOS_PERFIS)
+  tipos = {**somas_b.dtypes, **somas_a.dtypes}
+  # Valores (ex.: idades) que só aparecem em um dos blocos valem zero no outro;
+  # sem isso, um entregador que só está no outro bloco ficaria com NaN
+  colunas = somas_a.columns.union(somas_b.columns, sort=False)
+  somas_a = somas_a.reindex(columns=colunas, fill_value=0)
+  somas_b = somas_b.reindex(columns=colunas, fill_value=0)
+  perfis = somas_a.add(somas_b, fill_value=0).astype(tipos)
+  perfis['Primeiro pedido'] = pd.concat([a['Primeiro pedido'], b['Primeiro pedido']], axis=1).min(axis=1)
+  perfis['Último pedido'] = pd.concat([a['Último pedido'], b['Último pedido']], axis=1).max(axis=1)
+  return perfis.sort_index()
+
+def atualizar_perfis(perfis, novos_pedidos):
+  '''
+  Perfis com os 'novos_pedidos' (linhas limpas) somados, sem voltar às linhas anteriores.
+  '''
+  return combinar_perfis(perfis, construir_perfis(novos_pedidos))
+
+#######################################
+# Tabela dos perfis
+#######################################
+
+def _mais_frequente(perfis, coluna):
+  prefixo = coluna_da_contagem(coluna, '')
+  contagens = perfis[[nome for nome in perfis.columns if nome.startswith(prefixo)]]
+  mais_frequente = contagens.idxmax(axis=1).str[len(prefixo):]
+  # Entregadores sem nenhum valor conhecido
+  return mais_frequente.where(contagens.sum(axis=1) > 0)
+
+def tabela_dos_perfis(perfis):
+  '''
+  Perfil legível de cada entregador: entregas, idade, veículo mais
+  frequente e a sua condição, avaliação média, tempo médio e desvio padrão
+  (amostral, como o pandas) de entrega, distância média e o período ativo.
+  '''
+  def media(medida):
+    with np.errstate(invalid='ignore', divide='ignore'):
+      return perfis[coluna_da_soma(medida)] / perfis[coluna_da_quantidade(medida)]
+
+  n = perfis[coluna_da_quantidade('Tempo de entrega (min)')]
+  soma = perfis[coluna_da_soma('Tempo de entrega (min)')]
+  with np.errstate(invalid='ignore', divide='ignore'):
+    variancia = (perfis[coluna_da_soma_dos_quadrados('Tempo de entrega (min)')] - soma * soma / n) / (n - 1)
+
+  return pd.DataFrame({
+    'Entregas': perfis['Entregas'],
+    'Idade': media('Idade do entregador').round(1),
+    'Tipo de veículo': _mais_frequente(perfis, 'Tipo de veículo'),
+    'Condição do veículo': _mais_frequente(perfis, 'Condição do veículo'),
+    'Avaliação média': media('Avaliação do entregador').round(2),
+    'Tempo médio de entrega (min)': media('Tempo de entrega (min)').round(1),
+    'Desvio padrão (min)': np.sqrt(variancia.clip(lower=0)).round(1),
+    'Distância média (km)': media('Distância (km)').round(2),
+    'Primeiro pedido': perfis['Primeiro pedido'],
+    'Último pedido': perfis['Último pedido'],
+  }, index=perfis.index)
+
+_perfis = {}
+_trava = threading.Lock()
+
+def obter_perfis(df, tabela=True):
+  '''
+  Devolve a tabela dos perfis de 'df' (com tabela=False, as quantidades e
+  somas de construir_perfis), construída apenas na primeira vez que o
+  DataFrame é visto. Os perfis são descartados junto com o DataFrame.
+  '''
+  chave = id(df)
+  with _trava:
+    entrada = _perfis.get(chave)
+  if entrada is None or entrada[0]() is not df:
+    perfis = construir_perfis(df)
+    entrada = (weakref.ref(df, lambda _: _perfis.pop(chave, None)), perfis, tabela_dos_perfis(perfis))
+    with _trava:
+      _perfis[chave] = entrada
+  return entrada[2] if tabela else entrada[1]
+
+#######################################
+# Consulta a um entregador
+#######################################
+
+def perfil_do_entregador(perfis, entregador):
+  '''
+  Linha do 'entregador' na tabela dos perfis, ou None se ele não existir.
+  A busca usa a tabela hash do índice: o tempo não depende da quantidade
+  de pedidos nem de entregadores.
+  '''
+  try:
+    return perfis.loc[entregador]
+  except KeyError:
+    return None
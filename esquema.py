@@ -0,0 +1,138 @@
+#######################################
+# Biblioteca
+#######################################
+
+# Manipulação dos dados
+import pandas as pd
+
+#######################################
+# Categorias
+#######################################
+# As categorias sem ordem natural seguem a ordem alfabética, que é a
+# mesma ordem que os groupby produziam quando as colunas eram texto.
+# Todas são declaradas como ordenadas: no pandas 1.5, groupby(observed=True)
+# sobre uma categoria não ordenada devolve os grupos na ordem em que aparecem.
+#######################################
+
+ORDEM_DENSIDADE = ['Baixo', 'Médio', 'Alto', 'Engarrafado']
+ORDEM_CONDICAO_CLIMATICA = ['Ensolarado', 'Nublado', 'Nebuloso', 'Ventoso', 'Tempestuoso', 'Tempestades de areia']
+TIPOS_DE_AREA = ['Metropolitana', 'Semi-urbana', 'Urbana']
+FESTIVAL = ['Não', 'Sim']
+TIPOS_DE_VEICULO = ['Motocicleta', 'Scooter', 'Scooter Elétrica']
+TIPOS_DE_PEDIDO = ['Bebidas', 'Buffet', 'Lanche', 'Refeição']
+CONDICOES_DO_VEICULO = ['Boa', 'Normal', 'Ruim']
+
+#######################################
+# Esquema do DataFrame limpo
+#######################################
+# coluna -> tipo
+# 'categoria' sem lista: as categorias vêm dos próprios dados (IDs).
+# 'horario': texto 'HH:MM:SS' convertido para timedelta desde a meia-noite.
+#######################################
+
+ESQUEMA = {
+  'ID da entrega': 'string[pyarrow]',
+  'ID do entregador': pd.CategoricalDtype(ordered=True),
+  'Idade do entregador': 'int8',
+  # Mantida em float64: em float32 as notas apareceriam como 4.900000095 nos gráficos
+  'Avaliação do entregador': 'float64',
+  'Latitude do restaurante': 'float32',
+  'Longitude do restaurante': 'float32',
+  'Latitude da entrega': 'float32',
+  'Longitude da entrega': 'float32',
+  'Data do pedido': 'datetime64[ns]',
+  'Horário do pedido': 'horario',
+  'Horário da retirada': 'horario',
+  'Condição climática': pd.CategoricalDtype(ORDEM_CONDICAO_CLIMATICA, ordered=True),
+  'Densidade de tráfego': pd.CategoricalDtype(ORDEM_DENSIDADE, ordered=True),
+  'Condição do veículo': pd.CategoricalDtype(CONDICOES_DO_VEICULO, ordered=True),
+  'Tipo de pedido': pd.CategoricalDtype(TIPOS_DE_PEDIDO, ordered=True),
+  'Tipo de veículo': pd.CategoricalDtype(TIPOS_DE_VEICULO, ordered=True),
+  'Entregas multiplas': 'int8',
+  'Festival': pd.CategoricalDtype(FESTIVAL, ordered=True),
+  'Tipo de área': pd.CategoricalDtype(TIPOS_DE_AREA, ordered=True),
+  'Tempo de entrega (min)': 'int16',
+  'Distância (km)': 'float32',
+  # Chaves inteiras de tempo (periodos.py)
+  'Dia do pedido': 'int32',
+  'Semana do pedido': 'int32',
+  'Hora do pedido': 'int8',
+  # Células da grade espacial no nível máximo (grade_espacial.py)
+  'Célula da entrega': 'int64',
+  'Célula do restaurante': 'int64',
+}
+
+# Colunas derivadas que só servem de chave às análises e não vão para os downloads
+COLUNAS_INTERNAS = [
+  'Dia do pedido',
+  'Semana do pedido',
+  'Hora do pedido',
+  'Célula da entrega',
+  'Célula do restaurante',
+]
+
+def aplicar_esquema(df):
+  '''
+  Converte as colunas do DataFrame limpo para os tipos declarados em ESQUEMA.
+  Colunas que não estão no esquema são mantidas como estão.
+  '''
+  df = df.copy()
+  for coluna, tipo in ESQUEMA.items():
+    if coluna not in df.columns:
+      continue
+    if tipo == 'horario':
+      if not pd.api.types.is_timedelta64_dtype(df[coluna]):
+        df[coluna] = pd.to_timedelta(df[coluna], errors='coerce')
+    else:
+      df[coluna] = df[coluna].astype(tipo)
+      if isinstance(tipo, pd.CategoricalDtype) and tipo.categories is None:
+        # Categorias vindas dos dados em ordem alfabética, como no astype('category'),
+        # mesmo quando o DataFrame foi montado a partir de vários arquivos
+        categorias = df[coluna].cat.categories
+        if not categorias.is_monotonic_increasing:
+          df[coluna] = df[coluna].cat.reorder_categories(categorias.sort_values())
+  return df
+
+def segue_o_esquema(df):
+  '''
+  True se todas as colunas do esquema presentes em 'df' já têm o tipo declarado,
+  e aplicar_esquema (que copia o DataFrame) pode ser dispensado.
+  '''
+  for coluna, tipo in ESQUEMA.items():
+    if coluna not in df.columns:
+      continue
+    if tipo == 'horario':
+      if not pd.api.types.is_timedelta64_dtype(df[coluna]):
+        return False
+    elif isinstance(tipo, pd.CategoricalDtype):
+      atual = df[coluna].dtype
+      if not isinstance(atual, pd.CategoricalDtype) or atual.ordered != tipo.ordered:
+        return False
+      if tipo.categories is not None and not atual.categories.equals(tipo.categories):
+        return False
+      if tipo.categories is None and not atual.categories.is_monotonic_increasing:
+        return False
+    elif df[coluna].dtype != pd.api.types.pandas_dtype(tipo):
+      return False
+  return True
+
+#######################################
+# Relatório de memória
+#######################################
+
+def relatorio_de_memoria(df, df_referencia=None):
+  '''
+  Memória ocupada por coluna (em KB), com o total na última linha.
+  Se 'df_referencia' for informado, inclui a memória da referência e a redução.
+  '''
+  relatorio = pd.DataFrame({
+    'Tipo': df.dtypes.astype(str),
+    'Memória (KB)': df.memory_usage(deep=True, index=False) / 1024,
+  })
+  if df_referencia is not None:
+    relatorio['Referência (KB)'] = df_referencia.memory_usage(deep=True, index=False) / 1024
+  relatorio.loc['Total'] = relatorio.sum(numeric_only=True)
+  relatorio.loc['Total', 'Tipo'] = ''
+  if df_referencia is not None:
+    relatorio['Redução (x)'] = relatorio['Referência (KB)'] / relatorio['Memória (KB)']
+  return relatorio.round(1)
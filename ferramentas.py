@@ -3,174 +3,248 @@
 #######################################
 
 # Manipulação dos dados
+import numpy as np
 import pandas as pd
 
-# Gráficos
-import plotly.express as px
+# Gráficos (cada figura é medida como uma etapa da execução, ver instrumentacao.py)
+# O plotly só é importado quando o primeiro gráfico é desenhado.
+from instrumentacao import cronometrar_modulo
+px = cronometrar_modulo('plotly.express', 'plotly')
 
-# Mapa
-import folium
+# Mapas: o folium é importado apenas pelas funções dos mapas (localizacao_central_por_area_e_trafego e densidade_dos_pedidos)
 
 # Calcular distancias de GPS
-from geopy.distance import geodesic 
+from distancias import calcular_distancias
 
-# Para botão de download
-import requests
+# Tipos das colunas do DataFrame limpo
+from esquema import ESQUEMA, COLUNAS_INTERNAS, aplicar_esquema
 
-#######################################
-# Funções de limpeza
-#######################################
+# Chaves inteiras de tempo (dia, semana, hora) e séries temporais
+import periodos
 
-def limpeza_dos_dados(df):
-  '''
-  # 1. Renomear as colunas do DataFrame. 
-  # 2. Retirar do DataFrame linhas que possuem alguma informação faltando/vazia/não preenchida.
-  # 3. Tirar os espaços em branco que estão sobrando, e retirar um prefixo da coluna de condição climática.
-  # 4. Converter o tipo primitivo de algumas colunas
-  # 5. Remover o prefixos
-  # 6. Traduzir os objetos de algumas colunas para o português.
-  # 7. Ordena a Densidade de tráfego
-  # 8. Ordena a Condição Climática
-  # 9. Cria a coluna 'Distancia (km)' 
-  '''
+# Agregação de cada painel, sem os gráficos (consultas.py)
+import consultas
 
-  # 1. Renomear as colunas do DataFrame.
-  dicionario = {
-      'ID':'ID da entrega',
-      'Delivery_person_ID':'ID do entregador', 
-      'Delivery_person_Age':'Idade do entregador',
-      'Delivery_person_Ratings':'Avaliação do entregador', 
-      'Restaurant_latitude':'Latitude do restaurante',
-      'Restaurant_longitude':'Longitude do restaurante', 
-      'Delivery_location_latitude':'Latitude da entrega',
-      'Delivery_location_longitude':'Longitude da entrega', 
-      'Order_Date':'Data do pedido', 
-      'Time_Orderd':'Horário do pedido',
-      'Time_Order_picked':'Horário da retirada', 
-      'Weatherconditions':'Condição climática', 
-      'Road_traffic_density':'Densidade de tráfego',
-      'Vehicle_condition':'Condição do veículo', 
-      'Type_of_order':'Tipo de pedido', 
-      'Type_of_vehicle':'Tipo de veículo',
-      'multiple_deliveries':'Entregas multiplas', 
-      'Festival':'Festival', 
-      'City':'Tipo de área', 
-      'Time_taken(min)':'Tempo de entrega (min)'
-  }
-  df = df.rename(columns=dicionario)
+# Reexportadas: os painéis que já são tabelas (ou valores) vêm de consultas.py sem alteração
+from consultas import (
+  ZOOM_INICIAL, MODOS_DO_MAPA, celulas_no_mapa,
+  avaliacao_media_e_desvio_padrao_por_tipo_de_trafego, avaliacao_media_e_desvio_padrao_por_condicao_climatica,
+  ranking_de_entregadores, top_entregadores,
+  quantidade_de_entregadores_unicos, distancia_media_dos_restaurantes_e_dos_locais_de_entrega,
+  tempo_medio_e_desvio_padrao_por_tipo_de_area, tempo_medio_e_desvio_padrao_por_tipo_de_pedido,
+  tempo_medio_e_desvio_padrao_por_tipo_de_trafego, tempo_medio_e_desvio_padrao_durante_o_festival,
+  tempo_medio_e_desvio_padrao_por_condicao_climatica, percentis_do_tempo_de_entrega_por_tipo_de_trafego,
+  indicadores_por_restaurante, restaurantes_no_raio,
+)
 
-  # 2. Retirar do DataFrame linhas que possuem alguma informação faltando/vazia/não preenchida.
-  df = df.dropna()
-  # Exclui as linhas vazias 
-  colunas = df.columns
-  for coluna in colunas:
-    linhas = (df[coluna] != 'NaN') & (df[coluna] != 'NaN ')
-    df = df.loc[linhas,:]
+# Grade espacial das coordenadas (mapas de calor e de agrupamentos)
+import grade_espacial as grade
 
-  # 3. Tirar os espaços em branco que estão sobrando, e retirar um prefixo da coluna de condição climática.
-  # Remove linhas com alguma coluna vazia.
-  df = df.dropna()
-  # Remove espaço em branco no fim das strings 
-  colunas_str = df.select_dtypes(include='object').columns
-  colunas = colunas_str
-  for coluna in colunas:
-    df.loc[:,coluna] = df.loc[:,coluna].str.strip()
+# Cache dos resultados das funções de análise
+from memoizacao import memorizar, sem_cache
 
-  # 4. Converter o tipo primitivo de algumas colunas
-  # Converte para numeros inteiros
-  df['Idade do entregador'] = df['Idade do entregador'].astype(int)
-  df['Entregas multiplas'] = df['Entregas multiplas'].astype(int)
-  # Converte para numeros decimais
-  df['Avaliação do entregador'] = df['Avaliação do entregador'].astype(float)
-  df['Latitude do restaurante'] = df['Latitude do restaurante'].astype(float)
-  df['Longitude do restaurante'] = df['Longitude do restaurante'].astype(float)
-  df['Latitude da entrega'] = df['Latitude da entrega'].astype(float)
-  df['Longitude da entrega'] = df['Longitude da entrega'].astype(float)
-  # Conversao de texto para data
-  df['Data do pedido'] = pd.to_datetime( df['Data do pedido'], format='%d-%m-%Y')
-  # Extrai a 'str' e deixa os números em formato 'int'
-  df['Tempo de entrega (min)'] = df['Tempo de entrega (min)'].str.extract(r'(\d+)').astype(int)
+# Para botão de download
+import functools
+import gzip
+import io
+import os
 
-  # 5. Remover o prefixos
-  # Prefixo "conditions" da coluna de Condição climática
-  df['Condição climática'] = df['Condição climática'].str.replace('conditions ', '')
+#######################################
+# Funções de limpeza
+#######################################
 
-  # 6. Traduzir os objetos de algumas colunas para o português.
-  # Condição climática
-  dicionario = {
+# Versão da limpeza. Incrementar sempre que limpeza_dos_dados mudar,
+# para invalidar os DataFrames limpos guardados em cache (cache_dos_dados.py).
+VERSAO_DA_LIMPEZA = 5
+
+# Nomes das colunas em português
+COLUNAS = {
+    'ID':'ID da entrega',
+    'Delivery_person_ID':'ID do entregador', 
+    'Delivery_person_Age':'Idade do entregador',
+    'Delivery_person_Ratings':'Avaliação do entregador', 
+    'Restaurant_latitude':'Latitude do restaurante',
+    'Restaurant_longitude':'Longitude do restaurante', 
+    'Delivery_location_latitude':'Latitude da entrega',
+    'Delivery_location_longitude':'Longitude da entrega', 
+    'Order_Date':'Data do pedido', 
+    'Time_Orderd':'Horário do pedido',
+    'Time_Order_picked':'Horário da retirada', 
+    'Weatherconditions':'Condição climática', 
+    'Road_traffic_density':'Densidade de tráfego',
+    'Vehicle_condition':'Condição do veículo', 
+    'Type_of_order':'Tipo de pedido', 
+    'Type_of_vehicle':'Tipo de veículo',
+    'multiple_deliveries':'Entregas multiplas', 
+    'Festival':'Festival', 
+    'City':'Tipo de área', 
+    'Time_taken(min)':'Tempo de entrega (min)'
+}
+
+# Textos que indicam informação faltando no CSV
+VALORES_AUSENTES = ['NaN', 'NaN ']
+
+# Traduções para o português
+TRADUCOES = {
+  'Condição climática': {
       'Sunny': 'Ensolarado',
       'Stormy': 'Tempestuoso',
       'Sandstorms': 'Tempestades de areia',
       'Cloudy': 'Nublado',
       'Fog': 'Nebuloso',
       'Windy': 'Ventoso'
-      }
-  df['Condição climática'] = df['Condição climática'].map(dicionario)
-  
-  # Tipo de área
-  dicionario = {
+      },
+  'Tipo de área': {
       'Urban': 'Urbana',
       'Metropolitian': 'Metropolitana',
       'Semi-Urban': 'Semi-urbana'
-      }
-  df['Tipo de área'] = df['Tipo de área'].map(dicionario)
-
-  # Densidade de tráfego
-  dicionario = {
+      },
+  'Densidade de tráfego': {
       'High': 'Alto',
       'Jam': 'Engarrafado',
       'Low': 'Baixo',
       'Medium': 'Médio'
-      }
-  df['Densidade de tráfego'] = df['Densidade de tráfego'].map(dicionario)
-
-  # Festival
-  dicionario = {
+      },
+  'Festival': {
       'Yes': 'Sim',
       'No': 'Não'
-      }
-  df['Festival'] = df['Festival'].map(dicionario)
-
-  # Tipo de veículo
-  dicionario = {
-    'motorcycle': 'Motocicleta',
-    'scooter': 'Scooter',
-    'electric_scooter': 'Scooter Elétrica'
-      }
-  df['Tipo de veículo'] = df['Tipo de veículo'].map(dicionario)
-
-  # Tipo de pedido
-  dicionario = {
+      },
+  'Tipo de veículo': {
+      'motorcycle': 'Motocicleta',
+      'scooter': 'Scooter',
+      'electric_scooter': 'Scooter Elétrica'
+      },
+  'Tipo de pedido': {
       'Snack': 'Lanche',
       'Drinks': 'Bebidas',
       'Buffet': 'Buffet',
       'Meal': 'Refeição'
-      }
-  df['Tipo de pedido'] = df['Tipo de pedido'].map(dicionario)
-
-  # Condição do veículo
-  dicionario = {
+      },
+  'Condição do veículo': {
       0:'Ruim',
       1:'Normal',
       2:'Boa'
-      }
-  df['Condição do veículo'] = df['Condição do veículo'].map(dicionario)
+      },
+}
+
+# Prefixos removidos antes da tradução
+PREFIXOS = {
+  'Condição climática': 'conditions ',
+}
+
+# Conversões feitas sobre os valores distintos (já sem espaços) de cada coluna
+CONVERSOES = {
+  'Data do pedido': lambda valores: pd.to_datetime(valores, format='%d-%m-%Y'),
+  'Horário do pedido': lambda valores: pd.to_timedelta(valores, errors='coerce'),
+  'Horário da retirada': lambda valores: pd.to_timedelta(valores, errors='coerce'),
+  'Tempo de entrega (min)': lambda valores: valores.str.extract(r'(\d+)', expand=False).astype(int),
+}
+
+def ler_dados(caminho, **kwargs):
+  '''
+  Lê o CSV bruto já tratando, na leitura, os textos de informação faltando e
+  os espaços no início dos campos. Os espaços no fim são retirados na limpeza.
+  '''
+  return pd.read_csv(caminho, na_values=VALORES_AUSENTES, skipinitialspace=True, **kwargs)
+
+def _recodificar(serie, coluna):
+  '''
+  Converte uma coluna olhando apenas para os seus valores distintos.
+  Retorna (coluna convertida, máscara de linhas com informação faltando).
+  '''
+  tipo = ESQUEMA.get(coluna)
+  precisa_de_texto = (
+    serie.dtype == object or coluna in TRADUCOES or coluna in CONVERSOES
+    or isinstance(tipo, pd.CategoricalDtype))
+  if not precisa_de_texto:
+    # Colunas numéricas: não há o que recodificar
+    return serie, serie.isna().to_numpy()
+
+  # Uma única passada sobre as linhas; o resto do trabalho é sobre os valores distintos
+  codigos, valores = pd.factorize(serie)
+  valores = pd.Series(valores)
+  ausente = valores.isin(VALORES_AUSENTES).to_numpy()
+  if valores.dtype == object:
+    valores = valores.str.strip()
+  if coluna in PREFIXOS:
+    valores = valores.str.replace(PREFIXOS[coluna], '', regex=False)
+  if coluna in TRADUCOES:
+    valores = valores.map(TRADUCOES[coluna])
+  if coluna in CONVERSOES:
+    # O tipo vem da conversão, mesmo sem nenhum valor (CSV ou bloco sem linhas)
+    valores = CONVERSOES[coluna](valores[~ausente]).reindex(valores.index)
+
+  linhas_ausentes = (codigos == -1) | ausente[codigos]
+  if isinstance(tipo, pd.CategoricalDtype):
+    if tipo.categories is None:
+      # Categorias vindas dos dados (IDs), em ordem alfabética como no astype('category')
+      tipo = pd.CategoricalDtype(pd.Index(valores.dropna().unique()).sort_values(), ordered=tipo.ordered)
+    novos_codigos = tipo.categories.get_indexer(valores)
+    novos_codigos = novos_codigos[codigos]
+    novos_codigos[codigos == -1] = -1
+    return pd.Categorical.from_codes(novos_codigos, dtype=tipo), linhas_ausentes
+  return valores.take(codigos).to_numpy(), linhas_ausentes
 
+def limpeza_dos_dados(df):
+  '''
+  # 1. Renomear as colunas do DataFrame. 
+  # 2. Retirar do DataFrame linhas que possuem alguma informação faltando/vazia/não preenchida.
+  # 3. Tirar os espaços em branco que estão sobrando, e retirar um prefixo da coluna de condição climática.
+  # 4. Converter o tipo primitivo de algumas colunas
+  # 5. Remover o prefixos
+  # 6. Traduzir os objetos de algumas colunas para o português.
   # 7. Ordena a Densidade de tráfego
-  ordem_densidade = ['Baixo', 'Médio', 'Alto', 'Engarrafado']
-  df['Densidade de tráfego'] = pd.Categorical(df['Densidade de tráfego'], categories=ordem_densidade, ordered=True)
-  
   # 8. Ordena a Condição Climática
-  ordem_condicao_climatica = ['Ensolarado', 'Nublado', 'Nebuloso', 'Ventoso','Tempestuoso','Tempestades de areia']
-  df['Condição climática'] = pd.Categorical(df['Condição climática'], categories=ordem_condicao_climatica, ordered=True)
+  # 9. Cria a coluna 'Distancia (km)' 
+  # 10. Cria as chaves inteiras de dia, semana e hora do pedido (periodos.py)
+  # 11. Cria as células da grade espacial das entregas e dos restaurantes (grade_espacial.py)
+  # 12. Aplica os tipos compactos declarados em esquema.py
+  Os passos 2 a 8 são feitos coluna a coluna por _recodificar, sobre os valores
+  distintos de cada coluna, e as linhas faltando são retiradas uma única vez.
+  '''
+
+  # 1. Renomear as colunas do DataFrame.
+  df = df.rename(columns=COLUNAS)
+
+  # 2. a 8. Recodifica cada coluna e junta as linhas com informação faltando
+  colunas = {}
+  linhas_ausentes = np.zeros(len(df), dtype=bool)
+  for coluna in df.columns:
+    colunas[coluna], ausentes = _recodificar(df[coluna], coluna)
+    linhas_ausentes |= ausentes
+
+  # Retira as linhas faltando, uma única cópia por coluna
+  manter = ~linhas_ausentes
+  df = pd.DataFrame(
+    {coluna: valores[manter] for coluna, valores in colunas.items()},
+    index=df.index[manter])
+  # Categorias vindas dos dados ficam só com os valores das linhas mantidas
+  for coluna, tipo in ESQUEMA.items():
+    if isinstance(tipo, pd.CategoricalDtype) and tipo.categories is None and coluna in df.columns:
+      df[coluna] = df[coluna].cat.remove_unused_categories()
 
   # 9. Cria a coluna 'Distancia (km)'
-  def calcular_distancia(lat1, long1, lat2, long2):
-      coords_1 = (lat1, long1)
-      coords_2 = (lat2, long2)
-      return geodesic(coords_1, coords_2).km
-  df['Distância (km)'] = df.apply(lambda row: calcular_distancia(row['Latitude do restaurante'], row['Longitude do restaurante'], row['Latitude da entrega'], row['Longitude da entrega']), axis=1)
-  
+  # Calculada antes do passo 10, com as coordenadas ainda em float64
+  df['Distância (km)'] = calcular_distancias(
+    df['Latitude do restaurante'],
+    df['Longitude do restaurante'],
+    df['Latitude da entrega'],
+    df['Longitude da entrega'])
+
+  # 10. Cria as chaves inteiras de dia, semana e hora do pedido
+  # Calculadas uma vez aqui, para que os gráficos por período não mexam nas datas
+  for coluna, chave in periodos.chaves_de_tempo(df).items():
+    df[coluna] = chave
+
+  # 11. Cria as células da grade espacial das entregas e dos restaurantes
+  # Também com as coordenadas em float64, como a distância
+  for local, coluna in grade.COLUNAS_DAS_CELULAS.items():
+    latitude, longitude = grade.COORDENADAS[local]
+    df[coluna] = grade.celulas(df[latitude], df[longitude])
+
+  # 12. Aplica os tipos compactos declarados em esquema.py
+  df = aplicar_esquema(df)
+
   return df
 
 #######################################
@@ -178,6 +252,20 @@ def limpeza_dos_dados(df):
 #######################################
 # Empresa / Entregador / Restaurante
 #######################################
+# A agregação de cada painel fica em consultas.py; aqui os resultados
+# viram os gráficos do Plotly e os mapas do folium. As funções que recebem
+# 'cubo' respondem a partir do cubo pré-agregado (cubo.py), já filtrado
+# pela barra lateral. As que recebem 'esbocos' respondem a partir dos
+# esboços de quantis (quantis.py): quantidade, média e desvio padrão
+# exatos, medianas e percentis aproximados. As que recebem 'df' precisam
+# das linhas (entregadores únicos, idade, mapas etc.).
+# Os painéis que já são tabelas vêm de consultas.py sem alteração
+# (reexportados no início deste arquivo).
+# @memorizar guarda a figura de cada função por seleção de filtros
+# (memoizacao.py), com a tabela dentro dela: a tabela vem de consultas.py
+# por sem_cache, para não ser guardada duas vezes. O mapa do folium não é
+# guardado.
+#######################################
 
 #######################################
 # Empresa
@@ -189,11 +277,13 @@ def limpeza_dos_dados(df):
 # 5. Comparação do volume de pedidos por tipo de área e densidade de tráfego.
 # 6. A quantidade de pedidos por entregador por semana.
 # 7. A localização central de cada tipo de área por densidade de tráfego.
+# 8. A densidade dos pedidos no mapa (mapa de calor ou agrupamentos).
 #######################################
 
 # 1. Quantidade de pedidos por dia.
-def pedidos_por_dia(df):
-  df_aux = df.loc[:, ['ID da entrega', 'Data do pedido'] ].groupby('Data do pedido').count().reset_index()
+@memorizar
+def pedidos_por_dia(cubo):
+  df_aux = sem_cache(consultas.pedidos_por_dia)(cubo)
   # Criando gráfico de barras
   fig = px.bar(
     df_aux,
@@ -203,18 +293,17 @@ def pedidos_por_dia(df):
   return fig
 
 # 2. Quantidade de pedidos por semana
-def pedidos_por_semana(df):
-    # Criando uma nova coluna, que indica a semana do ano
-    df['Semana'] = df['Data do pedido'].dt.strftime( '%U' )
-    # Selecionando a coluna ID e agrupando pela semana do ano
-    df_aux = df.loc[:, ['ID da entrega','Semana'] ].groupby('Semana').count().reset_index()
+@memorizar
+def pedidos_por_semana(cubo):
+    df_aux = sem_cache(consultas.pedidos_por_semana)(cubo)
     # Criando gráfico de linha
     fig = px.line(df_aux, x='Semana',y='ID da entrega' , title='Quantidade de pedidos por semana')
     return fig
 
 # 3. Distribuição dos pedidos por tipo de área.
-def pedidos_por_tipo_de_area(df):
-  df_aux = df.loc[:, ['ID da entrega', 'Tipo de área'] ].groupby('Tipo de área').count().reset_index()
+@memorizar
+def pedidos_por_tipo_de_area(cubo):
+  df_aux = sem_cache(consultas.pedidos_por_tipo_de_area)(cubo)
   # Criando o gráfico de torta
   fig = px.pie(
     df_aux,values='ID da entrega',
@@ -225,8 +314,9 @@ def pedidos_por_tipo_de_area(df):
   return fig
 
 # 4. Distribuição dos pedidos por densidade de tráfego.
-def pedidos_por_tipo_de_trafego(df):
-  df_aux = df.loc[:, ['ID da entrega', 'Densidade de tráfego'] ].groupby('Densidade de tráfego').count().reset_index()
+@memorizar
+def pedidos_por_tipo_de_trafego(cubo):
+  df_aux = sem_cache(consultas.pedidos_por_tipo_de_trafego)(cubo)
   # Criando o gráfico de torta
   fig = px.pie(
     df_aux,values='ID da entrega',
@@ -237,8 +327,9 @@ def pedidos_por_tipo_de_trafego(df):
   return fig
 
 # 5. Comparação do volume de pedidos por tipo de área e de tráfego.
-def pedidos_por_tipo_de_area_e_tipo_de_trafego(df):
-  df_aux = df.groupby(['Densidade de tráfego','Tipo de área'])['ID da entrega'].count().reset_index()
+@memorizar
+def pedidos_por_tipo_de_area_e_tipo_de_trafego(cubo):
+  df_aux = sem_cache(consultas.pedidos_por_tipo_de_area_e_tipo_de_trafego)(cubo)
   # Criando o gráfico
   fig = px.bar(
     df_aux,
@@ -252,17 +343,9 @@ def pedidos_por_tipo_de_area_e_tipo_de_trafego(df):
   return fig
 
 # 6. A quantidade de pedidos por entregador por semana.
+@memorizar
 def pedidos_por_entregador_por_semana(df):
-  # Criando uma nova coluna, que indica a semana do ano
-  df['Semana'] = df['Data do pedido'].dt.strftime( '%U' )
-  # Agrupando os dados por semana e contando o número de entregas por semana
-  A = df.loc[:,['ID da entrega','Semana']].groupby('Semana').count().reset_index()
-  # Agrupando os dados por semana e contando o número de entregadores únicos por semana
-  B = df.loc[:,['ID do entregador','Semana']].groupby('Semana').nunique().reset_index()
-  # Fazendo um join entre os dataframes A e B, com base na coluna 'Semana'
-  df_aux = pd.merge(A,B, how = 'inner')
-  # Criando uma nova coluna 'Pedido por entregador', que indica a média de entregas por entregador em cada semana
-  df_aux['Pedido por entregador'] = df_aux['ID da entrega'] / df_aux['ID do entregador']
+  df_aux = sem_cache(consultas.pedidos_por_entregador_por_semana)(df)
   # Criando o gráfico
   fig = px.line(
     df_aux, 
@@ -273,8 +356,8 @@ def pedidos_por_entregador_por_semana(df):
 
 # 7. A localização central de cada tipo de área por densidade de tráfego.
 def localizacao_central_por_area_e_trafego(df):
-  df_aux = df.loc[:,['Tipo de área', 'Densidade de tráfego', 'Latitude da entrega', 'Longitude da entrega']].groupby(['Tipo de área','Densidade de tráfego']).median().reset_index()
-  df_aux = df_aux.dropna()
+  import folium
+  df_aux = consultas.localizacao_central_por_area_e_trafego(df)
 
   # Definindo o mapa
   mapa = folium.Map(
@@ -309,6 +392,44 @@ def localizacao_central_por_area_e_trafego(df):
     ).add_to(mapa)
   return mapa
 
+# 8. A densidade dos pedidos no mapa (mapa de calor ou agrupamentos).
+# As células visíveis vêm de consultas.celulas_no_mapa.
+def densidade_dos_pedidos(df, modo='Mapa de calor', local='entrega', zoom=ZOOM_INICIAL, limites=None, centro=None):
+  import folium
+  from folium import plugins
+  df_aux = celulas_no_mapa(df, local, zoom, limites, modo)
+
+  # Centro: o informado (posição atual do mapa) ou a média dos pedidos
+  if centro is None and len(df_aux) > 0:
+    pesos = df_aux['Quantidade']
+    centro = [np.average(df_aux['Latitude'], weights=pesos), np.average(df_aux['Longitude'], weights=pesos)]
+  mapa = folium.Map(
+    location=centro or [0, 0],
+    zoom_start=zoom,
+    control_scale=True)
+
+  if len(df_aux) == 0:
+    return mapa
+  maximo = df_aux['Quantidade'].max()
+  if modo == 'Mapa de calor':
+    # Peso de cada célula entre 0 e 1 (o leaflet.heat satura acima de 1)
+    pontos = np.column_stack([df_aux['Latitude'], df_aux['Longitude'], df_aux['Quantidade'] / maximo])
+    plugins.HeatMap(pontos.tolist(), radius=20, blur=15, min_opacity=0.3).add_to(mapa)
+  else:
+    # Um círculo por célula, com área proporcional à quantidade de pedidos
+    for latitude, longitude, quantidade, media in zip(df_aux['Latitude'], df_aux['Longitude'], df_aux['Quantidade'], df_aux['Média']):
+      folium.CircleMarker(
+        location=[latitude, longitude],
+        radius=float(5 + 20 * np.sqrt(quantidade / maximo)),
+        color='blue',
+        weight=1,
+        fill=True,
+        fill_opacity=0.5,
+        tooltip='{} pedidos<br>Tempo médio de entrega: {:.1f} min'.format(quantidade, media)
+      ).add_to(mapa)
+  return mapa
+
+
 #######################################
 # Entregador
 #######################################
@@ -317,8 +438,8 @@ def localizacao_central_por_area_e_trafego(df):
 # 3. A avaliação média por entregador.
 # 4. A avaliação média e o desvio padrão por densidade de tráfego.
 # 5. A avaliação média e o desvio padrão por condições climáticas.
-# 6. Os 10 entregadores mais rápidos por tipo de área.
-# 7. Os 10 entregadores mais lentos por tipo de área.
+# 6. Os N entregadores mais rápidos por tipo de área.
+# 7. Os N entregadores mais lentos por tipo de área.
 # 8. Tempo médio das entregas por densidade de tráfego.
 # 9. Tempo médio das entregas por tipo de área.
 # 10. Tempo médio de entrega por tipo de veículo.
@@ -328,10 +449,13 @@ def localizacao_central_por_area_e_trafego(df):
 # 14. Tempo médio de entrega por avaliação dos entregadores.
 # 15. Tempo médio de entrega por condição climática.
 #######################################
+# 4. a 7. são tabelas (ranking_de_entregadores e top_entregadores), de consultas.py.
+#######################################
 
 # 1. A quantidade de entregadores por idade.
+@memorizar
 def quantidade_de_entregadores_por_idade(df):
-  df_aux = df.loc[:,['ID do entregador','Idade do entregador']].groupby('Idade do entregador').nunique().reset_index()
+  df_aux = sem_cache(consultas.quantidade_de_entregadores_por_idade)(df)
   fig = px.bar(
     df_aux,
     x='Idade do entregador',
@@ -342,8 +466,9 @@ def quantidade_de_entregadores_por_idade(df):
   return fig
 
 # 2. A pior e a melhor condição de veículos.
+@memorizar
 def condicao_veiculos(df):
-  df_aux = df.loc[:, ['ID do entregador', 'Condição do veículo'] ].groupby('Condição do veículo').nunique().reset_index()
+  df_aux = sem_cache(consultas.condicao_veiculos)(df)
   fig = px.pie(
     df_aux,
     values='ID do entregador',
@@ -355,8 +480,9 @@ def condicao_veiculos(df):
   return fig
 
 # 3. Quantidade de entregadores por avaliação.
+@memorizar
 def avaliacao_media_por_entregador(df):
-  df_aux = df.loc[:,['ID do entregador','Avaliação do entregador']].groupby('Avaliação do entregador').count().sort_values(by='Avaliação do entregador', ascending=False).reset_index()
+  df_aux = sem_cache(consultas.avaliacao_media_por_entregador)(df)
   fig = px.bar(
     df_aux,
     x='ID do entregador',
@@ -367,62 +493,10 @@ def avaliacao_media_por_entregador(df):
   )
   return fig
 
-# 4. A avaliação média e o desvio padrão por densidade de tráfego.
-def avaliacao_media_e_desvio_padrao_por_tipo_de_trafego(df):
-  df_aux = df.loc[:,['Densidade de tráfego','Avaliação do entregador']].groupby('Densidade de tráfego').agg({'Avaliação do entregador':['mean','median','std']}).reset_index()
-  df_aux.columns=['Densidade de tráfego','Avaliação média do entregador','Mediana','Desvio padrão (min)']
-  df_aux.index +=1  
-  return df_aux
-
-# 5. A avaliação média e o desvio padrão por condições climáticas.
-def avaliacao_media_e_desvio_padrao_por_condicao_climatica(df):
-  df_aux = df.loc[:,['Condição climática','Avaliação do entregador']].groupby('Condição climática').agg({'Avaliação do entregador':['mean','median','std']}).reset_index()
-  df_aux.columns=['Condição climática','Avaliação média do entregador','Mediana','Desvio padrão (min)']
-  df_aux.index +=1
-  return df_aux
-
-# 6. Os 10 entregadores mais rápidos por tipo de área.
-def top10_entregadores_mais_rapidos_urbana(df):
-  df_aux = df[df['Tipo de área']=='Urbana']
-  df_aux = df_aux.loc[:,['ID do entregador','Tempo de entrega (min)']].groupby(['ID do entregador']).mean().astype(int).sort_values(by='Tempo de entrega (min)',ascending=True).reset_index()
-  df_aux.index += 1
-  return df_aux.head(10)
-
-def top10_entregadores_mais_rapidos_semi_urbana(df):
-  df_aux = df[df['Tipo de área']=='Semi-urbana']
-  df_aux = df_aux.loc[:,['ID do entregador','Tempo de entrega (min)']].groupby(['ID do entregador']).mean().astype(int).sort_values(by='Tempo de entrega (min)',ascending=True).reset_index()
-  df_aux.index += 1
-  return df_aux.head(10)
-  
-def top10_entregadores_mais_rapidos_metropolitana(df):
-  df_aux = df[df['Tipo de área']=='Metropolitana']
-  df_aux = df_aux.loc[:,['ID do entregador','Tempo de entrega (min)']].groupby(['ID do entregador']).mean().astype(int).sort_values(by='Tempo de entrega (min)',ascending=True).reset_index()
-  df_aux.index += 1
-  return df_aux.head(10)
-
-# 7. Os 10 entregadores mais lentos por tipo de área.
-def top10_entregadores_mais_lentos_urbana(df):
-  df_aux = df[df['Tipo de área']=='Urbana']
-  df_aux = df_aux.loc[:,['ID do entregador','Tempo de entrega (min)']].groupby(['ID do entregador']).mean().astype(int).sort_values(by='Tempo de entrega (min)',ascending=False).reset_index()
-  df_aux.index += 1
-  return df_aux.head(10)
-
-def top10_entregadores_mais_lentos_semi_urbana(df):
-  df_aux = df[df['Tipo de área']=='Semi-urbana']
-  df_aux = df_aux.loc[:,['ID do entregador','Tempo de entrega (min)']].groupby(['ID do entregador']).mean().astype(int).sort_values(by='Tempo de entrega (min)',ascending=False).reset_index()
-  df_aux.index += 1
-  return df_aux.head(10)
-
-
-def top10_entregadores_mais_lentos_metropolitana(df):
-  df_aux = df[df['Tipo de área']=='Metropolitana']
-  df_aux = df_aux.loc[:,['ID do entregador','Tempo de entrega (min)']].groupby(['ID do entregador']).mean().astype(int).sort_values(by='Tempo de entrega (min)',ascending=False).reset_index()
-  df_aux.index += 1
-  return df_aux.head(10)
-
 # 8. Tempo médio das entregas por densidade de tráfego
-def tempo_medio_por_tipo_de_trafego(df):
-  df_aux = df.loc[:,['Densidade de tráfego','Tempo de entrega (min)']].groupby('Densidade de tráfego').mean().astype(int).sort_values(by='Tempo de entrega (min)',ascending=True).reset_index()
+@memorizar
+def tempo_medio_por_tipo_de_trafego(cubo):
+  df_aux = sem_cache(consultas.tempo_medio_por_tipo_de_trafego)(cubo)
   fig = px.bar(
     df_aux,
     x='Densidade de tráfego',
@@ -432,8 +506,9 @@ def tempo_medio_por_tipo_de_trafego(df):
   return fig
 
 # 9. Tempo médio das entregas por tipo de área
-def tempo_medio_das_entregas_por_tipo_de_area(df):
-  df_aux = df.loc[:,['Tipo de área','Tempo de entrega (min)']].groupby('Tipo de área').mean().astype(int).sort_values(by='Tempo de entrega (min)',ascending=True).reset_index()
+@memorizar
+def tempo_medio_das_entregas_por_tipo_de_area(cubo):
+  df_aux = sem_cache(consultas.tempo_medio_das_entregas_por_tipo_de_area)(cubo)
   fig = px.bar(
     df_aux,
     x='Tipo de área',
@@ -443,8 +518,9 @@ def tempo_medio_das_entregas_por_tipo_de_area(df):
   return fig
 
 # 10. Tempo médio de entrega por tipo de veículo
-def tempo_medio_de_entrega_por_tipo_de_veiculo(df):
-  df_aux = df.loc[:,['Tipo de veículo','Tempo de entrega (min)']].groupby('Tipo de veículo').mean().astype(int).reset_index()
+@memorizar
+def tempo_medio_de_entrega_por_tipo_de_veiculo(cubo):
+  df_aux = sem_cache(consultas.tempo_medio_de_entrega_por_tipo_de_veiculo)(cubo)
   fig = px.bar(
     df_aux,
     x='Tipo de veículo',
@@ -454,8 +530,9 @@ def tempo_medio_de_entrega_por_tipo_de_veiculo(df):
   return fig
 
 # 11. Tempo médio de entrega por condição do veículo
-def tempo_medio_de_entrega_por_condicao_do_veiculo(df):
-  df_aux = df.loc[:,['Condição do veículo','Tempo de entrega (min)']].groupby('Condição do veículo').mean().astype(int).reset_index()
+@memorizar
+def tempo_medio_de_entrega_por_condicao_do_veiculo(cubo):
+  df_aux = sem_cache(consultas.tempo_medio_de_entrega_por_condicao_do_veiculo)(cubo)
   fig = px.bar(
     df_aux,
     x='Condição do veículo',
@@ -465,8 +542,9 @@ def tempo_medio_de_entrega_por_condicao_do_veiculo(df):
   return fig
 
 # 12. Tempo médio de entrega por idade do entregador
+@memorizar
 def tempo_medio_de_entrega_por_idade_do_entregador(df):
-  df_aux = df.loc[:,['Idade do entregador','Tempo de entrega (min)']].groupby('Idade do entregador').mean().astype(int).reset_index()
+  df_aux = sem_cache(consultas.tempo_medio_de_entrega_por_idade_do_entregador)(df)
   fig = px.bar(
     df_aux,
     x='Idade do entregador',
@@ -476,8 +554,9 @@ def tempo_medio_de_entrega_por_idade_do_entregador(df):
   return fig
 
 # 13. Tempo médio de entrega por entregas multiplas.
+@memorizar
 def tempo_medio_de_entrega_por_entregas_multiplas(df):
-  df_aux = df.loc[:,['Entregas multiplas','Tempo de entrega (min)']].groupby('Entregas multiplas').mean().astype(int).sort_values(by='Tempo de entrega (min)',ascending=True).reset_index()
+  df_aux = sem_cache(consultas.tempo_medio_de_entrega_por_entregas_multiplas)(df)
   fig = px.bar(
     df_aux,
     x='Entregas multiplas',
@@ -487,8 +566,9 @@ def tempo_medio_de_entrega_por_entregas_multiplas(df):
   return fig
 
 # 14. Tempo médio de entrega por avaliação dos entregadores.
+@memorizar
 def tempo_medio_de_entrega_por_avaliacao_dos_entregadores(df):
-  df_aux = df.loc[:,['Avaliação do entregador','Tempo de entrega (min)']].groupby('Avaliação do entregador').mean().astype(int).reset_index()
+  df_aux = sem_cache(consultas.tempo_medio_de_entrega_por_avaliacao_dos_entregadores)(df)
   fig = px.bar(
     df_aux,
     x='Avaliação do entregador',
@@ -498,8 +578,9 @@ def tempo_medio_de_entrega_por_avaliacao_dos_entregadores(df):
   return fig
 
 # 15. Tempo médio de entrega por condição climática.
-def tempo_medio_de_entrega_por_condicao_climatica(df):
-  df_aux = df.loc[:,['Condição climática','Tempo de entrega (min)']].groupby('Condição climática').mean().astype(int).sort_values(by='Tempo de entrega (min)',ascending=True).reset_index()
+@memorizar
+def tempo_medio_de_entrega_por_condicao_climatica(cubo):
+  df_aux = sem_cache(consultas.tempo_medio_de_entrega_por_condicao_climatica)(cubo)
   fig = px.bar(
     df_aux,
     x='Condição climática',
@@ -519,63 +600,56 @@ def tempo_medio_de_entrega_por_condicao_climatica(df):
 # 5. O tempo médio e o desvio padrão de entrega por tipo de área e densidade de tráfego.
 # 6. O tempo médio de entrega durantes os Festivais.
 # 7. O tempo médio e o desvio padrão de entrega por condições climáticas.
+# 8. Os percentis do tempo de entrega por densidade de tráfego.
+# 9. Os indicadores de cada restaurante.
+# 10. Os restaurantes e as entregas em um raio.
+#######################################
+# Todos são valores ou tabelas, de consultas.py.
 #######################################
-
-# 1. A quantidade de entregadores únicos.
-def quantidade_de_entregadores_unicos(df):
-  return df['ID do entregador'].nunique()
-
-# 2. A distância média dos resturantes e dos locais de entrega.
-def distancia_media_dos_restaurantes_e_dos_locais_de_entrega(df):
-    df_aux = df['Distância (km)'].agg(['mean', 'median', 'std']).round(3)
-    df_aux = df_aux.rename(index={'mean': 'Média', 'median': 'Mediana', 'std': 'Desvio Padrão'}).reset_index()
-    df_aux = df_aux.rename(columns={'index': 'Estatística'})
-    df_aux.index += 1
-    return df_aux
-
-# 3. O tempo médio e o desvio padrão de entrega por tipo de área.
-def tempo_medio_e_desvio_padrao_por_tipo_de_area(df):
-  df_aux = df.loc[:,['Tempo de entrega (min)','Tipo de área']].groupby('Tipo de área').agg({'Tempo de entrega (min)':['mean','mean','std']}).round(3).astype(int).reset_index()
-  df_aux.columns=['Tipo de área','Tempo médio de entrega (min)','Mediana','Desvio padrão']
-  df_aux.index += 1
-  return df_aux
-
-# 4. O tempo médio e o desvio padrão de entrega por tipo de pedido.
-def tempo_medio_e_desvio_padrao_por_tipo_de_pedido(df):
-  df_aux = df.loc[:,['Tempo de entrega (min)','Tipo de pedido']].groupby('Tipo de pedido').agg({'Tempo de entrega (min)':['mean','mean','std']}).round(3).astype(int).reset_index()
-  df_aux.columns=['Tipo de pedido','Tempo médio de entrega (min)','Mediana','Desvio padrão']
-  df_aux.index += 1
-  return df_aux
-
-# 5. O tempo médio e o desvio padrão de entrega por densidade de tráfego.
-def tempo_medio_e_desvio_padrao_por_tipo_de_trafego(df):
-  df_aux = df.loc[:,['Tempo de entrega (min)','Densidade de tráfego']].groupby('Densidade de tráfego').agg({'Tempo de entrega (min)':['mean','median','std']}).round(3).astype(int).reset_index()
-  df_aux.columns=['Densidade de tráfego','Tempo médio de entrega (min)','Mediana','Desvio padrão']
-  df_aux.index += 1
-  return df_aux
-
-# 6. O tempo médio e desvio padrão de entrega durantes os Festivais.
-def tempo_medio_e_desvio_padrao_durante_o_festival(df):
-  df_aux = df.loc[:,['Tempo de entrega (min)','Festival']].groupby('Festival').agg({'Tempo de entrega (min)':['mean','median','std']}).round(3).astype(int).reset_index()
-  df_aux.columns=['Festival','Tempo médio de entrega (min)','Mediana','Desvio padrão']
-  df_aux.index += 1
-  return df_aux
-
-# 7. O tempo médio e o desvio padrão de entrega por condições climáticas.
-def tempo_medio_e_desvio_padrao_por_condicao_climatica(df):
-  df_aux = df.loc[:,['Tempo de entrega (min)','Condição climática']].groupby('Condição climática').agg({'Tempo de entrega (min)':['mean','median','std']}).round(3).astype(int).reset_index()
-  df_aux.columns=['Condição climática','Tempo médio de entrega (min)','Mediana','Desvio padrão']
-  df_aux.index += 1
-  return df_aux
 
 ################################################################
 # Botão de Download
 ################################################################
 
-# Função para fazer a requisição e retornar o conteúdo do arquivo
-def download_csv(url):
-  response = requests.get(url)
-  content = response.content.decode("utf-8")
-  return content
+# O arquivo é montado a partir dos dados locais, sem acesso à rede, e só
+# quando o usuário pede (ver curry_company.py).
+################################################################
 
-  
\ No newline at end of file
+# formato -> (extensão do arquivo, tipo MIME)
+FORMATOS_DE_DOWNLOAD = {
+  'CSV': ('.csv', 'text/csv'),
+  'CSV compactado (gzip)': ('.csv.gz', 'application/gzip'),
+  'Parquet': ('.parquet', 'application/octet-stream'),
+}
+
+def _bytes_no_formato(df, formato):
+  if formato == 'Parquet':
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+  conteudo = df.to_csv(index=False).encode('utf-8')
+  if formato == 'CSV compactado (gzip)':
+    return gzip.compress(conteudo)
+  return conteudo
+
+# Os dados limpos e filtrados pela barra lateral, sem as colunas internas (chaves de tempo e células)
+@memorizar
+def arquivo_dos_dados_filtrados(df, formato):
+  return _bytes_no_formato(df.drop(columns=COLUNAS_INTERNAS, errors='ignore'), formato)
+
+@functools.lru_cache(maxsize=len(FORMATOS_DE_DOWNLOAD))
+def _arquivo_original(caminho, tamanho, modificacao, formato):
+  if formato == 'CSV':
+    with open(caminho, 'rb') as arquivo:
+      return arquivo.read()
+  if formato == 'CSV compactado (gzip)':
+    with open(caminho, 'rb') as arquivo:
+      return gzip.compress(arquivo.read())
+  return _bytes_no_formato(pd.read_csv(caminho), formato)
+
+# O CSV bruto, como foi carregado. Refeito apenas se o arquivo mudar no disco.
+def arquivo_original(caminho, formato):
+  estado = os.stat(caminho)
+  return _arquivo_original(caminho, estado.st_size, estado.st_mtime_ns, formato)
+
+  
\ No newline at end of file
@@ -0,0 +1,253 @@
+#######################################
+# Biblioteca
+#######################################
+
+# Manipulação dos dados
+import numpy as np
+import pandas as pd
+
+# Raio médio da Terra, para converter km em graus
+from distancias import RAIO_MEDIO_DA_TERRA
+
+#######################################
+# Configuração
+#######################################
+
+# Nível mais fino da grade: 2^24 colunas de longitude e 2^24 linhas de
+# latitude (células de ~2,4 m por ~1,2 m no equador)
+NIVEL_MAXIMO = 24
+
+# Tamanho de cada célula na tela, em pixels, ao escolher o nível pelo zoom
+PIXELS_POR_CELULA = 32
+
+# Máximo de células enviadas ao navegador; acima disso o nível é reduzido
+LIMITE_DE_CELULAS = 2000
+
+# Colunas com a célula (no nível máximo) de cada ponto, criadas na limpeza
+COLUNAS_DAS_CELULAS = {
+  'entrega': 'Célula da entrega',
+  'restaurante': 'Célula do restaurante',
+}
+COORDENADAS = {
+  'entrega': ('Latitude da entrega', 'Longitude da entrega'),
+  'restaurante': ('Latitude do restaurante', 'Longitude do restaurante'),
+}
+
+#######################################
+# Células
+#######################################
+# Grade hierárquica do tipo geohash: no nível L o mundo é dividido em
+# 2^L x 2^L células, e a chave intercala os bits da coluna e da linha
+# (curva de Morton). A célula de um nível mais grosso é a chave deslocada
+# 2 bits por nível (celulas >> 2), então basta guardar o nível máximo.
+#######################################
+
+def _espalhar_bits(valores):
+  # 32 bits -> posições pares de 64 bits
+  v = valores.astype(np.uint64)
+  v = (v | (v << np.uint64(16))) & np.uint64(0x0000FFFF0000FFFF)
+  v = (v | (v << np.uint64(8))) & np.uint64(0x00FF00FF00FF00FF)
+  v = (v | (v << np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+  v = (v | (v << np.uint64(2))) & np.uint64(0x3333333333333333)
+  v = (v | (v << np.uint64(1))) & np.uint64(0x5555555555555555)
+  return v
+
+def _juntar_bits(valores):
+  # Inverso de _espalhar_bits
+  v = valores.astype(np.uint64) & np.uint64(0x5555555555555555)
+  v = (v | (v >> np.uint64(1))) & np.uint64(0x3333333333333333)
+  v = (v | (v >> np.uint64(2))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+  v = (v | (v >> np.uint64(4))) & np.uint64(0x00FF00FF00FF00FF)
+  v = (v | (v >> np.uint64(8))) & np.uint64(0x0000FFFF0000FFFF)
+  v = (v | (v >> np.uint64(16))) & np.uint64(0x00000000FFFFFFFF)
+  return v
+
+def celulas(latitudes, longitudes, nivel=NIVEL_MAXIMO):
+  '''
+  Chave (int64) da célula de cada coordenada no 'nivel' da grade.
+  '''
+  lados = 1 << nivel
+  latitudes = np.asarray(latitudes, dtype=np.float64)
+  longitudes = np.asarray(longitudes, dtype=np.float64)
+  linha = np.clip(np.floor((latitudes + 90) / 180 * lados), 0, lados - 1)
+  coluna = np.clip(np.floor((longitudes + 180) / 360 * lados), 0, lados - 1)
+  return (_espalhar_bits(coluna) | (_espalhar_bits(linha) << np.uint64(1))).astype(np.int64)
+
+def no_nivel(chaves, nivel):
+  '''
+  Células do nível máximo levadas para um nível mais grosso.
+  '''
+  return np.asarray(chaves) >> (2 * (NIVEL_MAXIMO - nivel))
+
+def centro_da_celula(chaves, nivel):
+  '''
+  (latitudes, longitudes) do centro de cada célula do 'nivel'.
+  '''
+  chaves = np.asarray(chaves).astype(np.uint64)
+  coluna = _juntar_bits(chaves).astype(np.float64)
+  linha = _juntar_bits(chaves >> np.uint64(1)).astype(np.float64)
+  lados = 1 << nivel
+  return (linha + 0.5) / lados * 180 - 90, (coluna + 0.5) / lados * 360 - 180
+
+def tamanho_da_celula(nivel):
+  '''
+  (altura, largura) de uma célula do 'nivel', em graus.
+  '''
+  return 180 / (1 << nivel), 360 / (1 << nivel)
+
+def nivel_para_zoom(zoom, pixels_por_celula=PIXELS_POR_CELULA):
+  '''
+  Nível da grade em que uma célula ocupa cerca de 'pixels_por_celula' na
+  tela, no 'zoom' do Leaflet (um tile de 256 pixels cobre 360 / 2^zoom graus).
+  '''
+  nivel = int(round(zoom + np.log2(256 / pixels_por_celula)))
+  return int(np.clip(nivel, 0, NIVEL_MAXIMO))
+
+def ampliar_limites(limites, margem=0.5):
+  '''
+  Limites (sul, oeste, norte, leste) com 'margem' da altura e da largura a
+  mais de cada lado, arredondados para fora em passos de potência de 2.
+  Pequenos movimentos do mapa caem nos mesmos limites (e no mesmo cache).
+  '''
+  sul, oeste, norte, leste = limites
+  altura, largura = norte - sul, leste - oeste
+  passo = 2.0 ** np.floor(np.log2(max(altura, largura, 1e-9))) / 4
+  return (
+    float(np.floor((sul - margem * altura) / passo) * passo),
+    float(np.floor((oeste - margem * largura) / passo) * passo),
+    float(np.ceil((norte + margem * altura) / passo) * passo),
+    float(np.ceil((leste + margem * largura) / passo) * passo),
+  )
+
+def contem(externos, internos):
+  '''
+  Se os limites 'internos' estão dentro dos 'externos' (None = o mundo todo).
+  '''
+  if externos is None:
+    return True
+  if internos is None:
+    return False
+  return (
+    externos[0] <= internos[0] and externos[1] <= internos[1]
+    and internos[2] <= externos[2] and internos[3] <= externos[3])
+
+def celulas_do_local(df, local='entrega'):
+  '''
+  Células (nível máximo) das entregas ou dos restaurantes, da coluna criada
+  na limpeza ou calculadas a partir das coordenadas.
+  '''
+  coluna = COLUNAS_DAS_CELULAS[local]
+  if coluna in df:
+    return df[coluna].to_numpy()
+  latitude, longitude = COORDENADAS[local]
+  return celulas(df[latitude], df[longitude])
+
+#######################################
+# Agregação por célula
+#######################################
+
+def agregar_celulas(df, local='entrega', nivel=NIVEL_MAXIMO, limites=None, medida=None, limite_de_celulas=LIMITE_DE_CELULAS):
+  '''
+  Uma linha por célula ocupada: a posição média dos pontos, a 'Quantidade'
+  de pedidos e, se 'medida' for informada, a 'Média' da medida.
+  'limites' = (sul, oeste, norte, leste) mantém só as células visíveis no
+  mapa. Se sobrarem mais de 'limite_de_celulas', o nível é reduzido até caber,
+  então o resultado cresce com as células visíveis e não com as linhas.
+  Retorna (DataFrame, nível usado).
+  '''
+  latitude, longitude = COORDENADAS[local]
+  chaves = celulas_do_local(df, local)
+  latitudes = df[latitude].to_numpy(dtype=np.float64)
+  longitudes = df[longitude].to_numpy(dtype=np.float64)
+  valores = df[medida].to_numpy(dtype=np.float64) if medida is not None else None
+
+  if limites is not None:
+    sul, oeste, norte, leste = limites
+    visiveis = (latitudes >= sul) & (latitudes <= norte) & (longitudes >= oeste) & (longitudes <= leste)
+    chaves, latitudes, longitudes = chaves[visiveis], latitudes[visiveis], longitudes[visiveis]
+    if valores is not None:
+      valores = valores[visiveis]
+
+  while True:
+    unicas, posicao = np.unique(no_nivel(chaves, nivel), return_inverse=True)
+    if len(unicas) <= limite_de_celulas or nivel == 0:
+      break
+    nivel -= 1
+
+  quantidade = np.bincount(posicao, minlength=len(unicas))
+  with np.errstate(invalid='ignore', divide='ignore'):
+    df_aux = pd.DataFrame({
+      'Célula': unicas,
+      'Latitude': np.bincount(posicao, latitudes, len(unicas)) / quantidade,
+      'Longitude': np.bincount(posicao, longitudes, len(unicas)) / quantidade,
+      'Quantidade': quantidade,
+    })
+    if valores is not None:
+      df_aux['Média'] = np.bincount(posicao, valores, len(unicas)) / quantidade
+  return df_aux, nivel
+
+#######################################
+# Busca por raio
+#######################################
+# As chaves do nível máximo, ordenadas, formam um índice espacial: as
+# células do nível máximo dentro de uma célula de um nível mais grosso são
+# uma faixa contígua da curva de Morton, então os pontos de qualquer célula
+# saem de duas buscas binárias. Para um raio, o nível é o mais fino em que
+# uma célula cobre o raio; os pontos a menos de 'raio' estão na célula do
+# centro ou nas 8 vizinhas, e só esses candidatos têm a distância calculada.
+#######################################
+
+# Quilômetros por grau de latitude na esfera de raio médio
+KM_POR_GRAU = RAIO_MEDIO_DA_TERRA * np.pi / 180
+
+def construir_indice(chaves):
+  '''
+  Índice espacial das chaves (nível máximo): {'chaves': ordenadas, 'posicoes': posição original de cada uma}.
+  '''
+  chaves = np.asarray(chaves)
+  posicoes = np.argsort(chaves, kind='stable')
+  return {'chaves': chaves[posicoes], 'posicoes': posicoes}
+
+def pontos_na_celula(indice, celula, nivel):
+  '''
+  Posições originais dos pontos dentro da 'celula' do 'nivel'.
+  '''
+  deslocamento = 2 * (NIVEL_MAXIMO - nivel)
+  inicio, fim = np.searchsorted(indice['chaves'], [int(celula) << deslocamento, (int(celula) + 1) << deslocamento])
+  return indice['posicoes'][inicio:fim]
+
+def nivel_para_raio(latitude, raio_km):
+  '''
+  Nível mais fino em que uma célula tem pelo menos 'raio_km' de altura e de
+  largura em toda a faixa de latitudes do círculo.
+  '''
+  if raio_km <= 0:
+    return NIVEL_MAXIMO
+  extremo = min(abs(latitude) + raio_km / KM_POR_GRAU, 90.0)
+  altura, largura = tamanho_da_celula(0)
+  lado = min(altura * KM_POR_GRAU, largura * KM_POR_GRAU * np.cos(np.radians(extremo)))
+  if lado <= raio_km:
+    return 0
+  return int(np.clip(np.floor(np.log2(lado / raio_km)), 0, NIVEL_MAXIMO))
+
+def celulas_vizinhas(latitude, longitude, nivel):
+  '''
+  Chaves da célula do ponto e das vizinhas (até 9) no 'nivel'. A longitude
+  dá a volta no antimeridiano; a latitude para nos polos.
+  '''
+  lados = 1 << nivel
+  linha = int(np.clip(np.floor((latitude + 90) / 180 * lados), 0, lados - 1))
+  coluna = int(np.clip(np.floor((longitude + 180) / 360 * lados), 0, lados - 1))
+  linhas = np.unique(np.clip(linha + np.arange(-1, 2), 0, lados - 1))
+  colunas = np.unique((coluna + np.arange(-1, 2)) % lados)
+  linhas, colunas = np.meshgrid(linhas, colunas)
+  return (_espalhar_bits(colunas.ravel()) | (_espalhar_bits(linhas.ravel()) << np.uint64(1))).astype(np.int64)
+
+def candidatos_no_raio(indice, latitude, longitude, raio_km):
+  '''
+  Posições originais (ordenadas) dos pontos que podem estar a até
+  'raio_km' do ponto; a distância exata fica para quem chama.
+  '''
+  nivel = nivel_para_raio(latitude, raio_km)
+  partes = [pontos_na_celula(indice, celula, nivel) for celula in celulas_vizinhas(latitude, longitude, nivel)]
+  return np.sort(np.concatenate(partes))
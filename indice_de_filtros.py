@@ -0,0 +1,129 @@
+#######################################
+# Biblioteca
+#######################################
+
+# Manipulação dos dados
+import numpy as np
+import pandas as pd
+
+# Índice guardado por DataFrame carregado
+import threading
+import weakref
+
+#######################################
+# Configuração
+#######################################
+
+# Colunas usadas nos filtros da barra lateral
+DIMENSOES_DOS_FILTROS = [
+  'Densidade de tráfego',
+  'Tipo de área',
+  'Condição climática',
+  'Festival',
+]
+
+# Atributo (DataFrame.attrs) com o id do DataFrame de origem, quando os filtros não retiram nenhuma linha
+ATRIBUTO_DA_ORIGEM = 'origem_sem_filtro'
+
+#######################################
+# Construção do índice
+#######################################
+# Para cada valor de cada dimensão guarda um bitmap compactado
+# (np.packbits, 1 bit por linha) com as linhas que têm aquele valor.
+# Linhas sem valor (NaN) não aparecem em nenhum bitmap, assim como o
+# isin() também não as selecionava.
+#######################################
+
+def construir_indice(df, dimensoes=DIMENSOES_DOS_FILTROS):
+  bitmaps = {}
+  for dimensao in dimensoes:
+    categorias = pd.Categorical(df[dimensao])
+    codigos = categorias.codes
+    bitmaps[dimensao] = {
+      valor: np.packbits(codigos == i)
+      for i, valor in enumerate(categorias.categories)
+    }
+  return {'linhas': len(df), 'bitmaps': bitmaps}
+
+_indices = {}
+_trava = threading.Lock()
+
+def obter_indice(df, dimensoes=DIMENSOES_DOS_FILTROS):
+  '''
+  Devolve o índice de 'df', construindo-o apenas na primeira vez que o
+  DataFrame é visto. O índice é descartado junto com o DataFrame.
+  '''
+  chave = id(df)
+  with _trava:
+    entrada = _indices.get(chave)
+  if entrada is not None and entrada[0]() is df:
+    return entrada[1]
+  indice = construir_indice(df, dimensoes)
+  with _trava:
+    _indices[chave] = (weakref.ref(df, lambda _: _indices.pop(chave, None)), indice)
+  return indice
+
+#######################################
+# Seleção
+#######################################
+
+def _selecao_compactada(indice, filtros):
+  n = indice['linhas']
+  selecao = np.full((n + 7) // 8, 0xFF, dtype=np.uint8)
+  for dimensao, valores in filtros.items():
+    bitmaps = indice['bitmaps'][dimensao]
+    da_dimensao = np.zeros_like(selecao)
+    for valor in valores:
+      if valor in bitmaps:
+        np.bitwise_or(da_dimensao, bitmaps[valor], out=da_dimensao)
+    np.bitwise_and(selecao, da_dimensao, out=selecao)
+  return selecao
+
+def selecionar(indice, filtros):
+  '''
+  Máscara booleana das linhas que atendem a todos os filtros.
+  'filtros' é um dicionário {dimensão: valores selecionados}: os bitmaps dos
+  valores de uma dimensão são combinados com OR, e as dimensões com AND,
+  sempre sobre os bitmaps compactados.
+  '''
+  return np.unpackbits(_selecao_compactada(indice, filtros), count=indice['linhas']).view(bool)
+
+def selecionadas(indice, filtros, posicoes):
+  '''
+  Máscara de quais 'posicoes' (linhas) atendem aos filtros, lendo só os bits
+  dessas linhas nos bitmaps compactados (ex.: candidatos de uma busca espacial).
+  '''
+  posicoes = np.asarray(posicoes, dtype=np.int64)
+  selecao = _selecao_compactada(indice, filtros)
+  return ((selecao[posicoes >> 3] >> (7 - (posicoes & 7))) & 1).astype(bool)
+
+def filtrar(df, filtros, indice=None):
+  '''
+  Aplica os filtros com uma única cópia do DataFrame.
+  Se nenhuma linha for retirada, devolve um novo DataFrame sobre as mesmas
+  colunas, sem copiá-las (os dados carregados podem ser somente leitura).
+  '''
+  if indice is None:
+    indice = obter_indice(df)
+  mascara = selecionar(indice, filtros)
+  if mascara.all():
+    copia = df.copy(deep=False)
+    copia.attrs[ATRIBUTO_DA_ORIGEM] = id(df)
+    return copia
+  return df.loc[mascara]
+
+def origem_sem_filtro(df):
+  '''
+  O DataFrame de onde 'df' foi filtrado sem perder nenhuma linha (ver
+  filtrar), ou None. Só encontra DataFrames com o índice guardado
+  (obter_indice), para que os resultados guardados por DataFrame (ex.: os
+  perfis dos entregadores) sirvam também à seleção sem filtros.
+  '''
+  chave = df.attrs.get(ATRIBUTO_DA_ORIGEM)
+  with _trava:
+    entrada = _indices.get(chave)
+  origem = None if entrada is None else entrada[0]()
+  # O mesmo índice de linhas: uma cópia rasa, e não um DataFrame derivado com os mesmos attrs
+  if origem is None or origem.index is not df.index:
+    return None
+  return origem
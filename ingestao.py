@@ -0,0 +1,272 @@
+#######################################
+# Biblioteca
+#######################################
+
+# Manipulação dos dados
+import numpy as np
+import pandas as pd
+
+# Arquivo de funções (ferramentas.py)
+import ferramentas as fr
+
+# Tipos das colunas do DataFrame limpo
+from esquema import aplicar_esquema
+
+# Semana do pedido em inteiros (ano * 100 + semana do ano)
+from periodos import semana_do_pedido
+
+# Esboços de quantis combináveis
+import quantis as qt
+
+# Perfis dos entregadores combináveis
+import entregadores as ent
+
+#######################################
+# Configuração
+#######################################
+
+# Linhas lidas do CSV por vez
+LINHAS_POR_BLOCO = 100_000
+
+# Versão do formato dos acumuladores, gravada junto com eles. Deve ser
+# incrementada sempre que um acumulador for criado ou mudar de formato:
+# acumuladores gravados com outra versão são recalculados (ver
+# armazenamento.carregar_acumuladores), nunca combinados.
+VERSAO_DOS_ACUMULADORES = 5
+
+# Dimensões categóricas com média/desvio padrão acumulados
+DIMENSOES = [
+  'Densidade de tráfego',
+  'Tipo de área',
+  'Condição climática',
+  'Festival',
+  'Tipo de veículo',
+  'Tipo de pedido',
+  'Condição do veículo',
+  'Idade do entregador',
+  'Entregas multiplas',
+]
+
+# Medidas numéricas acumuladas por dimensão
+MEDIDAS = [
+  'Tempo de entrega (min)',
+  'Avaliação do entregador',
+  'Distância (km)',
+]
+
+# Coordenadas das entregas, para a localização central (mediana) de cada grupo
+COORDENADAS = ['Latitude da entrega', 'Longitude da entrega']
+GRUPOS_DAS_COORDENADAS = ['Tipo de área', 'Densidade de tráfego']
+
+# Compressão dos esboços das coordenadas (~500 centróides por grupo). As
+# entregas se concentram nas cidades e a mediana cai entre aglomerados, onde
+# o esboço interpola; com a compressão padrão o erro passa de 0,05 grau.
+COMPRESSAO_DAS_COORDENADAS = 1000
+
+#######################################
+# Leitura em blocos
+#######################################
+
+def ler_em_blocos(caminho, linhas_por_bloco=LINHAS_POR_BLOCO):
+  '''
+  Lê o CSV bruto em blocos e devolve cada bloco já limpo por limpeza_dos_dados.
+  Apenas um bloco fica em memória por vez.
+  '''
+  for bloco in fr.ler_dados(caminho, chunksize=linhas_por_bloco):
+    yield fr.limpeza_dos_dados(bloco)
+
+#######################################
+# Acumuladores
+#######################################
+# Cada acumulador guarda apenas contagens, somas e momentos, que podem ser
+# combinados entre blocos (ou entre processos) sem voltar às linhas:
+# - 'pedidos_por_dia': quantidade de pedidos por data
+# - 'pedidos_por_semana': quantidade de pedidos por semana, com a chave
+#   ano * 100 + semana do ano (periodos.semana_do_pedido): a mesma semana de
+#   anos diferentes não se mistura
+# - 'entregadores_por_semana': pedidos por (semana, entregador)
+# - 'entregadores': quantidade e somas das medidas por entregador
+# - 'estatisticas': {dimensão: quantidade, média e M2 de cada medida por categoria}
+# - 'coordenadas': esboços t-digest das coordenadas das entregas por tipo de
+#   área e densidade de tráfego; o tamanho não cresce com as linhas.
+# - 'quantis': esboços t-digest das medidas por grupo (quantis.py); medianas
+#   e percentis aproximados de qualquer dimensão dos esboços.
+# - 'perfis': perfil de cada entregador (entregadores.py): entregas, idade,
+#   veículo, avaliação, tempo e distância, e os pedidos por valor de idade,
+#   avaliação, veículo e tipo de área.
+#######################################
+
+def novos_acumuladores():
+  return {
+    'versao': VERSAO_DOS_ACUMULADORES,
+    'linhas': 0,
+    'pedidos_por_dia': pd.Series(dtype='int64'),
+    'pedidos_por_semana': pd.Series(dtype='int64'),
+    'entregadores_por_semana': pd.Series(dtype='int64'),
+    'entregadores': pd.DataFrame(),
+    'estatisticas': {},
+    'coordenadas': pd.DataFrame(),
+    'quantis': pd.DataFrame(),
+    'perfis': pd.DataFrame(),
+  }
+
+def _momentos(df, chave, medidas):
+  '''
+  Quantidade, média e soma dos quadrados dos desvios (M2) de cada medida por 'chave'.
+  '''
+  grupos = df.groupby(chave, observed=True)[medidas]
+  n = grupos.count()
+  media = grupos.mean()
+  m2 = grupos.var(ddof=0) * n
+  return pd.concat({'n': n, 'media': media, 'm2': m2}, axis=1)
+
+def _combinar_momentos(a, b):
+  '''
+  Combina dois conjuntos de momentos (algoritmo paralelo de Chan et al.),
+  numericamente estável mesmo com muitos blocos.
+  '''
+  if a.empty:
+    return b
+  if b.empty:
+    return a
+  a, b = a.align(b, fill_value=0)
+  n = a['n'] + b['n']
+  delta = b['media'] - a['media']
+  with np.errstate(invalid='ignore', divide='ignore'):
+    peso_b = (b['n'] / n).fillna(0)
+    media = a['media'] + delta * peso_b
+    m2 = a['m2'] + b['m2'] + delta**2 * a['n'] * peso_b
+  return pd.concat({'n': n, 'media': media, 'm2': m2}, axis=1)
+
+def _somar(a, b):
+  if a.empty:
+    return b
+  return a.add(b, fill_value=0)
+
+def agregar_bloco(df, dimensoes=DIMENSOES, medidas=MEDIDAS):
+  '''
+  Acumuladores de um único bloco limpo.
+  '''
+  semana = semana_do_pedido(df['Data do pedido'])
+  acumuladores = novos_acumuladores()
+  acumuladores['linhas'] = len(df)
+  acumuladores['pedidos_por_dia'] = df.groupby('Data do pedido').size()
+  acumuladores['pedidos_por_semana'] = semana.groupby(semana).size().rename_axis('Semana')
+  entregador = df['ID do entregador'].astype(str)
+  acumuladores['entregadores_por_semana'] = (
+    pd.Series(1, index=pd.MultiIndex.from_arrays([semana, entregador], names=['Semana', 'ID do entregador']))
+    .groupby(level=[0, 1]).size())
+  acumuladores['entregadores'] = pd.concat({
+    'n': df.groupby(entregador)[medidas].count(),
+    'soma': df.groupby(entregador)[medidas].sum(),
+  }, axis=1)
+  acumuladores['estatisticas'] = {
+    dimensao: _momentos(df, dimensao, medidas) for dimensao in dimensoes
+  }
+  acumuladores['coordenadas'] = qt.construir_esbocos(
+    df, GRUPOS_DAS_COORDENADAS, COORDENADAS, COMPRESSAO_DAS_COORDENADAS)
+  acumuladores['quantis'] = qt.construir_esbocos(df)
+  acumuladores['perfis'] = ent.construir_perfis(df)
+  return acumuladores
+
+def combinar_acumuladores(a, b):
+  '''
+  Junta dois acumuladores. A ordem não importa, então os blocos podem ser
+  agregados em qualquer ordem ou em processos diferentes. Levanta
+  ValueError se algum deles for de outra versão do formato.
+  '''
+  for acumuladores in (a, b):
+    if acumuladores.get('versao') != VERSAO_DOS_ACUMULADORES:
+      raise ValueError('Acumuladores da versão {} (a atual é {}): recalcule-os a partir dos dados'.format(
+        acumuladores.get('versao'), VERSAO_DOS_ACUMULADORES))
+  return {
+    'versao': VERSAO_DOS_ACUMULADORES,
+    'linhas': a['linhas'] + b['linhas'],
+    'pedidos_por_dia': _somar(a['pedidos_por_dia'], b['pedidos_por_dia']),
+    'pedidos_por_semana': _somar(a['pedidos_por_semana'], b['pedidos_por_semana']),
+    'entregadores_por_semana': _somar(a['entregadores_por_semana'], b['entregadores_por_semana']),
+    'entregadores': _somar(a['entregadores'], b['entregadores']),
+    'estatisticas': {
+      dimensao: _combinar_momentos(
+        a['estatisticas'].get(dimensao, pd.DataFrame()),
+        b['estatisticas'].get(dimensao, pd.DataFrame()))
+      for dimensao in {**a['estatisticas'], **b['estatisticas']}
+    },
+    'coordenadas': qt.combinar_esbocos(a['coordenadas'], b['coordenadas'], COMPRESSAO_DAS_COORDENADAS),
+    'quantis': qt.combinar_esbocos(a['quantis'], b['quantis']),
+    'perfis': ent.combinar_perfis(a['perfis'], b['perfis']),
+  }
+
+def agregar_csv(caminho, linhas_por_bloco=LINHAS_POR_BLOCO, dimensoes=DIMENSOES, medidas=MEDIDAS):
+  '''
+  Percorre o CSV em blocos e devolve os acumuladores de todo o arquivo.
+  A memória usada depende do tamanho do bloco e da quantidade de categorias,
+  e não do tamanho do arquivo.
+  '''
+  acumuladores = novos_acumuladores()
+  for bloco in ler_em_blocos(caminho, linhas_por_bloco):
+    acumuladores = combinar_acumuladores(acumuladores, agregar_bloco(bloco, dimensoes, medidas))
+  return acumuladores
+
+#######################################
+# Leitura dos acumuladores
+#######################################
+
+def media_e_desvio_padrao(acumuladores, dimensao, medida):
+  '''
+  Quantidade, média e desvio padrão (amostral, como o pandas) de 'medida' por 'dimensao'.
+  '''
+  momentos = acumuladores['estatisticas'][dimensao]
+  n = momentos[('n', medida)]
+  with np.errstate(invalid='ignore', divide='ignore'):
+    desvio = np.sqrt(momentos[('m2', medida)] / (n - 1))
+  return pd.DataFrame({
+    'Quantidade': n.astype('int64'),
+    'Média': momentos[('media', medida)],
+    'Desvio padrão': desvio,
+  }).rename_axis(dimensao)
+
+def quantis_por_dimensao(acumuladores, dimensao, medida, quantis=(0.5, 0.9, 0.99)):
+  '''
+  Quantidade, média, desvio padrão e os 'quantis' (aproximados) de 'medida'
+  por 'dimensao', que deve ser uma das dimensões dos esboços (quantis.py).
+  '''
+  return qt.agregar_esbocos(acumuladores['quantis'], dimensao, medida, quantis).set_index(dimensao)
+
+def media_por_entregador(acumuladores, medida='Tempo de entrega (min)'):
+  entregadores = acumuladores['entregadores']
+  return pd.DataFrame({
+    'Quantidade': entregadores[('n', medida)].astype('int64'),
+    medida: entregadores[('soma', medida)] / entregadores[('n', medida)],
+  }).rename_axis('ID do entregador')
+
+def perfis_dos_entregadores(acumuladores):
+  '''
+  Tabela dos perfis dos entregadores (entregadores.tabela_dos_perfis), indexada pelo ID.
+  '''
+  return ent.tabela_dos_perfis(acumuladores['perfis'])
+
+def pedidos_por_entregador_por_semana(acumuladores):
+  '''
+  Pedidos por entregador em cada semana, indexados pela chave ano * 100 +
+  semana (os rótulos vêm de periodos.rotulos_do_periodo).
+  '''
+  pares = acumuladores['entregadores_por_semana']
+  entregadores = pares.groupby(level='Semana').size()
+  return (acumuladores['pedidos_por_semana'] / entregadores).rename('Pedido por entregador')
+
+def localizacao_central(acumuladores):
+  '''
+  Mediana das coordenadas das entregas por tipo de área e densidade de tráfego,
+  como em ferramentas.localizacao_central_por_area_e_trafego, mas aproximada
+  pelos esboços (cerca de 0,02 grau no curry.csv).
+  '''
+  colunas = {
+    coordenada: qt.agregar_esbocos(
+      acumuladores['coordenadas'], GRUPOS_DAS_COORDENADAS, coordenada, (0.5,), COMPRESSAO_DAS_COORDENADAS)
+    .set_index(GRUPOS_DAS_COORDENADAS)['Mediana']
+    for coordenada in COORDENADAS
+  }
+  # Ao somar blocos os níveis do índice perdem a ordem das categorias; o esquema a devolve
+  df_aux = aplicar_esquema(pd.DataFrame(colunas).reset_index())
+  return df_aux.sort_values(GRUPOS_DAS_COORDENADAS).reset_index(drop=True)
@@ -0,0 +1,322 @@
+#######################################
+# Biblioteca
+#######################################
+
+# Manipulação dos dados
+import pandas as pd
+
+# Medições
+import contextlib
+import functools
+import importlib
+import importlib.util
+import io
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+#######################################
+# Configuração
+#######################################
+
+# Ferramentas de perfil para uma execução (o pyinstrument é opcional)
+PERFILADORES = ['cProfile', 'pyinstrument']
+
+# Linhas do relatório do cProfile
+LINHAS_DO_PERFIL = 40
+
+# Prefixo das métricas no formato do Prometheus
+PREFIXO_DAS_METRICAS = 'curry'
+
+#######################################
+# Registro de cada execução
+#######################################
+# Cada rerun do Streamlit roda em uma thread; o registro da execução fica
+# na thread, então sessões simultâneas não misturam as suas medições.
+# Sem uma execução iniciada (benchmark, scripts), etapa() e as funções
+# cronometradas não medem nada e não custam nada.
+#######################################
+
+_local = threading.local()
+
+def _memoria_residente():
+  '''
+  Memória residente do processo em bytes, ou None fora do Linux.
+  '''
+  try:
+    with open('/proc/self/statm') as arquivo:
+      return int(arquivo.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+  except (OSError, ValueError, AttributeError):
+    return None
+
+def iniciar_execucao():
+  _local.registro = {'inicio': time.time(), 'etapas': []}
+  _local.nivel = 0
+  return _local.registro
+
+def registro_atual():
+  return getattr(_local, 'registro', None)
+
+@contextlib.contextmanager
+def etapa(nome, categoria='outros', linhas=None):
+  '''
+  Mede o tempo, a variação da memória residente e a quantidade de linhas de
+  uma etapa. O dicionário devolvido pode receber 'linhas' e 'detalhe'
+  depois que a etapa conhecê-los. Etapas podem ser aninhadas: 'proprios' é o
+  tempo da etapa sem o das etapas internas.
+  '''
+  registro = registro_atual()
+  if registro is None:
+    yield {}
+    return
+  medida = {'etapa': nome, 'categoria': categoria, 'nivel': _local.nivel, 'linhas': linhas, 'detalhe': None}
+  registro['etapas'].append(medida)
+  memoria = _memoria_residente()
+  internas = len(registro['etapas'])
+  _local.nivel += 1
+  inicio = time.perf_counter()
+  try:
+    yield medida
+  finally:
+    medida['segundos'] = time.perf_counter() - inicio
+    _local.nivel -= 1
+    filhas = [
+      interna['segundos'] for interna in registro['etapas'][internas:]
+      if interna['nivel'] == medida['nivel'] + 1 and 'segundos' in interna]
+    # Etapas internas calculadas em paralelo (juntar_etapas) podem somar mais que a etapa
+    medida['proprios'] = max(medida['segundos'] - sum(filhas), 0.0)
+    depois = _memoria_residente()
+    medida['memoria_mb'] = None if memoria is None or depois is None else (depois - memoria) / 2**20
+
+def _linhas(args):
+  if args and hasattr(args[0], 'shape'):
+    return int(args[0].shape[0])
+  return None
+
+def cronometrar(funcao, categoria='outros', nome=None):
+  '''
+  Versão de 'funcao' medida como uma etapa de 'categoria'.
+  As linhas registradas são as do primeiro argumento (DataFrame).
+  '''
+  nome = nome or funcao.__name__
+  @functools.wraps(funcao)
+  def envoltorio(*args, **kwargs):
+    if registro_atual() is None:
+      return funcao(*args, **kwargs)
+    with etapa(nome, categoria, _linhas(args)):
+      return funcao(*args, **kwargs)
+  return envoltorio
+
+class _ModuloCronometrado:
+  '''
+  Acesso a um módulo em que toda função chamada é medida como uma etapa.
+  Classes e demais atributos são devolvidos sem alteração.
+  Se o módulo for informado pelo nome, só é importado no primeiro acesso.
+  '''
+  def __init__(self, modulo, categoria):
+    self._modulo = modulo
+    self._categoria = categoria
+    self._funcoes = {}
+
+  def __getattr__(self, nome):
+    if isinstance(self._modulo, str):
+      self._modulo = importlib.import_module(self._modulo)
+    valor = getattr(self._modulo, nome)
+    if not callable(valor) or isinstance(valor, type):
+      return valor
+    if nome not in self._funcoes:
+      self._funcoes[nome] = cronometrar(valor, self._categoria, nome)
+    return self._funcoes[nome]
+
+def cronometrar_modulo(modulo, categoria):
+  return _ModuloCronometrado(modulo, categoria)
+
+#######################################
+# Etapas de outras threads
+#######################################
+# As threads de um pool (paineis.calcular_em_paralelo) não têm o registro
+# da execução. Cada tarefa é medida em um registro próprio, e a thread da
+# execução junta as etapas ao seu registro quando a tarefa termina.
+#######################################
+
+def medir_tarefa(funcao, *args, **kwargs):
+  '''
+  Executa 'funcao' em um registro próprio da thread atual e devolve
+  (resultado, etapas medidas). O registro anterior da thread é restaurado.
+  '''
+  anterior, nivel = registro_atual(), getattr(_local, 'nivel', 0)
+  registro = iniciar_execucao()
+  try:
+    return funcao(*args, **kwargs), registro['etapas']
+  finally:
+    _local.registro, _local.nivel = anterior, nivel
+
+def juntar_etapas(etapas):
+  '''
+  Junta ao registro da thread atual as 'etapas' de medir_tarefa, abaixo da
+  etapa aberta no momento.
+  '''
+  registro = registro_atual()
+  if registro is None:
+    return
+  for medida in etapas:
+    registro['etapas'].append(dict(medida, nivel=medida['nivel'] + _local.nivel))
+
+#######################################
+# Fim da execução e exportação
+#######################################
+
+# Totais do processo por (etapa, categoria), para as métricas do Prometheus
+_totais = {}
+_execucoes = {'quantidade': 0, 'segundos': 0.0}
+_trava = threading.Lock()
+
+def finalizar_execucao():
+  '''
+  Encerra a execução da thread: soma as etapas aos totais do processo e
+  grava o registro como uma linha JSON no log (nível INFO).
+  '''
+  registro = registro_atual()
+  if registro is None:
+    return None
+  _local.registro = None
+  registro['segundos'] = time.time() - registro['inicio']
+  registro['memoria_residente_mb'] = (_memoria_residente() or 0) / 2**20
+  with _trava:
+    _execucoes['quantidade'] += 1
+    _execucoes['segundos'] += registro['segundos']
+    for medida in registro['etapas']:
+      chave = (medida['etapa'], medida['categoria'])
+      total = _totais.setdefault(chave, {'quantidade': 0, 'segundos': 0.0, 'proprios': 0.0, 'linhas': 0})
+      total['quantidade'] += 1
+      total['segundos'] += medida.get('segundos', 0.0)
+      total['proprios'] += medida.get('proprios', 0.0)
+      total['linhas'] += medida['linhas'] or 0
+  if logger.isEnabledFor(logging.INFO):
+    logger.info(para_json(registro))
+  return registro
+
+def para_json(registro):
+  return json.dumps(registro, ensure_ascii=False, default=str)
+
+def tabela(registro):
+  '''
+  DataFrame com uma linha por etapa, com o nome recuado pelo aninhamento.
+  '''
+  df_aux = pd.DataFrame(registro['etapas'], columns=['etapa', 'categoria', 'nivel', 'segundos', 'proprios', 'linhas', 'memoria_mb', 'detalhe'])
+  df_aux['etapa'] = [' ' * 4 * nivel + etapa for etapa, nivel in zip(df_aux['etapa'], df_aux['nivel'])]
+  df_aux = df_aux.drop(columns='nivel').rename(columns={
+    'etapa': 'Etapa',
+    'categoria': 'Categoria',
+    'segundos': 'Tempo (ms)',
+    'proprios': 'Tempo próprio (ms)',
+    'linhas': 'Linhas',
+    'memoria_mb': 'Memória (MB)',
+    'detalhe': 'Detalhe',
+  })
+  df_aux[['Tempo (ms)', 'Tempo próprio (ms)']] *= 1000
+  return df_aux.round(2)
+
+def _rotulos(**rotulos):
+  texto = ','.join(
+    '{}="{}"'.format(nome, str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+    for nome, valor in rotulos.items())
+  return '{' + texto + '}'
+
+def metricas_prometheus():
+  '''
+  Totais do processo no formato de texto do Prometheus.
+  '''
+  p = PREFIXO_DAS_METRICAS
+  linhas = [
+    '# HELP {}_execucoes_segundos Duração das execuções do painel.'.format(p),
+    '# TYPE {}_execucoes_segundos summary'.format(p),
+  ]
+  with _trava:
+    linhas.append('{}_execucoes_segundos_sum {}'.format(p, _execucoes['segundos']))
+    linhas.append('{}_execucoes_segundos_count {}'.format(p, _execucoes['quantidade']))
+    totais = sorted(_totais.items())
+    linhas += [
+      '# HELP {}_etapa_segundos Tempo gasto em cada etapa, incluindo as etapas internas.'.format(p),
+      '# TYPE {}_etapa_segundos summary'.format(p)]
+    for (nome, categoria), total in totais:
+      rotulos = _rotulos(etapa=nome, categoria=categoria)
+      linhas.append('{}_etapa_segundos_sum{} {}'.format(p, rotulos, total['segundos']))
+      linhas.append('{}_etapa_segundos_count{} {}'.format(p, rotulos, total['quantidade']))
+    linhas += [
+      '# HELP {}_etapa_segundos_proprios_total Tempo gasto em cada etapa, sem as etapas internas.'.format(p),
+      '# TYPE {}_etapa_segundos_proprios_total counter'.format(p)]
+    for (nome, categoria), total in totais:
+      linhas.append('{}_etapa_segundos_proprios_total{} {}'.format(p, _rotulos(etapa=nome, categoria=categoria), total['proprios']))
+    linhas += [
+      '# HELP {}_etapa_linhas_total Linhas processadas em cada etapa.'.format(p),
+      '# TYPE {}_etapa_linhas_total counter'.format(p)]
+    for (nome, categoria), total in totais:
+      linhas.append('{}_etapa_linhas_total{} {}'.format(p, _rotulos(etapa=nome, categoria=categoria), total['linhas']))
+  memoria = _memoria_residente()
+  if memoria is not None:
+    linhas += [
+      '# HELP {}_memoria_residente_bytes Memória residente do processo.'.format(p),
+      '# TYPE {}_memoria_residente_bytes gauge'.format(p),
+      '{}_memoria_residente_bytes {}'.format(p, memoria)]
+  return '\n'.join(linhas) + '\n'
+
+def limpar():
+  with _trava:
+    _totais.clear()
+    _execucoes.update(quantidade=0, segundos=0.0)
+
+#######################################
+# Perfil de uma execução
+#######################################
+# Opcional: o pyinstrument só é importado quando escolhido.
+#######################################
+
+def perfiladores_disponiveis():
+  '''
+  Os PERFILADORES que podem ser importados neste ambiente.
+  '''
+  return [perfilador for perfilador in PERFILADORES if importlib.util.find_spec(perfilador) is not None]
+
+def iniciar_perfil(perfilador):
+  '''
+  Começa a perfilar a thread atual com 'perfilador' ('cProfile' ou
+  'pyinstrument'). Retorna o objeto a ser passado para terminar_perfil, ou
+  None se 'perfilador' for None.
+  '''
+  if perfilador is None:
+    return None
+  if perfilador == 'pyinstrument':
+    try:
+      from pyinstrument import Profiler
+    except ImportError as erro:
+      raise ImportError('O pyinstrument é opcional: instale com "pip install pyinstrument".') from erro
+    perfil = Profiler()
+    perfil.start()
+  elif perfilador == 'cProfile':
+    import cProfile
+    perfil = cProfile.Profile()
+    perfil.enable()
+  else:
+    raise ValueError('Perfilador desconhecido: {} (use {})'.format(perfilador, PERFILADORES))
+  return (perfilador, perfil)
+
+def terminar_perfil(perfil):
+  '''
+  Encerra o perfil e retorna o relatório em texto.
+  '''
+  if perfil is None:
+    return None
+  perfilador, perfil = perfil
+  if perfilador == 'pyinstrument':
+    perfil.stop()
+    return perfil.output_text(unicode=True)
+  import pstats
+  perfil.disable()
+  saida = io.StringIO()
+  pstats.Stats(perfil, stream=saida).sort_stats('cumulative').print_stats(LINHAS_DO_PERFIL)
+  return saida.getvalue()
@@ -0,0 +1,209 @@
+#######################################
+# Biblioteca
+#######################################
+
+# Manipulação dos dados
+import numpy as np
+import pandas as pd
+
+# Arquivo de funções (ferramentas.py)
+import ferramentas as fr
+
+# Tipos das colunas do DataFrame limpo
+from esquema import ESQUEMA
+
+# Partes gravadas em Parquet
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Processos e arquivos
+import argparse
+import concurrent.futures
+import io
+import os
+import time
+
+#######################################
+# Configuração
+#######################################
+
+# Tamanho de cada bloco do CSV, em bytes (alinhado ao fim de uma linha)
+TAMANHO_DO_BLOCO = 64 << 20
+
+# Processos usados quando nenhum é informado (um por núcleo)
+PROCESSOS = os.cpu_count() or 1
+
+# A partir deste tamanho o cache dos dados (cache_dos_dados.py) limpa o CSV em paralelo
+TAMANHO_PARA_PARALELO = 256 << 20
+
+#######################################
+# Blocos do CSV
+#######################################
+# O CSV é dividido em faixas de bytes que terminam sempre no fim de uma
+# linha. Cada processo lê só a sua faixa, com o cabeçalho na frente. O
+# curry.csv não tem quebras de linha dentro de campos entre aspas, então
+# uma quebra de linha é sempre o fim de um registro.
+#######################################
+
+def blocos_do_arquivo(caminho, tamanho_do_bloco=TAMANHO_DO_BLOCO):
+  '''
+  Retorna (cabeçalho em bytes, [(início, fim), ...]) com as faixas de bytes
+  de cada bloco, depois do cabeçalho.
+  '''
+  tamanho = os.path.getsize(caminho)
+  with open(caminho, 'rb') as arquivo:
+    cabecalho = arquivo.readline()
+    inicio = arquivo.tell()
+    faixas = []
+    while inicio < tamanho:
+      arquivo.seek(min(inicio + tamanho_do_bloco, tamanho))
+      # Avança até o fim da linha em que a faixa caiu
+      arquivo.readline()
+      fim = min(arquivo.tell(), tamanho)
+      faixas.append((inicio, fim))
+      inicio = fim
+  return cabecalho, faixas
+
+def _limpar_bloco(caminho, cabecalho, inicio, fim, destino=None, numero=0):
+  '''
+  Lê e limpa uma faixa do CSV (executado em um processo do pool).
+  Retorna (linhas brutas, DataFrame limpo) ou, com 'destino', (linhas
+  brutas, arquivo Parquet gravado).
+  '''
+  with open(caminho, 'rb') as arquivo:
+    arquivo.seek(inicio)
+    dados = arquivo.read(fim - inicio)
+  bruto = fr.ler_dados(io.BytesIO(cabecalho + dados))
+  df = fr.limpeza_dos_dados(bruto)
+  if destino is None:
+    return len(bruto), df
+  arquivo_da_parte = os.path.join(destino, 'parte-{:05d}.parquet'.format(numero))
+  df.to_parquet(arquivo_da_parte, index=False)
+  return len(bruto), arquivo_da_parte
+
+#######################################
+# Junção dos blocos
+#######################################
+
+def unificar_categorias(partes):
+  '''
+  Dá às colunas categóricas com categorias vindas dos dados (ex.: 'ID do
+  entregador') as mesmas categorias em todas as partes: a união, em ordem
+  alfabética, como na limpeza feita de uma vez. As demais categorias são
+  fixas no esquema e já são iguais.
+  '''
+  partes = list(partes)
+  for coluna, tipo in ESQUEMA.items():
+    if not isinstance(tipo, pd.CategoricalDtype) or tipo.categories is not None:
+      continue
+    if not partes or coluna not in partes[0].columns:
+      continue
+    categorias = pd.Index(np.unique(np.concatenate(
+      [parte[coluna].cat.categories.to_numpy(dtype=object) for parte in partes])))
+    unificado = pd.CategoricalDtype(categorias, ordered=tipo.ordered)
+    for parte in partes:
+      parte[coluna] = parte[coluna].cat.set_categories(unificado.categories)
+  return partes
+
+def juntar_partes(partes, linhas_brutas):
+  '''
+  Concatena as partes limpas na ordem do arquivo. O índice de cada parte é
+  deslocado pelas linhas brutas das partes anteriores, então as linhas
+  mantêm o índice que teriam na limpeza feita de uma vez.
+  '''
+  deslocamento = np.r_[0, np.cumsum(linhas_brutas)[:-1]]
+  partes = unificar_categorias(partes)
+  for parte, inicio in zip(partes, deslocamento):
+    parte.index = parte.index + int(inicio)
+  return pd.concat(partes)
+
+def _arquivos_das_partes(destino):
+  return sorted(
+    os.path.join(destino, nome) for nome in os.listdir(destino)
+    if nome.startswith('parte-') and nome.endswith('.parquet'))
+
+def ler_partes(destino=None, arquivos=None):
+  '''
+  Lê as partes gravadas por limpar_em_paralelo(..., destino=...), na ordem.
+  'arquivos' é a lista devolvida por limpar_em_paralelo; sem ela são lidas
+  todas as partes de 'destino'.
+  '''
+  if arquivos is None:
+    arquivos = _arquivos_das_partes(destino)
+  # Textos voltam como string[pyarrow], o tipo do esquema
+  tipos = {pa.string(): pd.StringDtype('pyarrow')}.get
+  partes = unificar_categorias(
+    pq.read_table(arquivo).to_pandas(types_mapper=tipos) for arquivo in arquivos)
+  return pd.concat(partes, ignore_index=True)
+
+#######################################
+# Limpeza em paralelo
+#######################################
+
+def limpar_em_paralelo(caminho, processos=PROCESSOS, tamanho_do_bloco=TAMANHO_DO_BLOCO, destino=None, contexto=None):
+  '''
+  Limpa o CSV bruto 'caminho' em um pool de 'processos', um bloco de
+  'tamanho_do_bloco' bytes por vez.
+  # 1. Divide o arquivo em faixas de bytes alinhadas ao fim das linhas.
+  # 2. Cada processo lê e limpa as suas faixas (ler_dados + limpeza_dos_dados).
+  # 3. Sem 'destino', junta as partes na ordem do arquivo, com as mesmas
+  #    categorias e o mesmo índice da limpeza feita de uma vez.
+  #    Com 'destino', cada processo grava a sua parte em Parquet e a função
+  #    retorna a lista dos arquivos (ver ler_partes), sem juntar nada na memória.
+  #    As partes de execuções anteriores em 'destino' são apagadas antes.
+  'contexto' é o contexto do multiprocessing ('fork', 'spawn' ...); None usa o padrão.
+  '''
+  cabecalho, faixas = blocos_do_arquivo(caminho, tamanho_do_bloco)
+  if destino is not None:
+    os.makedirs(destino, exist_ok=True)
+    # Partes antigas (ex.: de outro tamanho de bloco) não podem se misturar às novas
+    for arquivo in _arquivos_das_partes(destino):
+      os.remove(arquivo)
+  if contexto is not None:
+    import multiprocessing
+    contexto = multiprocessing.get_context(contexto)
+
+  with concurrent.futures.ProcessPoolExecutor(max_workers=processos, mp_context=contexto) as executor:
+    futuros = [
+      executor.submit(_limpar_bloco, caminho, cabecalho, inicio, fim, destino, numero)
+      for numero, (inicio, fim) in enumerate(faixas)]
+    resultados = [futuro.result() for futuro in futuros]
+
+  linhas_brutas = [linhas for linhas, _ in resultados]
+  if destino is not None:
+    return [arquivo for _, arquivo in resultados]
+  if not resultados:
+    return fr.limpeza_dos_dados(fr.ler_dados(io.BytesIO(cabecalho)))
+  return juntar_partes([parte for _, parte in resultados], linhas_brutas)
+
+#######################################
+# Linha de comando
+#######################################
+
+def main(argumentos=None):
+  parser = argparse.ArgumentParser(description='Limpeza do CSV bruto em vários processos.')
+  parser.add_argument('caminho', help='CSV bruto (formato do curry.csv)')
+  parser.add_argument('--processos', type=int, default=PROCESSOS)
+  parser.add_argument('--bloco-mb', type=int, default=TAMANHO_DO_BLOCO >> 20, help='tamanho de cada bloco em MB')
+  parser.add_argument('--destino', help='diretório onde gravar as partes em Parquet')
+  parser.add_argument('--comparar', action='store_true', help='confere o resultado com a limpeza em um único processo')
+  argumentos = parser.parse_args(argumentos)
+
+  inicio = time.perf_counter()
+  resultado = limpar_em_paralelo(argumentos.caminho, argumentos.processos, argumentos.bloco_mb << 20, argumentos.destino)
+  segundos = time.perf_counter() - inicio
+  df = ler_partes(arquivos=resultado) if argumentos.destino else resultado
+  megabytes = os.path.getsize(argumentos.caminho) / 2**20
+  print('{} linhas limpas em {:.2f} s ({:.1f} MB/s, {} processos)'.format(len(df), segundos, megabytes / segundos, argumentos.processos))
+
+  if argumentos.comparar:
+    inicio = time.perf_counter()
+    esperado = fr.limpeza_dos_dados(fr.ler_dados(argumentos.caminho))
+    print('Um único processo: {:.2f} s'.format(time.perf_counter() - inicio))
+    if argumentos.destino:
+      esperado = esperado.reset_index(drop=True)
+    pd.testing.assert_frame_equal(df, esperado)
+    print('Resultado igual ao da limpeza em um único processo.')
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,159 @@
+#######################################
+# Biblioteca
+#######################################
+
+# Manipulação dos dados
+import numpy as np
+import pandas as pd
+
+# Cache
+from collections import OrderedDict
+import functools
+import hashlib
+import sys
+import threading
+
+#######################################
+# Configuração
+#######################################
+
+# Memória máxima ocupada pelos resultados guardados
+ORCAMENTO_EM_BYTES = 64 * 1024 * 1024
+
+# Atributo (DataFrame.attrs) com a impressão digital dos dados e dos filtros
+ATRIBUTO_DA_CHAVE = 'chave_dos_filtros'
+
+#######################################
+# Impressão digital dos filtros
+#######################################
+# A chave não depende do conteúdo do DataFrame: é a versão dos dados
+# carregados (a chave do cache_dos_dados) mais a seleção da barra lateral.
+#######################################
+
+def impressao_dos_filtros(versao_dos_dados, filtros):
+  texto = repr((versao_dos_dados, sorted((dimensao, sorted(valores)) for dimensao, valores in filtros.items())))
+  return hashlib.sha1(texto.encode()).hexdigest()[:16]
+
+def marcar(dados, chave):
+  '''
+  Guarda a impressão digital em 'dados' para que as funções memorizadas a encontrem.
+  '''
+  dados.attrs[ATRIBUTO_DA_CHAVE] = chave
+  return dados
+
+#######################################
+# Cache LRU com orçamento de memória
+#######################################
+
+_resultados = OrderedDict()   # chave -> (valor guardado, tamanho em bytes)
+_trava = threading.Lock()
+_contadores = {'acertos': 0, 'falhas': 0, 'despejos': 0, 'bytes': 0}
+_orcamento = [ORCAMENTO_EM_BYTES]
+
+def _e_figura(valor):
+  # Sem o plotly já importado nenhum valor pode ser uma figura; não o importa só para verificar
+  basedatatypes = sys.modules.get('plotly.basedatatypes')
+  return basedatatypes is not None and isinstance(valor, basedatatypes.BaseFigure)
+
+def _tamanho(valor):
+  '''
+  Bytes ocupados por 'valor': arrays pelo nbytes, objetos do pandas pelo
+  memory_usage, e dicionários, listas e tuplas (ex.: um índice espacial)
+  somando os seus elementos. sys.getsizeof não conta os dados de um array
+  guardado dentro de um dicionário.
+  '''
+  if isinstance(valor, np.ndarray):
+    return valor.nbytes
+  if isinstance(valor, pd.DataFrame):
+    return int(valor.memory_usage(deep=True).sum())
+  if isinstance(valor, (pd.Series, pd.Index)):
+    return int(valor.memory_usage(deep=True))
+  if isinstance(valor, dict):
+    return sys.getsizeof(valor) + sum(_tamanho(chave) + _tamanho(item) for chave, item in valor.items())
+  if isinstance(valor, (list, tuple)):
+    return sys.getsizeof(valor) + sum(_tamanho(item) for item in valor)
+  return sys.getsizeof(valor)
+
+def _guardar(valor):
+  '''
+  Retorna (valor guardado, tamanho em bytes). Figuras são serializadas em JSON.
+  '''
+  if _e_figura(valor):
+    texto = valor.to_json()
+    return ('figura', texto), len(texto)
+  if isinstance(valor, pd.DataFrame):
+    return ('tabela', valor.copy()), _tamanho(valor)
+  return ('objeto', valor), _tamanho(valor)
+
+def _recuperar(guardado):
+  tipo, valor = guardado
+  if tipo == 'figura':
+    import plotly.io as pio
+    return pio.from_json(valor)
+  if tipo == 'tabela':
+    return valor.copy()
+  return valor
+
+def _inserir(chave, guardado, tamanho):
+  with _trava:
+    if chave in _resultados:
+      _contadores['bytes'] -= _resultados.pop(chave)[1]
+    _resultados[chave] = (guardado, tamanho)
+    _contadores['bytes'] += tamanho
+    # Despeja os menos usados até caber no orçamento (o recém-inserido sempre fica)
+    while _contadores['bytes'] > _orcamento[0] and len(_resultados) > 1:
+      _, (_, tamanho_despejado) = _resultados.popitem(last=False)
+      _contadores['bytes'] -= tamanho_despejado
+      _contadores['despejos'] += 1
+
+def memorizar(funcao):
+  '''
+  Decorador das funções de análise. A chave é o nome da função mais a
+  impressão digital guardada em dados.attrs (ver marcar); chamadas sem
+  impressão digital não passam pelo cache.
+  '''
+  @functools.wraps(funcao)
+  def envoltorio(dados, *args, **kwargs):
+    impressao = getattr(dados, 'attrs', {}).get(ATRIBUTO_DA_CHAVE)
+    if impressao is None:
+      return funcao(dados, *args, **kwargs)
+    chave = (funcao.__module__, funcao.__qualname__, impressao, args, tuple(sorted(kwargs.items())))
+    with _trava:
+      entrada = _resultados.get(chave)
+      if entrada is not None:
+        _resultados.move_to_end(chave)
+        _contadores['acertos'] += 1
+      else:
+        _contadores['falhas'] += 1
+    if entrada is not None:
+      return _recuperar(entrada[0])
+    valor = funcao(dados, *args, **kwargs)
+    _inserir(chave, *_guardar(valor))
+    return valor
+  return envoltorio
+
+def sem_cache(funcao):
+  '''
+  A função original de uma função memorizada. Uma função memorizada que
+  chama outra usa a original, para não guardar o mesmo resultado duas vezes.
+  '''
+  return getattr(funcao, '__wrapped__', funcao)
+
+#######################################
+# Administração
+#######################################
+
+def estatisticas():
+  '''
+  Acertos, falhas, despejos, quantidade de resultados e memória ocupada.
+  '''
+  with _trava:
+    return dict(_contadores, resultados=len(_resultados), orcamento=_orcamento[0])
+
+def definir_orcamento(orcamento_em_bytes):
+  _orcamento[0] = orcamento_em_bytes
+
+def limpar():
+  with _trava:
+    _resultados.clear()
+    _contadores.update(acertos=0, falhas=0, despejos=0, bytes=0)
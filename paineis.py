@@ -0,0 +1,265 @@
+#######################################
+# Biblioteca
+#######################################
+
+# Manipulação dos dados
+import pandas as pd
+
+# Índice dos filtros, cubo pré-agregado e esboços de quantis
+import indice_de_filtros as indice
+import cubo as cb
+import quantis as qt
+
+# Cálculo em paralelo e artefatos
+import concurrent.futures
+import functools
+import hashlib
+import importlib.util
+import instrumentacao as inst
+import json
+import os
+
+#######################################
+# Configuração
+#######################################
+
+# Diretório dos artefatos gerados por relatorio.py e servidos pelo painel
+DIRETORIO_DOS_ARTEFATOS = 'relatorio'
+
+# Índice do relatório: versão dos dados e dos painéis, combinações de filtros e painéis
+ARQUIVO_DO_INDICE = 'indice.json'
+
+# Versão dos painéis. Incrementar quando a saída de um painel mudar sem
+# mudar o código dos MODULOS_DOS_PAINEIS (ex.: uma dependência atualizada).
+VERSAO_DOS_PAINEIS = 1
+
+# Módulos que calculam os painéis; o código deles entra na versão dos artefatos
+MODULOS_DOS_PAINEIS = ['paineis', 'ferramentas', 'consultas', 'cubo', 'quantis', 'periodos', 'grade_espacial', 'restaurantes']
+
+# Valores de cada filtro da barra lateral (curry_company.py), todos selecionados no início
+OPCOES_DOS_FILTROS = {
+  'Densidade de tráfego': ['Baixo', 'Médio', 'Alto', 'Engarrafado'],
+  'Tipo de área': ['Urbana', 'Semi-urbana', 'Metropolitana'],
+  'Condição climática': ['Ensolarado', 'Nublado', 'Nebuloso', 'Ventoso', 'Tempestuoso', 'Tempestades de areia'],
+  'Festival': ['Sim', 'Não'],
+}
+
+# Threads da visão geral de uma aba (calcular_em_paralelo)
+THREADS = 4
+
+# Extensão do arquivo de cada tipo de painel
+EXTENSOES = {
+  'grafico': '.json',
+  'tabela': '.parquet',
+  'mapa': '.html',
+  'valor': '.json',
+}
+
+#######################################
+# Registro dos painéis
+#######################################
+# Um painel por função de ferramentas.py mostrada nas abas do dashboard:
+# - 'titulo': o texto da opção na aba
+# - 'dados': o que a função recebe ('df', 'cubo' ou 'esbocos')
+# - 'tipo': o que ela devolve ('grafico' do Plotly, 'tabela', 'mapa' do
+#   folium ou 'valor')
+# - 'argumentos': argumentos além dos dados, os padrões do dashboard
+# Os entregadores mais rápidos e mais lentos (6. e 7.) saem do mesmo ranking.
+#######################################
+
+PAINEIS = [
+  # 1. Empresa
+  {'aba': 'Empresa', 'opcao': 1, 'funcao': 'pedidos_por_dia', 'titulo': 'Quantidade de pedidos por dia.', 'dados': 'cubo', 'tipo': 'grafico'},
+  {'aba': 'Empresa', 'opcao': 2, 'funcao': 'pedidos_por_semana', 'titulo': 'Quantidade de pedidos por semana.', 'dados': 'cubo', 'tipo': 'grafico'},
+  {'aba': 'Empresa', 'opcao': 3, 'funcao': 'pedidos_por_tipo_de_area', 'titulo': 'Distribuição dos pedidos por tipo de área.', 'dados': 'cubo', 'tipo': 'grafico'},
+  {'aba': 'Empresa', 'opcao': 4, 'funcao': 'pedidos_por_tipo_de_trafego', 'titulo': 'Distribuição dos pedidos por densidade de tráfego.', 'dados': 'cubo', 'tipo': 'grafico'},
+  {'aba': 'Empresa', 'opcao': 5, 'funcao': 'pedidos_por_tipo_de_area_e_tipo_de_trafego', 'titulo': 'Comparação do volume de pedidos por tipo de área e densidade de tráfego.', 'dados': 'cubo', 'tipo': 'grafico'},
+  {'aba': 'Empresa', 'opcao': 6, 'funcao': 'pedidos_por_entregador_por_semana', 'titulo': 'A quantidade de pedidos por entregador por semana.', 'dados': 'df', 'tipo': 'grafico'},
+  {'aba': 'Empresa', 'opcao': 7, 'funcao': 'localizacao_central_por_area_e_trafego', 'titulo': 'A localização central de cada tipo de área por densidade de tráfego.', 'dados': 'df', 'tipo': 'mapa'},
+  {'aba': 'Empresa', 'opcao': 8, 'funcao': 'densidade_dos_pedidos', 'titulo': 'A densidade dos pedidos no mapa.', 'dados': 'df', 'tipo': 'mapa'},
+  # 2. Entregadores
+  {'aba': 'Entregadores', 'opcao': 1, 'funcao': 'quantidade_de_entregadores_por_idade', 'titulo': 'A quantidade de entregadores por idade.', 'dados': 'df', 'tipo': 'grafico'},
+  {'aba': 'Entregadores', 'opcao': 2, 'funcao': 'condicao_veiculos', 'titulo': 'A quantidade de veículos em cada condição.', 'dados': 'df', 'tipo': 'grafico'},
+  {'aba': 'Entregadores', 'opcao': 3, 'funcao': 'avaliacao_media_por_entregador', 'titulo': 'A avaliação média por entregador.', 'dados': 'df', 'tipo': 'grafico'},
+  {'aba': 'Entregadores', 'opcao': 4, 'funcao': 'avaliacao_media_e_desvio_padrao_por_tipo_de_trafego', 'titulo': 'A avaliação média e o desvio padrão por densidade de tráfego.', 'dados': 'esbocos', 'tipo': 'tabela'},
+  {'aba': 'Entregadores', 'opcao': 5, 'funcao': 'avaliacao_media_e_desvio_padrao_por_condicao_climatica', 'titulo': 'A avaliação média e o desvio padrão por condições climáticas.', 'dados': 'esbocos', 'tipo': 'tabela'},
+  {'aba': 'Entregadores', 'opcao': 6, 'funcao': 'ranking_de_entregadores', 'titulo': 'Os entregadores mais rápidos e mais lentos por tipo de área.', 'dados': 'df', 'tipo': 'tabela',
+   'argumentos': {'n': 10, 'minimo_de_entregas': 1}},
+  {'aba': 'Entregadores', 'opcao': 8, 'funcao': 'tempo_medio_por_tipo_de_trafego', 'titulo': 'Tempo médio das entregas por densidade de tráfego.', 'dados': 'cubo', 'tipo': 'grafico'},
+  {'aba': 'Entregadores', 'opcao': 9, 'funcao': 'tempo_medio_das_entregas_por_tipo_de_area', 'titulo': 'Tempo médio das entregas por tipo de área.', 'dados': 'cubo', 'tipo': 'grafico'},
+  {'aba': 'Entregadores', 'opcao': 10, 'funcao': 'tempo_medio_de_entrega_por_tipo_de_veiculo', 'titulo': 'Tempo médio de entrega por tipo de veículo.', 'dados': 'cubo', 'tipo': 'grafico'},
+  {'aba': 'Entregadores', 'opcao': 11, 'funcao': 'tempo_medio_de_entrega_por_condicao_do_veiculo', 'titulo': 'Tempo médio de entrega por condição do veículo.', 'dados': 'cubo', 'tipo': 'grafico'},
+  {'aba': 'Entregadores', 'opcao': 12, 'funcao': 'tempo_medio_de_entrega_por_idade_do_entregador', 'titulo': 'Tempo médio de entrega por idade do entregador.', 'dados': 'df', 'tipo': 'grafico'},
+  {'aba': 'Entregadores', 'opcao': 13, 'funcao': 'tempo_medio_de_entrega_por_entregas_multiplas', 'titulo': 'Tempo médio de entrega por entregas multiplas.', 'dados': 'df', 'tipo': 'grafico'},
+  {'aba': 'Entregadores', 'opcao': 14, 'funcao': 'tempo_medio_de_entrega_por_avaliacao_dos_entregadores', 'titulo': 'Tempo médio de entrega por avaliação dos entregadores.', 'dados': 'df', 'tipo': 'grafico'},
+  {'aba': 'Entregadores', 'opcao': 15, 'funcao': 'tempo_medio_de_entrega_por_condicao_climatica', 'titulo': 'Tempo médio de entrega por condição climática.', 'dados': 'cubo', 'tipo': 'grafico'},
+  # 3. Restaurantes
+  {'aba': 'Restaurantes', 'opcao': 1, 'funcao': 'quantidade_de_entregadores_unicos', 'titulo': 'A quantidade de entregadores únicos.', 'dados': 'df', 'tipo': 'valor'},
+  {'aba': 'Restaurantes', 'opcao': 2, 'funcao': 'distancia_media_dos_restaurantes_e_dos_locais_de_entrega', 'titulo': 'A distância média dos resturantes e dos locais de entrega.', 'dados': 'esbocos', 'tipo': 'tabela'},
+  {'aba': 'Restaurantes', 'opcao': 3, 'funcao': 'tempo_medio_e_desvio_padrao_por_tipo_de_area', 'titulo': 'O tempo médio e o desvio padrão de entrega por tipo de área.', 'dados': 'esbocos', 'tipo': 'tabela'},
+  {'aba': 'Restaurantes', 'opcao': 4, 'funcao': 'tempo_medio_e_desvio_padrao_por_tipo_de_pedido', 'titulo': 'O tempo médio e o desvio padrão de entrega por tipo de pedido.', 'dados': 'esbocos', 'tipo': 'tabela'},
+  {'aba': 'Restaurantes', 'opcao': 5, 'funcao': 'tempo_medio_e_desvio_padrao_por_tipo_de_trafego', 'titulo': 'O tempo médio e o desvio padrão de entrega por densidade de tráfego.', 'dados': 'esbocos', 'tipo': 'tabela'},
+  {'aba': 'Restaurantes', 'opcao': 6, 'funcao': 'tempo_medio_e_desvio_padrao_durante_o_festival', 'titulo': 'O tempo médio de entrega durantes os Festivais.', 'dados': 'esbocos', 'tipo': 'tabela'},
+  {'aba': 'Restaurantes', 'opcao': 7, 'funcao': 'tempo_medio_e_desvio_padrao_por_condicao_climatica', 'titulo': 'O tempo médio e o desvio padrão de entrega por condições climáticas.', 'dados': 'esbocos', 'tipo': 'tabela'},
+  {'aba': 'Restaurantes', 'opcao': 8, 'funcao': 'percentis_do_tempo_de_entrega_por_tipo_de_trafego', 'titulo': 'Os percentis do tempo de entrega por densidade de tráfego.', 'dados': 'esbocos', 'tipo': 'tabela'},
+  {'aba': 'Restaurantes', 'opcao': 9, 'funcao': 'indicadores_por_restaurante', 'titulo': 'Os indicadores de cada restaurante.', 'dados': 'df', 'tipo': 'tabela'},
+]
+
+PAINEIS_POR_FUNCAO = {painel['funcao']: painel for painel in PAINEIS}
+
+#######################################
+# Dados de uma seleção de filtros
+#######################################
+
+def dados_dos_paineis(df, filtros):
+  '''
+  {'df', 'cubo', 'esbocos'} filtrados pela seleção 'filtros', como na barra
+  lateral. O índice, o cubo e os esboços são montados uma vez por DataFrame.
+  '''
+  return {
+    'df': indice.filtrar(df, filtros),
+    'cubo': indice.filtrar(cb.obter_cubo(df), filtros),
+    'esbocos': indice.filtrar(qt.obter_esbocos(df), filtros),
+  }
+
+def calcular_painel(modulo, painel, dados):
+  '''
+  Resultado do 'painel' chamando a sua função em 'modulo' (ferramentas).
+  '''
+  funcao = getattr(modulo, painel['funcao'])
+  return funcao(dados[painel['dados']], **painel.get('argumentos', {}))
+
+def calcular_em_paralelo(modulo, selecionados, dados, threads=THREADS):
+  '''
+  Calcula os painéis 'selecionados' em um pool de 'threads' e devolve
+  (painel, resultado, erro) de cada um na ordem em que ficam prontos, para
+  que a página desenhe cada painel sem esperar o mais lento. As agregações
+  são independentes e boa parte dos groupbys do pandas e das operações do
+  NumPy roda sem o GIL. O cache das funções (memoizacao.py) é protegido por
+  uma trava, então painéis repetidos entre sessões também são aproveitados.
+  Com uma execução do instrumentacao.py iniciada, cada painel é medido como
+  uma etapa e entra no registro da thread que chamou.
+  '''
+  if inst.registro_atual() is None:
+    tarefa = calcular_painel
+  else:
+    def tarefa(modulo, painel, dados):
+      with inst.etapa(painel['funcao'], 'painel'):
+        return calcular_painel(modulo, painel, dados)
+    tarefa = functools.partial(inst.medir_tarefa, tarefa)
+  with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+    futuros = {
+      executor.submit(tarefa, modulo, painel, dados): painel
+      for painel in selecionados}
+    for futuro in concurrent.futures.as_completed(futuros):
+      try:
+        resultado = futuro.result()
+      except Exception as erro:
+        yield futuros[futuro], None, erro
+        continue
+      if tarefa is not calcular_painel:
+        resultado, etapas = resultado
+        inst.juntar_etapas(etapas)
+      yield futuros[futuro], resultado, None
+
+#######################################
+# Artefatos
+#######################################
+# Cada combinação de filtros tem um diretório com o nome da impressão
+# digital dos filtros (memoizacao.impressao_dos_filtros), que inclui a
+# versão dos dados, dentro do diretório da versão dos painéis. Artefatos de
+# outra versão do CSV, da limpeza ou do código dos painéis nunca são
+# encontrados.
+#######################################
+
+@functools.lru_cache(maxsize=None)
+def versao_dos_paineis():
+  '''
+  VERSAO_DOS_PAINEIS com o resumo do código dos MODULOS_DOS_PAINEIS: um
+  gráfico alterado ou uma coluna renomeada mudam a versão.
+  '''
+  resumo = hashlib.sha1()
+  for nome in MODULOS_DOS_PAINEIS:
+    with open(importlib.util.find_spec(nome).origin, 'rb') as arquivo:
+      resumo.update(arquivo.read())
+  return 'v{}-{}'.format(VERSAO_DOS_PAINEIS, resumo.hexdigest()[:12])
+
+def diretorio_da_chave(diretorio, chave):
+  return os.path.join(diretorio, versao_dos_paineis(), chave)
+
+def arquivo_do_artefato(diretorio, chave, painel):
+  return os.path.join(diretorio_da_chave(diretorio, chave), painel['funcao'] + EXTENSOES[painel['tipo']])
+
+def gravar_artefato(diretorio, chave, painel, resultado, html=False):
+  '''
+  Grava o resultado de um painel e retorna os arquivos gravados. Gráficos
+  viram JSON do Plotly (e HTML, com 'html'), tabelas Parquet, mapas HTML.
+  '''
+  arquivo = arquivo_do_artefato(diretorio, chave, painel)
+  os.makedirs(os.path.dirname(arquivo), exist_ok=True)
+  arquivos = [arquivo]
+  if painel['tipo'] == 'grafico':
+    with open(arquivo, 'w', encoding='utf-8') as saida:
+      saida.write(resultado.to_json())
+    if html:
+      arquivos.append(arquivo[:-len('.json')] + '.html')
+      resultado.write_html(arquivos[-1], include_plotlyjs='cdn')
+  elif painel['tipo'] == 'tabela':
+    resultado.to_parquet(arquivo)
+  elif painel['tipo'] == 'mapa':
+    resultado.save(arquivo)
+  else:
+    with open(arquivo, 'w', encoding='utf-8') as saida:
+      json.dump(resultado, saida, default=int)
+  return arquivos
+
+def ler_artefato(diretorio, chave, painel):
+  '''
+  Resultado gravado do 'painel', ou None se não existir. Mapas voltam
+  como o texto HTML.
+  '''
+  arquivo = arquivo_do_artefato(diretorio, chave, painel)
+  if not os.path.exists(arquivo):
+    return None
+  if painel['tipo'] == 'grafico':
+    import plotly.io as pio
+    with open(arquivo, encoding='utf-8') as entrada:
+      return pio.from_json(entrada.read())
+  if painel['tipo'] == 'tabela':
+    return pd.read_parquet(arquivo)
+  with open(arquivo, encoding='utf-8') as entrada:
+    return entrada.read() if painel['tipo'] == 'mapa' else json.load(entrada)
+
+class _ModuloComArtefatos:
+  '''
+  Acesso às funções de ferramentas.py que devolve o artefato pré-calculado
+  quando existe um para a seleção atual ('chave') e a chamada usa os
+  argumentos do registro. Mapas, demais funções e chamadas com outros
+  argumentos são calculados na hora.
+  '''
+  def __init__(self, modulo, diretorio, chave):
+    self._modulo = modulo
+    self._diretorio = diretorio
+    self._chave = chave
+
+  def __getattr__(self, nome):
+    valor = getattr(self._modulo, nome)
+    painel = PAINEIS_POR_FUNCAO.get(nome)
+    if painel is None or painel['tipo'] == 'mapa':
+      return valor
+    def envoltorio(dados, *args, **kwargs):
+      if not args and kwargs == painel.get('argumentos', {}):
+        resultado = ler_artefato(self._diretorio, self._chave, painel)
+        if resultado is not None:
+          return resultado
+      return valor(dados, *args, **kwargs)
+    return envoltorio
+
+def com_artefatos(modulo, chave, diretorio=DIRETORIO_DOS_ARTEFATOS):
+  '''
+  'modulo' servindo os artefatos de 'diretorio', se existirem para a
+  versão atual dos painéis.
+  '''
+  if not os.path.isdir(diretorio_da_chave(diretorio, chave)):
+    return modulo
+  return _ModuloComArtefatos(modulo, diretorio, chave)
@@ -0,0 +1,144 @@
+#######################################
+# Biblioteca
+#######################################
+
+# Manipulação dos dados
+import numpy as np
+import pandas as pd
+
+#######################################
+# Configuração
+#######################################
+
+# Períodos aceitos por chave_do_periodo e contar_por_periodo
+PERIODOS = ['dia', 'semana', 'mes', 'hora']
+
+# Chaves inteiras criadas na limpeza (uma vez por carga dos dados)
+COLUNA_DO_DIA = 'Dia do pedido'        # dias desde 1970-01-01
+COLUNA_DA_SEMANA = 'Semana do pedido'  # ano * 100 + semana do ano ('%U')
+COLUNA_DA_HORA = 'Hora do pedido'      # hora do dia (0 a 23), -1 sem horário
+
+# Rótulo da coluna de período em contar_por_periodo
+NOMES_DOS_PERIODOS = {
+  'dia': 'Data do pedido',
+  'semana': 'Semana',
+  'mes': 'Mês',
+  'hora': 'Hora do pedido',
+}
+
+#######################################
+# Chaves inteiras
+#######################################
+# Toda a aritmética é feita sobre inteiros do NumPy, sem strftime e sem
+# criar textos por linha. Os rótulos são montados só para os valores
+# distintos, depois de agrupar.
+#######################################
+
+def semana_do_ano(datas):
+  '''
+  Semana do ano começando no domingo, como dt.strftime('%U'), mas em inteiros.
+  '''
+  dia_do_ano = datas.dt.dayofyear.to_numpy()
+  # dt.dayofweek: segunda = 0; no '%U' o domingo é o primeiro dia da semana
+  dia_da_semana = (datas.dt.dayofweek.to_numpy() + 1) % 7
+  return pd.Series((dia_do_ano + 6 - dia_da_semana) // 7, index=datas.index, dtype='int16')
+
+def semana_do_pedido(datas):
+  '''
+  Ano * 100 + semana do ano: as semanas de anos diferentes não se misturam,
+  e um intervalo de semanas é um intervalo de inteiros.
+  '''
+  return datas.dt.year.astype('int32') * 100 + semana_do_ano(datas).astype('int32')
+
+def dia_do_pedido(datas):
+  return pd.Series(datas.to_numpy().astype('datetime64[D]').astype('int32'), index=datas.index)
+
+def hora_do_pedido(horarios):
+  horas = horarios.dt.total_seconds().to_numpy() // 3600
+  return pd.Series(np.nan_to_num(horas, nan=-1).astype('int8'), index=horarios.index)
+
+def chaves_de_tempo(df):
+  '''
+  Colunas com as chaves inteiras de dia, semana e hora de cada pedido,
+  criadas por limpeza_dos_dados.
+  '''
+  return {
+    COLUNA_DO_DIA: dia_do_pedido(df['Data do pedido']),
+    COLUNA_DA_SEMANA: semana_do_pedido(df['Data do pedido']),
+    COLUNA_DA_HORA: hora_do_pedido(df['Horário do pedido']),
+  }
+
+def chave_do_periodo(df, periodo, tamanho=1):
+  '''
+  Chave inteira do período de cada linha, agrupando 'tamanho' períodos:
+  - 'dia': dias desde 1970-01-01, em blocos de 'tamanho' dias
+  - 'semana': ano * 100 + semana do ano, em blocos de 'tamanho' semanas dentro do ano
+  - 'mes': meses desde janeiro de 1970, em blocos de 'tamanho' meses
+  - 'hora': hora do dia, em blocos de 'tamanho' horas (-1 sem horário)
+  Usa as chaves criadas na limpeza e, se não existirem (ex.: o cubo), as
+  calcula a partir de 'Data do pedido' e 'Horário do pedido'.
+  '''
+  if periodo == 'dia':
+    dia = df[COLUNA_DO_DIA] if COLUNA_DO_DIA in df else dia_do_pedido(df['Data do pedido'])
+    chave = dia.to_numpy() // tamanho * tamanho
+  elif periodo == 'semana':
+    semana = df[COLUNA_DA_SEMANA] if COLUNA_DA_SEMANA in df else semana_do_pedido(df['Data do pedido'])
+    semana = semana.to_numpy()
+    chave = semana // 100 * 100 + semana % 100 // tamanho * tamanho
+  elif periodo == 'mes':
+    chave = df['Data do pedido'].to_numpy().astype('datetime64[M]').astype('int32') // tamanho * tamanho
+  elif periodo == 'hora':
+    hora = df[COLUNA_DA_HORA] if COLUNA_DA_HORA in df else hora_do_pedido(df['Horário do pedido'])
+    hora = hora.to_numpy()
+    chave = np.where(hora < 0, -1, hora // tamanho * tamanho)
+  else:
+    raise ValueError('Período desconhecido: {} (use {})'.format(periodo, PERIODOS))
+  return pd.Series(chave, index=df.index, name=periodo)
+
+def rotulos_do_periodo(chaves, periodo):
+  '''
+  Rótulos das chaves (valores distintos já agrupados): datas para 'dia' e
+  'mes', o número da semana ('05', como no '%U') para 'semana' e a hora para 'hora'.
+  '''
+  chaves = np.asarray(chaves)
+  if periodo == 'dia':
+    return pd.to_datetime(chaves.astype('datetime64[D]'))
+  if periodo == 'mes':
+    return pd.to_datetime(chaves.astype('datetime64[M]'))
+  if periodo == 'semana':
+    anos = chaves // 100
+    if len(np.unique(anos)) > 1:
+      return pd.Index(['{}-{:02d}'.format(ano, semana) for ano, semana in zip(anos, chaves % 100)])
+    return pd.Index(['{:02d}'.format(semana) for semana in chaves % 100])
+  return pd.Index(chaves)
+
+#######################################
+# Séries temporais
+#######################################
+
+def contar_por_periodo(df, periodo, tamanho=1, pesos=None):
+  '''
+  Quantidade de pedidos por período, em ordem cronológica.
+  'pesos' é a coluna com a quantidade de pedidos de cada linha (ex.:
+  'Quantidade' no cubo); sem ela cada linha conta como um pedido.
+  '''
+  chave = chave_do_periodo(df, periodo, tamanho)
+  quantidade = df[pesos] if pesos is not None else pd.Series(1, index=df.index)
+  df_aux = quantidade.groupby(chave.to_numpy()).sum()
+  if periodo == 'hora':
+    df_aux = df_aux.drop(index=-1, errors='ignore')
+  return pd.DataFrame({
+    NOMES_DOS_PERIODOS[periodo]: rotulos_do_periodo(df_aux.index, periodo),
+    'Quantidade': df_aux.to_numpy(),
+  })
+
+def distintos_por_periodo(df, coluna, periodo, tamanho=1):
+  '''
+  Quantidade de valores distintos de 'coluna' (ex.: entregadores) por período.
+  '''
+  chave = chave_do_periodo(df, periodo, tamanho)
+  df_aux = df[coluna].groupby(chave.to_numpy(), observed=True).nunique()
+  return pd.DataFrame({
+    NOMES_DOS_PERIODOS[periodo]: rotulos_do_periodo(df_aux.index, periodo),
+    'Quantidade': df_aux.to_numpy(),
+  })
@@ -0,0 +1,288 @@
+#######################################
+# Biblioteca
+#######################################
+
+# Manipulação dos dados
+import numpy as np
+import pandas as pd
+
+# Esboços guardados por DataFrame carregado
+import threading
+import weakref
+
+#######################################
+# Configuração
+#######################################
+
+# Dimensões dos esboços: os filtros da barra lateral e o tipo de pedido
+DIMENSOES_DOS_ESBOCOS = [
+  'Densidade de tráfego',
+  'Tipo de área',
+  'Condição climática',
+  'Festival',
+  'Tipo de pedido',
+]
+
+# Medidas com um esboço de quantis em cada grupo
+MEDIDAS_DOS_ESBOCOS = [
+  'Tempo de entrega (min)',
+  'Avaliação do entregador',
+  'Distância (km)',
+]
+
+# Compressão (delta) do t-digest: cerca de delta / 2 centróides por grupo
+COMPRESSAO = 200
+
+# Coluna da medida em cada linha da tabela de esboços
+TIPO_DA_MEDIDA = pd.CategoricalDtype(MEDIDAS_DOS_ESBOCOS, ordered=True)
+
+#######################################
+# t-digest
+#######################################
+# Cada esboço é um conjunto de centróides (média, peso) ordenados pela
+# média, com a soma dos quadrados dos valores de cada centróide. Os
+# centróides do meio da distribuição agrupam muitos valores e os das
+# pontas poucos, seguindo a escala k1 do t-digest:
+#   k(q) = delta / (2 pi) * asin(2q - 1)
+# Todos os centróides cuja posição q cai na mesma unidade de k são unidos,
+# o que é a compressão do 'merging digest' feita sem laço, para todos os
+# grupos de uma vez. Antes disso os valores repetidos viram um único
+# centróide (sem perda), e um centróide que sozinho já cobre uma unidade
+# de k não recebe outros. Grupos com até delta / 2 valores distintos não
+# são comprimidos: guardam um centróide por valor (um histograma exato).
+# Assim as medidas com poucos valores distintos (tempo em minutos,
+# avaliação) têm medianas exatas, e um centróide com variância zero
+# devolve o próprio valor, sem interpolar.
+#
+# Erro: um centróide cobre no máximo uma unidade de k, ou seja, uma faixa
+# de postos de largura 2 pi sqrt(q (1 - q)) / delta. Com delta = 200 o erro
+# de posto do quantil q fica em no máximo metade disso: 0,8% dos pedidos na
+# mediana, 0,5% no p90 e 0,16% no p99. Sem compressão a mediana é exata
+# (a média dos dois valores do meio, como no pandas).
+#
+# Os esboços se somam: juntar dois grupos (ou dois blocos do CSV) é
+# concatenar os centróides e comprimir de novo. Quantidade, média e
+# desvio padrão continuam exatos, pois a soma e a soma dos quadrados se
+# conservam.
+#######################################
+
+def _escala_k(q, compressao):
+  return compressao / (2 * np.pi) * np.arcsin(np.clip(2 * q - 1, -1, 1))
+
+def _unir(novo, centroides, pesos, quadrados, iguais=False):
+  '''
+  Une cada sequência de centróides que começa em 'novo'. Com 'iguais' os
+  centróides unidos têm o mesmo valor, que é mantido sem arredondamento.
+  '''
+  centroide = np.cumsum(novo) - 1
+  peso = np.bincount(centroide, pesos)
+  quadrado = np.bincount(centroide, quadrados)
+  if iguais:
+    return centroides[novo], peso, quadrado
+  media = np.bincount(centroide, pesos * centroides) / peso
+  # Centróides que não se uniram a nenhum outro guardam o valor original
+  sozinho = np.bincount(centroide) == 1
+  media[sozinho] = centroides[novo][sozinho]
+  return media, peso, quadrado
+
+def _comprimir(grupos, centroides, pesos, quadrados, compressao=COMPRESSAO):
+  '''
+  Comprime os centróides de cada grupo (inteiro). Retorna a ordem aplicada,
+  a máscara do primeiro centróide original de cada novo centróide e os
+  arrays (centroides, pesos, quadrados) comprimidos.
+  '''
+  ordem = np.lexsort((centroides, grupos))
+  grupos, centroides, pesos, quadrados = grupos[ordem], centroides[ordem], pesos[ordem], quadrados[ordem]
+  inicio = np.r_[True, grupos[1:] != grupos[:-1]]
+
+  # 1. Valores repetidos no mesmo grupo viram um único centróide
+  distinto = inicio | np.r_[True, centroides[1:] != centroides[:-1]]
+  grupos, primeiro, inicio = grupos[distinto], np.flatnonzero(distinto), inicio[distinto]
+  centroides, pesos, quadrados = _unir(distinto, centroides, pesos, quadrados, iguais=True)
+
+  # 2. União pela escala k
+  grupo = np.cumsum(inicio) - 1
+  acumulado = np.cumsum(pesos)
+  antes = acumulado - pesos - (acumulado - pesos)[inicio][grupo]
+  total = np.bincount(grupo, pesos)[grupo]
+  k_antes = _escala_k(antes / total, compressao)
+  k_depois = _escala_k((antes + pesos) / total, compressao)
+  k = np.floor(_escala_k((antes + pesos / 2) / total, compressao))
+  grande = k_depois - k_antes >= 1
+  poucos = (np.bincount(grupo) <= compressao / 2)[grupo]
+  novo = inicio | grande | poucos | np.r_[True, (k[1:] != k[:-1]) | grande[:-1]]
+  centroides, pesos, quadrados = _unir(novo, centroides, pesos, quadrados)
+
+  # Marca o primeiro valor original de cada novo centróide
+  marcado = np.zeros(len(ordem), dtype=bool)
+  marcado[primeiro[novo]] = True
+  return ordem, marcado, centroides, pesos, quadrados
+
+def _codigos(tabela, dimensoes):
+  '''
+  Um inteiro por combinação de valores das dimensões (NaN incluído).
+  '''
+  if not dimensoes:
+    return np.zeros(len(tabela), dtype=np.int64)
+  categorias = [pd.Categorical(tabela[dimensao]) for dimensao in dimensoes]
+  return np.ravel_multi_index(
+    [categoria.codes.astype(np.int64) + 1 for categoria in categorias],
+    [len(categoria.categories) + 1 for categoria in categorias])
+
+def _comprimir_tabela(tabela, dimensoes, compressao=COMPRESSAO):
+  ordem, novo, centroides, pesos, quadrados = _comprimir(
+    _codigos(tabela, dimensoes),
+    tabela['Centróide'].to_numpy(dtype=np.float64),
+    tabela['Peso'].to_numpy(dtype=np.float64),
+    tabela['Soma dos quadrados'].to_numpy(dtype=np.float64),
+    compressao)
+  esbocos = tabela[dimensoes].iloc[ordem[novo]].reset_index(drop=True)
+  esbocos['Centróide'] = centroides
+  esbocos['Peso'] = pesos
+  esbocos['Soma dos quadrados'] = quadrados
+  return esbocos
+
+#######################################
+# Construção dos esboços
+#######################################
+
+def construir_esbocos(df, dimensoes=DIMENSOES_DOS_ESBOCOS, medidas=MEDIDAS_DOS_ESBOCOS, compressao=COMPRESSAO):
+  '''
+  Tabela com os centróides do esboço de cada medida em cada combinação de
+  valores das dimensões que existe nos dados. Valores vazios (NaN) das
+  medidas são ignorados, como no median() do pandas.
+  '''
+  # Medidas fora de MEDIDAS_DOS_ESBOCOS (ex.: as coordenadas em ingestao.py) têm o seu próprio tipo
+  tipo = TIPO_DA_MEDIDA if set(medidas) <= set(MEDIDAS_DOS_ESBOCOS) else pd.CategoricalDtype(list(medidas), ordered=True)
+  partes = []
+  for medida in medidas:
+    valores = df[medida].to_numpy(dtype=np.float64)
+    validos = ~np.isnan(valores)
+    tabela = df.loc[validos, dimensoes].reset_index(drop=True)
+    tabela['Medida'] = pd.Categorical.from_codes(
+      np.full(len(tabela), tipo.categories.get_loc(medida)), dtype=tipo)
+    tabela['Centróide'] = valores[validos]
+    tabela['Peso'] = 1.0
+    tabela['Soma dos quadrados'] = valores[validos] ** 2
+    partes.append(_comprimir_tabela(tabela, dimensoes + ['Medida'], compressao))
+  return pd.concat(partes, ignore_index=True)
+
+def combinar_esbocos(a, b, compressao=COMPRESSAO):
+  '''
+  Junta duas tabelas de esboços (ex.: de dois blocos do CSV).
+  '''
+  if a.empty:
+    return b
+  if b.empty:
+    return a
+  dimensoes = [coluna for coluna in a.columns if coluna not in ('Centróide', 'Peso', 'Soma dos quadrados')]
+  return _comprimir_tabela(pd.concat([a, b], ignore_index=True), dimensoes, compressao)
+
+_esbocos = {}
+_trava = threading.Lock()
+
+def obter_esbocos(df):
+  '''
+  Devolve os esboços de 'df', construindo-os apenas na primeira vez que o
+  DataFrame é visto. Os esboços são descartados junto com o DataFrame.
+  '''
+  chave = id(df)
+  with _trava:
+    entrada = _esbocos.get(chave)
+  if entrada is not None and entrada[0]() is df:
+    return entrada[1]
+  esbocos = construir_esbocos(df)
+  with _trava:
+    _esbocos[chave] = (weakref.ref(df, lambda _: _esbocos.pop(chave, None)), esbocos)
+  return esbocos
+
+#######################################
+# Consulta aos esboços
+#######################################
+
+def nome_do_quantil(q):
+  return 'Mediana' if q == 0.5 else 'p{:g}'.format(q * 100)
+
+def _quantis(grupo, centroides, pesos, quadrados, quantis):
+  '''
+  Quantis de cada grupo por interpolação linear entre os centros dos
+  centróides (posto acumulado até a metade do centróide). Se o posto cai
+  dentro de um centróide de variância zero (um único valor), devolve esse
+  valor; na divisa entre dois deles, a média dos dois, como a mediana do
+  pandas. 'grupo' começa em 0 e vem ordenado, como os centróides dentro de
+  cada grupo.
+  '''
+  inicio = np.flatnonzero(np.r_[True, grupo[1:] != grupo[:-1]])
+  fim = np.r_[inicio[1:], len(grupo)] - 1
+  total = np.bincount(grupo, pesos)
+  acumulado = np.cumsum(pesos)
+  depois = acumulado - (acumulado - pesos)[inicio][grupo]
+  antes = depois - pesos
+  centro = depois - pesos / 2
+  unico = quadrados / pesos - centroides ** 2 <= 1e-9 * np.maximum(centroides ** 2, 1)
+  # Uma única busca para todos os grupos: posições deslocadas por grupo
+  escala = 2 * total.max() + 1
+  deslocamento = grupo * escala
+  resultados = {}
+  for q in quantis:
+    alvo = q * total
+    alvo_deslocado = np.arange(len(total)) * escala + alvo
+
+    # Interpolação entre os centros vizinhos
+    posicao = np.searchsorted(deslocamento + centro, alvo_deslocado)
+    acima = np.clip(posicao, inicio, fim)
+    abaixo = np.clip(posicao - 1, inicio, fim)
+    distancia = centro[acima] - centro[abaixo]
+    with np.errstate(invalid='ignore', divide='ignore'):
+      t = np.where(distancia > 0, (alvo - centro[abaixo]) / distancia, 0)
+    valores = centroides[abaixo] + np.clip(t, 0, 1) * (centroides[acima] - centroides[abaixo])
+
+    # Centróide que contém o posto (o primeiro que termina nele ou depois)
+    contem = np.clip(np.searchsorted(deslocamento + depois, alvo_deslocado), inicio, fim)
+    seguinte = np.minimum(contem + 1, fim)
+    dentro = unico[contem] & (antes[contem] < alvo) & (alvo < depois[contem])
+    divisa = unico[contem] & unico[seguinte] & (alvo == depois[contem]) & (seguinte > contem)
+    valores = np.where(dentro, centroides[contem], valores)
+    valores = np.where(divisa, (centroides[contem] + centroides[seguinte]) / 2, valores)
+    resultados[nome_do_quantil(q)] = valores
+  return resultados
+
+def agregar_esbocos(esbocos, dimensoes, medida, quantis=(0.5,), compressao=COMPRESSAO):
+  '''
+  Junta os esboços de 'medida' por 'dimensoes' (roll-up), como cubo.agregar.
+  Retorna a 'Quantidade', a 'Média', o 'Desvio padrão' (amostral, como o
+  pandas) e uma coluna por quantil ('Mediana' para 0.5, 'p90' para 0.9 etc.)
+  em cada grupo. Com 'dimensoes' vazio retorna uma única linha.
+  '''
+  if isinstance(dimensoes, str):
+    dimensoes = [dimensoes]
+  tabela = esbocos[esbocos['Medida'] == medida]
+  # Grupos com alguma dimensão vazia ficam de fora, como no groupby do pandas
+  tabela = tabela[tabela[dimensoes].notna().all(axis=1)] if dimensoes else tabela
+  colunas = ['Quantidade', 'Média', 'Desvio padrão'] + [nome_do_quantil(q) for q in quantis]
+  if tabela.empty:
+    return pd.DataFrame(columns=dimensoes + colunas)
+  ordem, novo, centroides, pesos, quadrados = _comprimir(
+    _codigos(tabela, dimensoes),
+    tabela['Centróide'].to_numpy(dtype=np.float64),
+    tabela['Peso'].to_numpy(dtype=np.float64),
+    tabela['Soma dos quadrados'].to_numpy(dtype=np.float64),
+    compressao)
+  # Linha original do primeiro centróide de cada novo centróide e de cada grupo
+  primeiro = ordem[novo]
+  codigos = _codigos(tabela, dimensoes)[primeiro]
+  inicio = np.r_[True, codigos[1:] != codigos[:-1]]
+  grupo = np.cumsum(inicio) - 1
+
+  df_aux = tabela[dimensoes].iloc[primeiro[inicio]].reset_index(drop=True)
+  n = np.bincount(grupo, pesos)
+  soma = np.bincount(grupo, pesos * centroides)
+  with np.errstate(invalid='ignore', divide='ignore'):
+    media = soma / n
+    variancia = (np.bincount(grupo, quadrados) - soma * media) / (n - 1)
+  df_aux['Quantidade'] = n.astype(np.int64)
+  df_aux['Média'] = media
+  df_aux['Desvio padrão'] = np.sqrt(np.clip(variancia, 0, None))
+  for nome, valores in _quantis(grupo, centroides, pesos, quadrados, quantis).items():
+    df_aux[nome] = valores
+  return df_aux
@@ -0,0 +1,174 @@
+#######################################
+# Biblioteca
+#######################################
+
+# Arquivo de funções (ferramentas.py)
+import ferramentas as fr
+
+# Cache dos dados limpos, impressão digital dos filtros e registro dos painéis
+import cache_dos_dados as cache
+import memoizacao as memo
+import paineis
+
+# Processos e arquivos
+import argparse
+import concurrent.futures
+import json
+import os
+import time
+
+#######################################
+# Configuração
+#######################################
+
+# Processos usados quando nenhum é informado (um por núcleo)
+PROCESSOS = os.cpu_count() or 1
+
+#######################################
+# Combinações de filtros
+#######################################
+# Uma combinação é um dicionário {filtro: [valores]} como o da barra
+# lateral. Filtros ausentes ficam com todos os valores, então {} é a
+# seleção inicial do dashboard.
+#######################################
+
+def completar_filtros(filtros):
+  '''
+  'filtros' com todos os valores nos filtros não informados.
+  '''
+  return {
+    dimensao: list(filtros.get(dimensao, valores))
+    for dimensao, valores in paineis.OPCOES_DOS_FILTROS.items()}
+
+def combinacoes_por_valor():
+  '''
+  Para cada filtro, uma seleção com um único valor (e os demais filtros completos).
+  '''
+  combinacoes = []
+  for dimensao, valores in paineis.OPCOES_DOS_FILTROS.items():
+    combinacoes.extend({dimensao: [valor]} for valor in valores)
+  return combinacoes
+
+#######################################
+# Cálculo dos painéis (em cada processo)
+#######################################
+# Cada processo abre o arquivo dos dados limpos mapeado em memória (ver
+# cache_dos_dados.abrir_mapeado), então os dados são limpos uma única vez
+# e as páginas do arquivo são compartilhadas entre os processos. O índice,
+# o cubo e os esboços são montados uma vez por processo.
+#######################################
+
+_dados = {}
+
+def _iniciar_processo(arquivo, versao):
+  df = cache.abrir_mapeado(arquivo)
+  df.attrs[cache.ATRIBUTO_DA_VERSAO] = versao
+  _dados['df'] = df
+
+def _calcular_combinacao(filtros, diretorio, funcoes, html):
+  '''
+  Calcula e grava os painéis de uma combinação de filtros. Retorna a
+  entrada da combinação no índice do relatório.
+  '''
+  inicio = time.perf_counter()
+  df = _dados['df']
+  chave = memo.impressao_dos_filtros(df.attrs[cache.ATRIBUTO_DA_VERSAO], filtros)
+  dados = paineis.dados_dos_paineis(df, filtros)
+  for valor in dados.values():
+    memo.marcar(valor, chave)
+
+  arquivos = {}
+  for painel in paineis.PAINEIS:
+    if funcoes and painel['funcao'] not in funcoes:
+      continue
+    resultado = paineis.calcular_painel(fr, painel, dados)
+    gravados = paineis.gravar_artefato(diretorio, chave, painel, resultado, html)
+    arquivos[painel['funcao']] = [os.path.relpath(arquivo, diretorio) for arquivo in gravados]
+  return {
+    'chave': chave,
+    'filtros': filtros,
+    'linhas': len(dados['df']),
+    'arquivos': arquivos,
+    'segundos': round(time.perf_counter() - inicio, 3),
+  }
+
+#######################################
+# Relatório
+#######################################
+
+def gerar_relatorio(caminho, combinacoes, diretorio=paineis.DIRETORIO_DOS_ARTEFATOS, processos=PROCESSOS, funcoes=None, html=False):
+  '''
+  Calcula os painéis de ferramentas.py para cada combinação de filtros.
+  # 1. Carrega e limpa o CSV uma única vez (cache_dos_dados).
+  # 2. Distribui as combinações em um pool de 'processos'; cada um abre o
+  #    arquivo dos dados limpos e grava os painéis em
+  #    'diretorio'/<versão dos painéis>/<chave>, onde <chave> é a impressão
+  #    digital usada pelo dashboard.
+  # 3. Grava o índice do relatório (paineis.ARQUIVO_DO_INDICE).
+  'funcoes' restringe os painéis calculados. Retorna o índice.
+  '''
+  # 1. Dados limpos
+  df, _ = cache.carregar_dados_limpos(caminho)
+  versao = df.attrs[cache.ATRIBUTO_DA_VERSAO]
+  arquivo = df.attrs[cache.ATRIBUTO_DO_ARQUIVO]
+
+  # 2. Painéis
+  combinacoes = [completar_filtros(filtros) for filtros in combinacoes]
+  os.makedirs(diretorio, exist_ok=True)
+  with concurrent.futures.ProcessPoolExecutor(
+    max_workers=processos, initializer=_iniciar_processo, initargs=(arquivo, versao)) as executor:
+    futuros = [
+      executor.submit(_calcular_combinacao, filtros, diretorio, funcoes, html)
+      for filtros in combinacoes]
+    entradas = [futuro.result() for futuro in futuros]
+
+  # 3. Índice
+  indice = {
+    'arquivo': os.path.abspath(caminho),
+    'versao_dos_dados': versao,
+    'versao_dos_paineis': paineis.versao_dos_paineis(),
+    'gerado_em': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    'paineis': paineis.PAINEIS,
+    'combinacoes': entradas,
+  }
+  temporario = os.path.join(diretorio, paineis.ARQUIVO_DO_INDICE + '.tmp')
+  with open(temporario, 'w', encoding='utf-8') as saida:
+    json.dump(indice, saida, ensure_ascii=False, indent=2)
+  os.replace(temporario, os.path.join(diretorio, paineis.ARQUIVO_DO_INDICE))
+  return indice
+
+#######################################
+# Linha de comando
+#######################################
+
+def main(argumentos=None):
+  parser = argparse.ArgumentParser(description='Calcula os painéis do dashboard sem o Streamlit.')
+  parser.add_argument('caminho', nargs='?', default='curry.csv', help='CSV bruto (formato do curry.csv)')
+  parser.add_argument('--destino', default=paineis.DIRETORIO_DOS_ARTEFATOS, help='diretório dos artefatos')
+  parser.add_argument('--combinacoes', help='arquivo JSON com uma lista de {filtro: [valores]}')
+  parser.add_argument('--por-valor', action='store_true', help='inclui uma combinação para cada valor de cada filtro')
+  parser.add_argument('--paineis', nargs='+', help='funções de ferramentas.py a calcular (padrão: todas)')
+  parser.add_argument('--processos', type=int, default=PROCESSOS)
+  parser.add_argument('--html', action='store_true', help='grava também o HTML de cada gráfico')
+  argumentos = parser.parse_args(argumentos)
+
+  if argumentos.combinacoes:
+    with open(argumentos.combinacoes, encoding='utf-8') as entrada:
+      combinacoes = json.load(entrada)
+  else:
+    combinacoes = [{}]
+  if argumentos.por_valor:
+    combinacoes += combinacoes_por_valor()
+  desconhecidas = set(argumentos.paineis or []) - set(paineis.PAINEIS_POR_FUNCAO)
+  if desconhecidas:
+    parser.error('painéis desconhecidos: {}'.format(', '.join(sorted(desconhecidas))))
+
+  inicio = time.perf_counter()
+  indice = gerar_relatorio(
+    argumentos.caminho, combinacoes, argumentos.destino, argumentos.processos,
+    argumentos.paineis, argumentos.html)
+  print('{} combinações calculadas em {:.2f} s ({} processos) em {}'.format(
+    len(indice['combinacoes']), time.perf_counter() - inicio, argumentos.processos, argumentos.destino))
+
+if __name__ == '__main__':
+  main()
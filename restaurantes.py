@@ -0,0 +1,178 @@
+#######################################
+# Biblioteca
+#######################################
+
+# Manipulação dos dados
+import numpy as np
+import pandas as pd
+
+# Grade espacial e índice das células (grade_espacial.py)
+import grade_espacial as grade
+
+# Distância entre coordenadas
+from distancias import distancia_haversine
+
+# Bitmaps dos filtros da barra lateral (indice_de_filtros.py)
+import indice_de_filtros as indice
+
+# Dimensão e índices guardados por DataFrame carregado
+import threading
+import weakref
+
+#######################################
+# Configuração
+#######################################
+
+# Os dados não têm um ID de restaurante, só as coordenadas. Coordenadas na
+# mesma célula deste nível (~19 m por ~38 m no equador) são o mesmo
+# restaurante, e a chave da célula vira o ID.
+NIVEL_DO_RESTAURANTE = 20
+
+# Raio padrão das buscas, em km
+RAIO_PADRAO = 5.0
+
+#######################################
+# IDs dos restaurantes
+#######################################
+
+def celulas_dos_restaurantes(df):
+  '''
+  Célula (no NIVEL_DO_RESTAURANTE) do restaurante de cada pedido.
+  '''
+  return grade.no_nivel(grade.celulas_do_local(df, 'restaurante'), NIVEL_DO_RESTAURANTE)
+
+def nome_do_restaurante(celula):
+  return 'R{:010X}'.format(int(celula))
+
+def celula_do_restaurante(restaurante):
+  '''
+  Inverso de nome_do_restaurante. Levanta ValueError com um ID inválido.
+  '''
+  if not restaurante.startswith('R'):
+    raise ValueError('ID de restaurante inválido: {}'.format(restaurante))
+  return int(restaurante[1:], 16)
+
+#######################################
+# Dimensão dos restaurantes
+#######################################
+# Uma linha por restaurante, indexada pelo 'ID do restaurante', com a
+# posição média, a quantidade de pedidos, os entregadores únicos e as
+# médias de distância, tempo de entrega e avaliação dos seus pedidos.
+# As linhas seguem a curva de Morton (restaurantes próximos, IDs próximos).
+#######################################
+
+def construir_restaurantes(df):
+  celulas = celulas_dos_restaurantes(df)
+  unicas, posicao = np.unique(celulas, return_inverse=True)
+  n = len(unicas)
+  pedidos = np.bincount(posicao, minlength=n)
+
+  def media(coluna):
+    x = df[coluna].to_numpy(dtype=np.float64)
+    presente = ~np.isnan(x)
+    with np.errstate(invalid='ignore', divide='ignore'):
+      return np.bincount(posicao[presente], x[presente], n) / np.bincount(posicao[presente], minlength=n)
+
+  codigos = df['ID do entregador'].astype('category').cat.codes.to_numpy()
+  pares = pd.DataFrame({'restaurante': posicao, 'entregador': codigos})[codigos >= 0].drop_duplicates()
+  entregadores = np.bincount(pares['restaurante'].to_numpy(), minlength=n)
+
+  return pd.DataFrame({
+    'Latitude': media('Latitude do restaurante'),
+    'Longitude': media('Longitude do restaurante'),
+    'Pedidos': pedidos,
+    'Entregadores únicos': entregadores,
+    'Distância média (km)': media('Distância (km)').round(2),
+    'Tempo médio de entrega (min)': media('Tempo de entrega (min)').round(1),
+    'Avaliação média': media('Avaliação do entregador').round(2),
+  }, index=pd.Index([nome_do_restaurante(celula) for celula in unicas], name='ID do restaurante'))
+
+def indice_dos_restaurantes(restaurantes):
+  '''
+  Índice espacial (grade_espacial.construir_indice) das linhas da dimensão.
+  '''
+  return grade.construir_indice(grade.celulas(restaurantes['Latitude'], restaurantes['Longitude']))
+
+_restaurantes = {}
+_indices = {}
+_trava = threading.Lock()
+
+def _memorizado(tabela, chave, df, construir):
+  # Valor de 'df' em 'tabela', construído na primeira vez e descartado junto com o DataFrame
+  with _trava:
+    entrada = tabela.get(chave)
+  if entrada is not None and entrada[0]() is df:
+    return entrada[1]
+  valor = construir()
+  with _trava:
+    tabela[chave] = (weakref.ref(df, lambda _: tabela.pop(chave, None)), valor)
+  return valor
+
+def obter_restaurantes(df):
+  '''
+  Devolve a dimensão dos restaurantes de 'df', construída apenas na
+  primeira vez que o DataFrame é visto.
+  '''
+  return _memorizado(_restaurantes, id(df), df, lambda: construir_restaurantes(df))
+
+def obter_indice(df, local='entrega'):
+  '''
+  Índice espacial das entregas, dos restaurantes de cada pedido ou, com
+  local='dimensao', das linhas de obter_restaurantes(df), construído apenas
+  na primeira vez. 'df' deve ser o DataFrame carregado, e não o filtrado,
+  que é um objeto novo a cada execução do dashboard.
+  '''
+  if local == 'dimensao':
+    return _memorizado(_indices, (id(df), local), df, lambda: indice_dos_restaurantes(obter_restaurantes(df)))
+  return _memorizado(_indices, (id(df), local), df, lambda: grade.construir_indice(grade.celulas_do_local(df, local)))
+
+#######################################
+# Buscas
+#######################################
+# As buscas por raio passam pelo índice da grade: só os pontos das células
+# em volta do centro têm a distância calculada, então o tempo acompanha os
+# pontos próximos e não a quantidade de linhas. Os índices das entregas são
+# do DataFrame carregado; a seleção da barra lateral ('filtros') é aplicada
+# só aos candidatos, lendo os bitmaps de indice_de_filtros.
+#######################################
+
+def restaurantes_no_raio(restaurantes, latitude, longitude, raio_km=RAIO_PADRAO, indice_espacial=None):
+  '''
+  Restaurantes (linhas da dimensão) a até 'raio_km' do ponto, do mais
+  próximo ao mais distante, com a 'Distância do ponto (km)'.
+  'indice_espacial' é o indice_dos_restaurantes(restaurantes), se já existir.
+  '''
+  if indice_espacial is None:
+    indice_espacial = indice_dos_restaurantes(restaurantes)
+  candidatos = restaurantes.iloc[grade.candidatos_no_raio(indice_espacial, latitude, longitude, raio_km)]
+  distancia = distancia_haversine(latitude, longitude, candidatos['Latitude'], candidatos['Longitude'])
+  candidatos = candidatos.assign(**{'Distância do ponto (km)': distancia.round(3)})
+  return candidatos[distancia <= raio_km].sort_values('Distância do ponto (km)', kind='stable')
+
+def _linhas(df, posicoes, filtros):
+  # Linhas de 'df' nas 'posicoes' (ordenadas) que atendem aos filtros
+  if filtros is not None:
+    posicoes = posicoes[indice.selecionadas(indice.obter_indice(df), filtros, posicoes)]
+  return df.iloc[posicoes]
+
+def entregas_no_raio(df, latitude, longitude, raio_km=RAIO_PADRAO, filtros=None, local='entrega'):
+  '''
+  Pedidos de 'df' (o DataFrame carregado) com o local de entrega (ou o
+  restaurante) a até 'raio_km' do ponto, apenas os da seleção 'filtros'.
+  '''
+  posicoes = grade.candidatos_no_raio(obter_indice(df, local), latitude, longitude, raio_km)
+  coluna_da_latitude, coluna_da_longitude = grade.COORDENADAS[local]
+  # A distância é calculada nos arrays dos candidatos e as linhas são copiadas uma só vez
+  distancia = distancia_haversine(
+    latitude, longitude,
+    df[coluna_da_latitude].to_numpy()[posicoes].astype(np.float64),
+    df[coluna_da_longitude].to_numpy()[posicoes].astype(np.float64))
+  return _linhas(df, posicoes[distancia <= raio_km], filtros)
+
+def entregas_do_restaurante(df, restaurante, filtros=None):
+  '''
+  Pedidos de 'df' (o DataFrame carregado) servidos pelo 'restaurante' (ID da
+  dimensão), pela faixa da sua célula no índice, apenas os da seleção 'filtros'.
+  '''
+  posicoes = grade.pontos_na_celula(obter_indice(df, 'restaurante'), celula_do_restaurante(restaurante), NIVEL_DO_RESTAURANTE)
+  return _linhas(df, np.sort(posicoes), filtros)
@@ -0,0 +1,310 @@
+#######################################
+# Biblioteca
+#######################################
+
+# Agregação de cada painel (consultas.py), sem o Plotly e sem o Streamlit
+import consultas
+
+# Cache dos dados limpos, impressão digital dos filtros, dados de cada seleção e medições
+import cache_dos_dados as cache
+import memoizacao as memo
+import paineis
+import instrumentacao as inst
+
+# Locais das coordenadas, para validar os argumentos dos mapas
+import grade_espacial as grade
+
+# Manipulação dos dados
+import pandas as pd
+
+# Servidor HTTP
+import argparse
+import hashlib
+import http.server
+import inspect
+import json
+import logging
+import threading
+import urllib.parse
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+#######################################
+# Configuração
+#######################################
+
+# Endereço e porta padrão (o Streamlit usa a 8501)
+ENDERECO = '127.0.0.1'
+PORTA = 8502
+
+# CSV bruto servido
+ARQUIVO_DOS_DADOS = 'curry.csv'
+
+# Respostas guardadas (as mais recentes)
+RESPOSTAS_EM_CACHE = 512
+
+# Nome curto de cada filtro na URL. Os valores vêm separados por vírgula e
+# filtros ausentes ficam com todos os valores, como na barra lateral.
+# Ex.: /consultas/tempo_medio_por_tipo_de_trafego?area=Urbana&festival=Sim
+PARAMETROS_DOS_FILTROS = {
+  'trafego': 'Densidade de tráfego',
+  'area': 'Tipo de área',
+  'clima': 'Condição climática',
+  'festival': 'Festival',
+}
+
+#######################################
+# Consultas disponíveis
+#######################################
+# Todas as funções públicas de consultas.py que recebem 'df', 'cubo' ou
+# 'esbocos'. Os demais argumentos vêm da URL, convertidos pelo tipo do
+# valor padrão de cada um; os obrigatórios (sem valor padrão), pelo tipo
+# em TIPOS_DOS_OBRIGATORIOS.
+#######################################
+
+# Tipo de cada argumento obrigatório das consultas
+TIPOS_DOS_OBRIGATORIOS = {
+  'latitude': float,
+  'longitude': float,
+}
+
+def consultas_disponiveis():
+  '''
+  {nome: {'dados': 'df' | 'cubo' | 'esbocos', 'parametros': {nome: valor padrão}, 'obrigatorios': [nomes]}}
+  Os obrigatórios aparecem em 'parametros' com o valor padrão None.
+  '''
+  disponiveis = {}
+  for nome, funcao in inspect.getmembers(consultas, inspect.isfunction):
+    if funcao.__module__ != consultas.__name__ or nome.startswith('_'):
+      continue
+    parametros = list(inspect.signature(funcao).parameters.values())
+    if parametros and parametros[0].name in ('df', 'cubo', 'esbocos'):
+      disponiveis[nome] = {
+        'dados': parametros[0].name,
+        'parametros': {
+          parametro.name: None if parametro.default is inspect.Parameter.empty else parametro.default
+          for parametro in parametros[1:]},
+        'obrigatorios': [
+          parametro.name for parametro in parametros[1:] if parametro.default is inspect.Parameter.empty],
+      }
+  return disponiveis
+
+CONSULTAS = consultas_disponiveis()
+
+def _converter(valor, padrao):
+  # Tuplas (quantis, limites do mapa) vêm separadas por vírgula
+  if isinstance(padrao, tuple) or (padrao is None and ',' in valor):
+    return tuple(float(parte) for parte in valor.split(','))
+  if isinstance(padrao, bool):
+    return valor.lower() in ('1', 'sim', 'true')
+  if isinstance(padrao, (int, float)):
+    return type(padrao)(valor)
+  return valor
+
+# Regras dos argumentos, além do tipo: nome -> (teste, descrição do valor esperado)
+VALIDACOES = {
+  'limites': (lambda valor: isinstance(valor, tuple) and len(valor) == 4, 'sul,oeste,norte,leste'),
+  'quantis': (lambda valor: len(valor) > 0 and all(0 < q < 1 for q in valor), 'quantis entre 0 e 1, separados por vírgula'),
+  'local': (lambda valor: valor in grade.COORDENADAS, ' ou '.join(grade.COORDENADAS)),
+  'modo': (lambda valor: valor in consultas.MODOS_DO_MAPA, ' ou '.join(consultas.MODOS_DO_MAPA)),
+  'zoom': (lambda valor: 0 <= valor <= 24, 'um inteiro de 0 a 24'),
+  'n': (lambda valor: valor >= 1, 'um inteiro maior que zero'),
+  'minimo_de_entregas': (lambda valor: valor >= 1, 'um inteiro maior que zero'),
+  'latitude': (lambda valor: -90 <= valor <= 90, 'uma latitude entre -90 e 90'),
+  'longitude': (lambda valor: -180 <= valor <= 180, 'uma longitude entre -180 e 180'),
+  'raio_km': (lambda valor: valor > 0, 'um raio maior que zero, em km'),
+}
+
+def _validar(nome, valor):
+  teste, esperado = VALIDACOES.get(nome, (lambda valor: True, None))
+  if not teste(valor):
+    raise ValueError('valor inválido para {}: esperado {}'.format(nome, esperado))
+  return valor
+
+def ler_pedido(consulta, parametros_da_url):
+  '''
+  (filtros, argumentos) de uma consulta a partir dos parâmetros da URL.
+  Levanta ValueError com parâmetros desconhecidos, ausentes, vazios ou inválidos.
+  '''
+  filtros = {dimensao: list(valores) for dimensao, valores in paineis.OPCOES_DOS_FILTROS.items()}
+  argumentos = {}
+  for nome, valores in parametros_da_url.items():
+    valor = valores[-1]
+    if nome in PARAMETROS_DOS_FILTROS:
+      dimensao = PARAMETROS_DOS_FILTROS[nome]
+      selecao = [parte for parte in valor.split(',') if parte]
+      if not selecao:
+        raise ValueError('nenhum valor para {}'.format(nome))
+      invalidos = set(selecao) - set(paineis.OPCOES_DOS_FILTROS[dimensao])
+      if invalidos:
+        raise ValueError('valores inválidos para {}: {}'.format(nome, ', '.join(sorted(invalidos))))
+      filtros[dimensao] = selecao
+    elif nome in CONSULTAS[consulta]['obrigatorios']:
+      argumentos[nome] = _validar(nome, TIPOS_DOS_OBRIGATORIOS.get(nome, str)(valor))
+    elif nome in CONSULTAS[consulta]['parametros']:
+      argumentos[nome] = _validar(nome, _converter(valor, CONSULTAS[consulta]['parametros'][nome]))
+    else:
+      raise ValueError('parâmetro desconhecido: {}'.format(nome))
+  ausentes = [nome for nome in CONSULTAS[consulta]['obrigatorios'] if nome not in argumentos]
+  if ausentes:
+    raise ValueError('parâmetros obrigatórios ausentes: {}'.format(', '.join(ausentes)))
+  return filtros, argumentos
+
+#######################################
+# Respostas
+#######################################
+# A chave de cada resposta é a consulta, os argumentos e a impressão
+# digital dos filtros (memoizacao.impressao_dos_filtros), que inclui a
+# versão dos dados: um CSV novo nunca recebe uma resposta antiga. A mesma
+# chave vira o ETag, então clientes que repetem a pergunta recebem 304.
+#######################################
+
+_respostas = OrderedDict()   # chave -> corpo JSON em bytes
+_trava = threading.Lock()
+
+def _para_json(resultado):
+  if hasattr(resultado, 'to_json'):
+    # Índices com nome (ex.: 'ID do restaurante') viram uma coluna dos registros
+    if isinstance(resultado, pd.DataFrame) and resultado.index.name is not None:
+      resultado = resultado.reset_index()
+    return json.loads(resultado.to_json(orient='records', date_format='iso', force_ascii=False))
+  if hasattr(resultado, 'item'):
+    return resultado.item()
+  return resultado
+
+def responder(consulta, filtros, argumentos, caminho=ARQUIVO_DOS_DADOS, limite=RESPOSTAS_EM_CACHE):
+  '''
+  Retorna (etag, corpo JSON em bytes) da consulta, do cache de respostas
+  ou calculada sobre os dados filtrados.
+  '''
+  df, _ = cache.carregar_dados_limpos(caminho)
+  chave_dos_filtros = memo.impressao_dos_filtros(df.attrs.get(cache.ATRIBUTO_DA_VERSAO), filtros)
+  chave = repr((consulta, chave_dos_filtros, sorted(argumentos.items())))
+  etag = '"{}"'.format(hashlib.sha1(chave.encode()).hexdigest()[:16])
+  with _trava:
+    corpo = _respostas.get(chave)
+    if corpo is not None:
+      _respostas.move_to_end(chave)
+      return etag, corpo
+
+  with inst.etapa('filtros', 'filtros', len(df)):
+    dados = paineis.dados_dos_paineis(df, filtros)
+  for valor in dados.values():
+    memo.marcar(valor, chave_dos_filtros)
+  funcao = inst.cronometrar(getattr(consultas, consulta), 'consultas')
+  resultado = funcao(dados[CONSULTAS[consulta]['dados']], **argumentos)
+  corpo = json.dumps({
+    'consulta': consulta,
+    'versao_dos_dados': df.attrs.get(cache.ATRIBUTO_DA_VERSAO),
+    'filtros': filtros,
+    'argumentos': argumentos,
+    'linhas_selecionadas': len(dados['df']),
+    'resultado': _para_json(resultado),
+  }, ensure_ascii=False, default=str).encode('utf-8')
+
+  with _trava:
+    _respostas[chave] = corpo
+    while len(_respostas) > limite:
+      _respostas.popitem(last=False)
+  return etag, corpo
+
+#######################################
+# Servidor
+#######################################
+# GET /consultas               consultas disponíveis e os seus parâmetros
+# GET /consultas/<nome>?...    resultado de uma consulta (JSON)
+# GET /metricas                métricas no formato do Prometheus
+#######################################
+
+class Manipulador(http.server.BaseHTTPRequestHandler):
+  caminho_dos_dados = ARQUIVO_DOS_DADOS
+
+  def _enviar(self, situacao, corpo, tipo='application/json; charset=utf-8', etag=None):
+    self.send_response(situacao)
+    if etag is not None:
+      self.send_header('ETag', etag)
+      self.send_header('Cache-Control', 'no-cache')
+    if corpo is None:
+      self.end_headers()
+      return
+    self.send_header('Content-Type', tipo)
+    self.send_header('Content-Length', str(len(corpo)))
+    self.end_headers()
+    self.wfile.write(corpo)
+
+  def _erro(self, situacao, mensagem):
+    self._enviar(situacao, json.dumps({'erro': mensagem}, ensure_ascii=False).encode('utf-8'))
+
+  def do_GET(self):
+    url = urllib.parse.urlsplit(self.path)
+    partes = [parte for parte in url.path.split('/') if parte]
+    inst.iniciar_execucao()
+    try:
+      if partes == ['consultas']:
+        self._enviar(200, json.dumps(CONSULTAS, ensure_ascii=False).encode('utf-8'))
+      elif len(partes) == 2 and partes[0] == 'consultas':
+        if partes[1] not in CONSULTAS:
+          return self._erro(404, 'consulta desconhecida: {}'.format(partes[1]))
+        try:
+          # Valores vazios (ex.: 'area=') chegam a ler_pedido, que os recusa
+          filtros, argumentos = ler_pedido(partes[1], urllib.parse.parse_qs(url.query, keep_blank_values=True))
+        except ValueError as erro:
+          return self._erro(400, str(erro))
+        try:
+          with inst.etapa(partes[1], 'servico'):
+            etag, corpo = responder(partes[1], filtros, argumentos, self.caminho_dos_dados)
+        except (TypeError, ValueError) as erro:
+          # Argumentos aceitos pela leitura, mas recusados pela consulta
+          logger.debug('Pedido inválido %s: %s', self.path, erro)
+          return self._erro(400, 'argumentos inválidos: {}'.format(erro))
+        if self.headers.get('If-None-Match') == etag:
+          return self._enviar(304, None, etag=etag)
+        self._enviar(200, corpo, etag=etag)
+      elif partes == ['metricas']:
+        self._enviar(200, inst.metricas_prometheus().encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8')
+      else:
+        self._erro(404, 'caminho desconhecido: {}'.format(url.path))
+    except Exception:
+      logger.exception('Falha ao responder %s', self.path)
+      self._erro(500, 'erro interno')
+    finally:
+      inst.finalizar_execucao()
+
+  def log_message(self, formato, *args):
+    logger.debug('%s - %s', self.address_string(), formato % args)
+
+def servir(endereco=ENDERECO, porta=PORTA, caminho=ARQUIVO_DOS_DADOS):
+  '''
+  Serviço HTTP com as consultas, uma thread por requisição. Os dados são
+  limpos e indexados uma vez e compartilhados pelas threads.
+  '''
+  manipulador = type('Manipulador', (Manipulador,), {'caminho_dos_dados': caminho})
+  servidor = http.server.ThreadingHTTPServer((endereco, porta), manipulador)
+  # Carrega os dados antes da primeira requisição
+  cache.carregar_dados_limpos(caminho)
+  return servidor
+
+#######################################
+# Linha de comando
+#######################################
+
+def main(argumentos=None):
+  parser = argparse.ArgumentParser(description='Serviço HTTP/JSON com as consultas do dashboard.')
+  parser.add_argument('caminho', nargs='?', default=ARQUIVO_DOS_DADOS, help='CSV bruto (formato do curry.csv)')
+  parser.add_argument('--endereco', default=ENDERECO)
+  parser.add_argument('--porta', type=int, default=PORTA)
+  argumentos = parser.parse_args(argumentos)
+
+  logging.basicConfig()
+  servidor = servir(argumentos.endereco, argumentos.porta, argumentos.caminho)
+  print('Servindo {} em http://{}:{}/consultas'.format(argumentos.caminho, argumentos.endereco, argumentos.porta))
+  try:
+    servidor.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    servidor.server_close()
+
+if __name__ == '__main__':
+  main()
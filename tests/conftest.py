@@ -0,0 +1,34 @@
+#######################################
+# Biblioteca
+#######################################
+
+# Testes
+import os
+import sys
+import pytest
+
+# Os módulos do dashboard ficam na raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+#######################################
+# Dados sintéticos
+#######################################
+# CSV no formato do curry.csv, gerado por benchmark.gerar_dados_brutos (o
+# mesmo gerador das medições), com os mesmos textos de informação faltando
+# ('NaN '), espaços sobrando e prefixos, a partir de uma semente.
+#######################################
+
+@pytest.fixture(scope='session')
+def arquivo_bruto(tmp_path_factory):
+  '''
+  Caminho de um CSV bruto sintético com 3.000 linhas.
+  '''
+  caminho = tmp_path_factory.mktemp('dados') / 'curry.csv'
+  import benchmark
+  benchmark.gerar_dados_brutos(3000).to_csv(caminho, index=False)
+  return str(caminho)
+
+@pytest.fixture(scope='session')
+def dados_limpos(arquivo_bruto):
+  import ferramentas as fr
+  return fr.limpeza_dos_dados(fr.ler_dados(arquivo_bruto))
@@ -0,0 +1,85 @@
+#######################################
+# Biblioteca
+#######################################
+
+import numpy as np
+import pytest
+
+import armazenamento as arm
+import cubo as cb
+import ferramentas as fr
+import indice_de_filtros as indice
+
+#######################################
+# Dados
+#######################################
+
+@pytest.fixture
+def dataset(arquivo_bruto, tmp_path):
+  '''
+  Dataset com a primeira metade dos pedidos e o lote bruto com a segunda.
+  '''
+  bruto = fr.ler_dados(arquivo_bruto)
+  metade = len(bruto) // 2
+  diretorio = str(tmp_path / 'colunar')
+  arm.gravar_dataset(fr.limpeza_dos_dados(bruto.iloc[:metade]), diretorio)
+  return diretorio, bruto.iloc[metade:]
+
+@pytest.fixture(scope='module')
+def dataset_completo(dados_limpos, tmp_path_factory):
+  diretorio = str(tmp_path_factory.mktemp('dataset') / 'colunar')
+  arm.gravar_dataset(dados_limpos, diretorio)
+  return diretorio
+
+#######################################
+# Testes
+#######################################
+
+def test_anexar_lote(dataset, dados_limpos):
+  diretorio, lote = dataset
+  anexadas, acumuladores = arm.anexar_lote(lote, diretorio)
+  assert anexadas > 0
+  assert acumuladores['linhas'] == len(dados_limpos)
+  assert arm.carregar_acumuladores(diretorio)['linhas'] == len(dados_limpos)
+  assert len(arm.ler_dataset(['ID da entrega'], diretorio=diretorio)) == len(dados_limpos)
+  # O mesmo lote de novo não anexa nada
+  assert arm.anexar_lote(lote, diretorio)[0] == 0
+
+def test_anexacao_interrompida_antes_dos_acumuladores(dataset, dados_limpos, monkeypatch):
+  diretorio, lote = dataset
+  gravar = arm._gravar_acumuladores
+
+  def interromper(*args, **kwargs):
+    raise KeyboardInterrupt
+  monkeypatch.setattr(arm, '_gravar_acumuladores', interromper)
+  with pytest.raises(KeyboardInterrupt):
+    arm.anexar_lote(lote, diretorio)
+  monkeypatch.setattr(arm, '_gravar_acumuladores', gravar)
+
+  # As linhas foram movidas para o dataset sem entrar nos acumuladores gravados:
+  # a lista de arquivos não bate e eles são recalculados
+  assert arm.carregar_acumuladores(diretorio)['linhas'] == len(dados_limpos)
+  assert arm.anexar_lote(lote, diretorio)[0] == 0
+  assert arm.carregar_acumuladores(diretorio)['linhas'] == len(dados_limpos)
+
+@pytest.mark.parametrize('filtros', [None, {'Tipo de área': ['Urbana'], 'Festival': ['Não']}])
+@pytest.mark.parametrize('dimensoes', [['Densidade de tráfego'], ['Tipo de área', 'Condição do veículo']])
+def test_agregar_com_duckdb_igual_ao_cubo(dataset_completo, dados_limpos, dimensoes, filtros):
+  pytest.importorskip('duckdb')
+  obtido = arm.agregar_com_duckdb(dimensoes, 'Tempo de entrega (min)', filtros, diretorio=dataset_completo)
+  esperado = cb.agregar(indice.filtrar(cb.obter_cubo(dados_limpos), filtros or {}), dimensoes, 'Tempo de entrega (min)')
+  assert obtido[dimensoes].astype(str).values.tolist() == esperado[dimensoes].astype(str).values.tolist()
+  np.testing.assert_array_equal(obtido['Quantidade'], esperado['Quantidade'])
+  np.testing.assert_allclose(obtido['Média'], esperado['Média'], rtol=1e-9)
+  np.testing.assert_allclose(obtido['Desvio padrão'], esperado['Desvio padrão'], rtol=1e-6)
+
+@pytest.mark.parametrize('filtros', [None, {}, {'Tipo de área': ['Urbana']}, {'Tipo de área': []}])
+def test_agregar_com_duckdb_sem_dimensoes(dataset_completo, dados_limpos, filtros):
+  # Sem GROUP BY: uma linha com o total (e, sem filtros, 'WHERE true')
+  pytest.importorskip('duckdb')
+  obtido = arm.agregar_com_duckdb([], 'Tempo de entrega (min)', filtros, diretorio=dataset_completo)
+  selecionadas = indice.filtrar(dados_limpos, filtros or {})
+  assert len(obtido) == 1
+  assert obtido.loc[0, 'Quantidade'] == len(selecionadas)
+  if len(selecionadas):
+    assert obtido.loc[0, 'Média'] == pytest.approx(selecionadas['Tempo de entrega (min)'].mean())
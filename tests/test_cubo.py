@@ -0,0 +1,78 @@
+#######################################
+# Biblioteca
+#######################################
+
+import numpy as np
+import pytest
+
+import cubo as cb
+import indice_de_filtros as indice
+
+#######################################
+# Agrupamentos
+#######################################
+# Os mesmos agrupamentos dos painéis, inclusive dimensões com valores vazios
+# (tipo e condição do veículo, condição climática têm NaN após a tradução).
+#######################################
+
+AGRUPAMENTOS = [
+  ['Densidade de tráfego'],
+  ['Tipo de área', 'Densidade de tráfego'],
+  ['Tipo de veículo'],
+  ['Condição do veículo', 'Festival'],
+  ['Condição climática', 'Tipo de pedido'],
+  ['Data do pedido'],
+]
+
+FILTROS = {
+  'Densidade de tráfego': ['Baixo', 'Alto'],
+  'Tipo de área': ['Urbana', 'Metropolitana'],
+  'Festival': ['Não'],
+}
+
+def comparar_com_as_linhas(cubo, df, dimensoes, medida):
+  obtido = cb.agregar(cubo, dimensoes, medida).set_index(dimensoes)
+  if medida is None:
+    esperado = df.groupby(dimensoes, observed=True).size()
+    assert obtido['Quantidade'].to_dict() == esperado.to_dict()
+    return
+  esperado = df[medida].astype(np.float64).groupby([df[dimensao] for dimensao in dimensoes], observed=True).agg(['size', 'mean', 'std'])
+  assert obtido.index.tolist() == esperado.index.tolist()
+  np.testing.assert_array_equal(obtido['Quantidade'], esperado['size'])
+  np.testing.assert_allclose(obtido['Média'], esperado['mean'], rtol=1e-9)
+  np.testing.assert_allclose(obtido['Desvio padrão'], esperado['std'], rtol=1e-6, atol=1e-9)
+
+#######################################
+# Testes
+#######################################
+
+def test_dimensoes_vazias_nos_dados(dados_limpos):
+  # Sem isso os testes não cobririam as células com NaN
+  assert dados_limpos['Tipo de veículo'].isna().any()
+  assert dados_limpos['Condição do veículo'].isna().any()
+
+def test_total_do_cubo_igual_ao_das_linhas(dados_limpos):
+  cubo = cb.construir_cubo(dados_limpos)
+  assert len(cubo) < len(dados_limpos)
+  assert cubo['Quantidade'].sum() == len(dados_limpos)
+  for medida in cb.MEDIDAS_DO_CUBO:
+    assert cubo[cb.coluna_da_soma(medida)].sum() == pytest.approx(dados_limpos[medida].astype(np.float64).sum(), rel=1e-12)
+
+@pytest.mark.parametrize('medida', [None] + cb.MEDIDAS_DO_CUBO)
+@pytest.mark.parametrize('dimensoes', AGRUPAMENTOS)
+def test_agregar_igual_ao_groupby(dados_limpos, dimensoes, medida):
+  comparar_com_as_linhas(cb.obter_cubo(dados_limpos), dados_limpos, dimensoes, medida)
+
+@pytest.mark.parametrize('medida', [None, 'Tempo de entrega (min)'])
+@pytest.mark.parametrize('dimensoes', AGRUPAMENTOS)
+def test_cubo_filtrado_igual_as_linhas_filtradas(dados_limpos, dimensoes, medida):
+  cubo = indice.filtrar(cb.obter_cubo(dados_limpos), FILTROS)
+  mascara = np.ones(len(dados_limpos), dtype=bool)
+  for dimensao, valores in FILTROS.items():
+    mascara &= dados_limpos[dimensao].isin(valores).to_numpy()
+  comparar_com_as_linhas(cubo, dados_limpos[mascara], dimensoes, medida)
+
+def test_dimensao_que_nao_e_categorica(dados_limpos):
+  # A data volta com o tipo original, e não como categoria
+  cubo = cb.construir_cubo(dados_limpos)
+  assert cubo['Data do pedido'].dtype == dados_limpos['Data do pedido'].dtype
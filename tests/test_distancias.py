@@ -0,0 +1,68 @@
+#######################################
+# Biblioteca
+#######################################
+
+import numpy as np
+import pytest
+
+from geographiclib.geodesic import Geodesic
+
+from distancias import calcular_distancias, distancia_elipsoidal, distancia_haversine
+
+#######################################
+# Pares de coordenadas
+#######################################
+
+def pares_aleatorios(linhas, semente=0):
+  aleatorio = np.random.default_rng(semente)
+  latitudes = aleatorio.uniform(-89.9, 89.9, (2, linhas))
+  longitudes = aleatorio.uniform(-180, 180, (2, linhas))
+  return latitudes[0], longitudes[0], latitudes[1], longitudes[1]
+
+def distancias_do_geographiclib(lat1, long1, lat2, long2):
+  return np.array([
+    Geodesic.WGS84.Inverse(*par)['s12'] / 1000
+    for par in zip(lat1, long1, lat2, long2)])
+
+#######################################
+# Testes
+#######################################
+
+def test_elipsoidal_igual_ao_geographiclib():
+  pares = pares_aleatorios(5000)
+  erro = np.abs(distancia_elipsoidal(*pares) - distancias_do_geographiclib(*pares))
+  assert erro.max() < 1e-6
+
+def test_elipsoidal_em_casos_extremos():
+  # Mesmo ponto, equador, meridiano, polos e pares quase antípodas (Vincenty não converge)
+  lat1 = np.array([12.9, 0.0, 0.0, 10.0, 90.0, 0.0, 0.5, -30.0])
+  long1 = np.array([77.6, 0.0, 10.0, 45.0, 0.0, 0.0, 0.0, 20.0])
+  lat2 = np.array([12.9, 0.0, 0.0, -10.0, -90.0, 0.5, -0.5, 30.0])
+  long2 = np.array([77.6, 90.0, 179.5, 45.0, 0.0, 179.7, 179.8, -160.0])
+  distancias = distancia_elipsoidal(lat1, long1, lat2, long2)
+  assert np.isfinite(distancias).all()
+  erro = np.abs(distancias - distancias_do_geographiclib(lat1, long1, lat2, long2))
+  assert erro.max() < 1e-6
+
+def test_distancias_curtas_como_as_dos_pedidos():
+  aleatorio = np.random.default_rng(1)
+  lat1 = aleatorio.uniform(10, 30, 2000)
+  long1 = aleatorio.uniform(70, 90, 2000)
+  lat2 = lat1 + aleatorio.uniform(-0.2, 0.2, 2000)
+  long2 = long1 + aleatorio.uniform(-0.2, 0.2, 2000)
+  erro = np.abs(distancia_elipsoidal(lat1, long1, lat2, long2) - distancias_do_geographiclib(lat1, long1, lat2, long2))
+  assert erro.max() < 1e-6
+
+@pytest.mark.parametrize('metodo', ['elipsoidal', 'haversine'])
+def test_blocos_nao_mudam_o_resultado(metodo):
+  pares = pares_aleatorios(1000, semente=2)
+  inteiro = calcular_distancias(*pares, metodo=metodo)
+  em_blocos = calcular_distancias(*pares, metodo=metodo, tamanho_do_bloco=97)
+  # O laço de Vincenty para quando todo o bloco converge: diferenças abaixo de 1e-8 km
+  np.testing.assert_allclose(inteiro, em_blocos, rtol=0, atol=1e-8)
+
+def test_haversine_dentro_do_erro_da_esfera():
+  pares = pares_aleatorios(2000, semente=3)
+  esperado = distancias_do_geographiclib(*pares)
+  relativo = np.abs(distancia_haversine(*pares) - esperado) / np.maximum(esperado, 1e-9)
+  assert relativo.max() < 0.006
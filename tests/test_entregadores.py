@@ -0,0 +1,77 @@
+#######################################
+# Biblioteca
+#######################################
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import consultas
+import entregadores as ent
+import indice_de_filtros as indice
+
+#######################################
+# Painéis respondidos pelos perfis
+#######################################
+
+PAINEIS = [
+  'quantidade_de_entregadores_por_idade',
+  'condicao_veiculos',
+  'avaliacao_media_por_entregador',
+  'ranking_de_entregadores',
+  'quantidade_de_entregadores_unicos',
+]
+
+def blocos(df, n):
+  limites = np.linspace(0, len(df), n + 1).astype(int)
+  return [df.iloc[inicio:fim] for inicio, fim in zip(limites[:-1], limites[1:])]
+
+#######################################
+# Testes
+#######################################
+
+def test_perfis_em_blocos_iguais_a_um_bloco(dados_limpos):
+  inteiro = ent.construir_perfis(dados_limpos)
+  primeiro, segundo, terceiro = blocos(dados_limpos, 3)
+  combinados = ent.combinar_perfis(ent.construir_perfis(terceiro), ent.construir_perfis(primeiro))
+  combinados = ent.atualizar_perfis(combinados, segundo)
+  pd.testing.assert_frame_equal(combinados[inteiro.columns], inteiro)
+  # As somas em outra ordem podem mudar o último dígito de uma média arredondada
+  pd.testing.assert_frame_equal(ent.tabela_dos_perfis(combinados), ent.tabela_dos_perfis(inteiro), atol=0.011)
+
+def test_perfis_de_blocos_com_valores_diferentes(dados_limpos):
+  # Idades e avaliações que só aparecem em um dos blocos viram colunas zeradas no outro
+  ordenados = dados_limpos.sort_values('Idade do entregador')
+  metade = len(ordenados) // 2
+  combinados = ent.atualizar_perfis(ent.construir_perfis(ordenados.iloc[:metade]), ordenados.iloc[metade:])
+  inteiro = ent.construir_perfis(dados_limpos)
+  assert set(combinados.columns) == set(inteiro.columns)
+  pd.testing.assert_frame_equal(combinados[inteiro.columns], inteiro)
+
+def test_combinar_com_perfis_vazios(dados_limpos):
+  perfis = ent.construir_perfis(dados_limpos)
+  assert ent.combinar_perfis(pd.DataFrame(), perfis) is perfis
+  assert ent.combinar_perfis(perfis, pd.DataFrame()) is perfis
+
+@pytest.mark.parametrize('painel', PAINEIS)
+def test_painel_sem_filtros_igual_as_linhas(dados_limpos, painel):
+  funcao = getattr(consultas, painel).__wrapped__
+  sem_filtros = indice.filtrar(dados_limpos, {})
+  assert indice.origem_sem_filtro(sem_filtros) is dados_limpos
+  # Uma cópia sem a origem agrupa as linhas
+  linhas = dados_limpos.copy(deep=False)
+  assert indice.origem_sem_filtro(linhas) is None
+  obtido, esperado = funcao(sem_filtros), funcao(linhas)
+  if isinstance(esperado, pd.DataFrame):
+    pd.testing.assert_frame_equal(obtido, esperado)
+  else:
+    assert obtido == esperado
+
+def test_selecao_filtrada_agrupa_as_linhas(dados_limpos):
+  filtrado = indice.filtrar(dados_limpos, {'Tipo de área': ['Urbana']})
+  assert indice.origem_sem_filtro(filtrado) is None
+  # Um DataFrame derivado leva os attrs da cópia, mas não é a seleção inteira
+  derivado = indice.filtrar(dados_limpos, {})
+  derivado = derivado[derivado['Tipo de área'] == 'Urbana']
+  assert indice.origem_sem_filtro(derivado) is None
+  assert consultas.quantidade_de_entregadores_unicos(derivado) == derivado['ID do entregador'].nunique()
@@ -0,0 +1,75 @@
+#######################################
+# Biblioteca
+#######################################
+
+import numpy as np
+import pytest
+
+import indice_de_filtros as indice
+
+#######################################
+# Seleções
+#######################################
+
+SELECOES = [
+  {'Densidade de tráfego': ['Alto']},
+  {'Densidade de tráfego': ['Baixo', 'Engarrafado'], 'Tipo de área': ['Urbana']},
+  {'Densidade de tráfego': ['Baixo', 'Médio', 'Alto', 'Engarrafado'], 'Condição climática': ['Nublado', 'Ventoso'], 'Festival': ['Sim']},
+  # Valores que não existem nos dados não selecionam nada
+  {'Tipo de área': ['Urbana', 'Rural']},
+  {'Festival': ['Talvez']},
+  # Dimensão sem nenhum valor selecionado
+  {'Tipo de área': []},
+]
+
+def mascara_do_isin(df, filtros):
+  mascara = np.ones(len(df), dtype=bool)
+  for dimensao, valores in filtros.items():
+    mascara &= df[dimensao].isin(valores).to_numpy()
+  return mascara
+
+#######################################
+# Testes
+#######################################
+
+@pytest.mark.parametrize('filtros', SELECOES)
+def test_selecionar_igual_ao_isin(dados_limpos, filtros):
+  mascara = indice.selecionar(indice.obter_indice(dados_limpos), filtros)
+  np.testing.assert_array_equal(mascara, mascara_do_isin(dados_limpos, filtros))
+
+@pytest.mark.parametrize('filtros', SELECOES)
+def test_selecionadas_igual_ao_isin(dados_limpos, filtros):
+  # Posições soltas, inclusive as dos últimos bits do último byte
+  posicoes = np.r_[np.arange(0, len(dados_limpos), 7), len(dados_limpos) - 1]
+  obtido = indice.selecionadas(indice.obter_indice(dados_limpos), filtros, posicoes)
+  np.testing.assert_array_equal(obtido, mascara_do_isin(dados_limpos, filtros)[posicoes])
+
+@pytest.mark.parametrize('filtros', SELECOES)
+def test_filtrar_igual_ao_isin(dados_limpos, filtros):
+  filtrado = indice.filtrar(dados_limpos, filtros)
+  assert filtrado.index.equals(dados_limpos.index[mascara_do_isin(dados_limpos, filtros)])
+
+def test_linhas_vazias_nao_sao_selecionadas(dados_limpos):
+  # Como no isin, NaN não está em nenhum bitmap, nem selecionando todas as categorias
+  categorias = list(dados_limpos['Condição climática'].cat.categories)
+  mascara = indice.selecionar(indice.obter_indice(dados_limpos), {'Condição climática': categorias})
+  assert dados_limpos['Condição climática'].isna().any()
+  np.testing.assert_array_equal(mascara, dados_limpos['Condição climática'].notna().to_numpy())
+
+def test_sem_filtros_copia_rasa(dados_limpos):
+  filtrado = indice.filtrar(dados_limpos, {})
+  assert filtrado is not dados_limpos
+  assert filtrado.index.equals(dados_limpos.index)
+  # As colunas são as mesmas, sem cópia dos dados
+  for coluna in ['Tempo de entrega (min)', 'Distância (km)', 'Data do pedido']:
+    assert np.shares_memory(filtrado[coluna].to_numpy(), dados_limpos[coluna].to_numpy())
+  # Um atributo novo na cópia não aparece no original
+  filtrado.attrs['marcado'] = True
+  assert 'marcado' not in dados_limpos.attrs
+
+def test_todas_as_linhas_selecionadas_copia_rasa(dados_limpos):
+  # A limpeza retira os pedidos sem Festival: todos os valores selecionam todas as linhas
+  filtros = {'Festival': list(dados_limpos['Festival'].unique())}
+  filtrado = indice.filtrar(dados_limpos, filtros)
+  assert len(filtrado) == len(dados_limpos)
+  assert np.shares_memory(filtrado['Tempo de entrega (min)'].to_numpy(), dados_limpos['Tempo de entrega (min)'].to_numpy())
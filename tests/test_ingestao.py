@@ -0,0 +1,64 @@
+#######################################
+# Biblioteca
+#######################################
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ingestao
+import periodos
+
+#######################################
+# Dados
+#######################################
+
+def um_ano_depois(df):
+  # Os mesmos pedidos um ano depois: as mesmas semanas do ano, em outro ano
+  df = df.copy()
+  df['Data do pedido'] = df['Data do pedido'] + pd.DateOffset(years=1)
+  df.index = df.index + len(df)
+  return df
+
+#######################################
+# Testes
+#######################################
+
+def test_blocos_combinados_iguais_a_um_bloco(dados_limpos):
+  metade = len(dados_limpos) // 2
+  combinados = ingestao.combinar_acumuladores(
+    ingestao.agregar_bloco(dados_limpos.iloc[:metade]),
+    ingestao.agregar_bloco(dados_limpos.iloc[metade:]))
+  inteiro = ingestao.agregar_bloco(dados_limpos)
+  assert combinados['linhas'] == inteiro['linhas'] == len(dados_limpos)
+  for nome in ['pedidos_por_dia', 'pedidos_por_semana', 'entregadores_por_semana']:
+    pd.testing.assert_series_equal(combinados[nome].sort_index(), inteiro[nome].sort_index(), check_dtype=False, obj=nome)
+  for dimensao in ingestao.DIMENSOES:
+    esperado = ingestao.media_e_desvio_padrao(inteiro, dimensao, 'Tempo de entrega (min)')
+    obtido = ingestao.media_e_desvio_padrao(combinados, dimensao, 'Tempo de entrega (min)').loc[esperado.index]
+    np.testing.assert_allclose(obtido.to_numpy(np.float64), esperado.to_numpy(np.float64), rtol=1e-9)
+
+def test_semanas_de_anos_diferentes_nao_se_misturam(dados_limpos):
+  depois = um_ano_depois(dados_limpos)
+  combinados = ingestao.combinar_acumuladores(ingestao.agregar_bloco(dados_limpos), ingestao.agregar_bloco(depois))
+  todos = pd.concat([dados_limpos, depois])
+  semana = periodos.semana_do_pedido(todos['Data do pedido'])
+
+  esperado = semana.groupby(semana).size()
+  obtido = combinados['pedidos_por_semana'].sort_index()
+  np.testing.assert_array_equal(obtido.index, esperado.index)
+  np.testing.assert_array_equal(obtido.to_numpy(), esperado.to_numpy())
+  assert len(np.unique(obtido.index // 100)) == 2
+
+  # Pedidos por entregador: os totais de cada semana divididos pelos entregadores daquela semana
+  entregadores = todos['ID do entregador'].astype(str).groupby(semana).nunique()
+  pd.testing.assert_series_equal(
+    ingestao.pedidos_por_entregador_por_semana(combinados).sort_index(),
+    (esperado / entregadores).rename('Pedido por entregador'),
+    check_names=False, check_index_type=False)
+
+def test_versao_diferente_nao_combina(dados_limpos):
+  antigo = ingestao.agregar_bloco(dados_limpos.iloc[:10])
+  antigo['versao'] = ingestao.VERSAO_DOS_ACUMULADORES - 1
+  with pytest.raises(ValueError):
+    ingestao.combinar_acumuladores(antigo, ingestao.novos_acumuladores())
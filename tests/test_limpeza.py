@@ -0,0 +1,87 @@
+#######################################
+# Biblioteca
+#######################################
+
+import numpy as np
+import pandas as pd
+
+from geopy.distance import geodesic
+
+import ferramentas as fr
+
+#######################################
+# Limpeza original
+#######################################
+# A limpeza coluna a coluna, com uma cópia por filtro e a distância do
+# geopy linha a linha, como era antes da limpeza em uma passada. É a
+# referência do resultado esperado.
+#######################################
+
+TRADUCOES_ORIGINAIS = {
+  'Condição climática': {'Sunny': 'Ensolarado', 'Stormy': 'Tempestuoso', 'Sandstorms': 'Tempestades de areia', 'Cloudy': 'Nublado', 'Fog': 'Nebuloso', 'Windy': 'Ventoso'},
+  'Tipo de área': {'Urban': 'Urbana', 'Metropolitian': 'Metropolitana', 'Semi-Urban': 'Semi-urbana'},
+  'Densidade de tráfego': {'High': 'Alto', 'Jam': 'Engarrafado', 'Low': 'Baixo', 'Medium': 'Médio'},
+  'Festival': {'Yes': 'Sim', 'No': 'Não'},
+  'Tipo de veículo': {'motorcycle': 'Motocicleta', 'scooter': 'Scooter', 'electric_scooter': 'Scooter Elétrica'},
+  'Tipo de pedido': {'Snack': 'Lanche', 'Drinks': 'Bebidas', 'Buffet': 'Buffet', 'Meal': 'Refeição'},
+  'Condição do veículo': {0: 'Ruim', 1: 'Normal', 2: 'Boa'},
+}
+
+def limpeza_original(df):
+  df = df.rename(columns=fr.COLUNAS)
+  df = df.dropna()
+  for coluna in df.columns:
+    df = df.loc[(df[coluna] != 'NaN') & (df[coluna] != 'NaN '), :]
+  for coluna in df.select_dtypes(include='object').columns:
+    df.loc[:, coluna] = df.loc[:, coluna].str.strip()
+  for coluna in ['Idade do entregador', 'Entregas multiplas']:
+    df[coluna] = df[coluna].astype(int)
+  for coluna in ['Avaliação do entregador', 'Latitude do restaurante', 'Longitude do restaurante', 'Latitude da entrega', 'Longitude da entrega']:
+    df[coluna] = df[coluna].astype(float)
+  df['Data do pedido'] = pd.to_datetime(df['Data do pedido'], format='%d-%m-%Y')
+  df['Tempo de entrega (min)'] = df['Tempo de entrega (min)'].str.extract(r'(\d+)').astype(int)
+  df['Condição climática'] = df['Condição climática'].str.replace('conditions ', '')
+  for coluna, dicionario in TRADUCOES_ORIGINAIS.items():
+    df[coluna] = df[coluna].map(dicionario)
+  df['Distância (km)'] = df.apply(lambda linha: geodesic(
+    (linha['Latitude do restaurante'], linha['Longitude do restaurante']),
+    (linha['Latitude da entrega'], linha['Longitude da entrega'])).km, axis=1)
+  return df
+
+#######################################
+# Testes
+#######################################
+
+def test_limpeza_igual_a_original(arquivo_bruto, dados_limpos):
+  esperado = limpeza_original(pd.read_csv(arquivo_bruto))
+  df = dados_limpos
+
+  # As mesmas linhas, na mesma ordem e com o mesmo índice
+  pd.testing.assert_index_equal(df.index, esperado.index)
+  assert len(df) > 0.5 * len(pd.read_csv(arquivo_bruto))
+
+  for coluna in esperado.columns:
+    valores, referencia = df[coluna], esperado[coluna]
+    if coluna in ('Horário do pedido', 'Horário da retirada'):
+      # Os horários agora são timedelta
+      np.testing.assert_array_equal(valores.to_numpy(), pd.to_timedelta(referencia).to_numpy(), err_msg=coluna)
+    elif referencia.dtype.kind == 'f':
+      # Coordenadas e distância são guardadas em float32 (esquema.py)
+      np.testing.assert_allclose(valores.to_numpy(np.float64), referencia.to_numpy(), rtol=1e-6, atol=1e-5, err_msg=coluna)
+    else:
+      # Categorias e textos: o mesmo valor, inclusive os vazios das traduções
+      obtidos = valores.astype(object).where(valores.notna(), None).tolist()
+      esperados = referencia.astype(object).where(referencia.notna(), None).tolist()
+      assert obtidos == esperados, coluna
+
+def test_categorias_ordenadas(dados_limpos):
+  densidade = dados_limpos['Densidade de tráfego']
+  assert densidade.cat.ordered
+  assert list(densidade.cat.categories) == ['Baixo', 'Médio', 'Alto', 'Engarrafado']
+  assert list(dados_limpos['Condição climática'].cat.categories) == [
+    'Ensolarado', 'Nublado', 'Nebuloso', 'Ventoso', 'Tempestuoso', 'Tempestades de areia']
+
+def test_limpeza_sem_linhas(arquivo_bruto):
+  vazio = fr.limpeza_dos_dados(fr.ler_dados(arquivo_bruto, nrows=0))
+  assert len(vazio) == 0
+  assert 'Distância (km)' in vazio.columns
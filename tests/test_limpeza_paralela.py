@@ -0,0 +1,49 @@
+#######################################
+# Biblioteca
+#######################################
+
+import os
+
+import pandas as pd
+
+import ferramentas as fr
+import limpeza_paralela as lp
+
+# Blocos pequenos, para que o CSV de teste vire várias partes
+TAMANHO_DO_BLOCO = 64 << 10
+
+#######################################
+# Testes
+#######################################
+
+def test_blocos_cobrem_o_arquivo(arquivo_bruto):
+  cabecalho, faixas = lp.blocos_do_arquivo(arquivo_bruto, TAMANHO_DO_BLOCO)
+  assert len(faixas) > 2
+  assert faixas[0][0] == len(cabecalho)
+  assert faixas[-1][1] == os.path.getsize(arquivo_bruto)
+  assert all(fim == inicio for (_, fim), (inicio, _) in zip(faixas, faixas[1:]))
+
+def test_limpeza_em_paralelo_igual_a_de_uma_vez(arquivo_bruto, dados_limpos):
+  df = lp.limpar_em_paralelo(arquivo_bruto, processos=2, tamanho_do_bloco=TAMANHO_DO_BLOCO)
+  pd.testing.assert_frame_equal(df, dados_limpos)
+
+def test_partes_em_parquet(arquivo_bruto, dados_limpos, tmp_path):
+  destino = str(tmp_path / 'partes')
+  # Uma execução com blocos menores deixa mais partes; a seguinte não pode misturá-las
+  lp.limpar_em_paralelo(arquivo_bruto, processos=2, tamanho_do_bloco=TAMANHO_DO_BLOCO // 2, destino=destino)
+  arquivos = lp.limpar_em_paralelo(arquivo_bruto, processos=2, tamanho_do_bloco=TAMANHO_DO_BLOCO, destino=destino)
+  assert sorted(arquivos) == sorted(lp._arquivos_das_partes(destino))
+  esperado = dados_limpos.reset_index(drop=True)
+  pd.testing.assert_frame_equal(lp.ler_partes(arquivos=arquivos), esperado)
+  pd.testing.assert_frame_equal(lp.ler_partes(destino), esperado)
+
+def test_arquivo_so_com_o_cabecalho(arquivo_bruto, tmp_path):
+  caminho = tmp_path / 'vazio.csv'
+  with open(arquivo_bruto, 'rb') as arquivo:
+    caminho.write_bytes(arquivo.readline())
+  df = lp.limpar_em_paralelo(str(caminho), processos=2)
+  assert len(df) == 0
+  pd.testing.assert_frame_equal(df, fr.limpeza_dos_dados(fr.ler_dados(arquivo_bruto, nrows=0)))
+  # Os tipos são os da limpeza com linhas (as categorias dos IDs vêm dos dados)
+  com_linhas = fr.limpeza_dos_dados(fr.ler_dados(arquivo_bruto, nrows=50))
+  assert df.dtypes.astype(str).to_dict() == com_linhas.dtypes.astype(str).to_dict()
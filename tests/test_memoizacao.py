@@ -0,0 +1,121 @@
+#######################################
+# Biblioteca
+#######################################
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import memoizacao as memo
+
+#######################################
+# Funções memorizadas
+#######################################
+
+chamadas = []
+
+@memo.memorizar
+def contar(df, coluna='x'):
+  chamadas.append(coluna)
+  return df.groupby(coluna).size().rename('Quantidade').reset_index()
+
+@memo.memorizar
+def tabela_grande(df, linhas):
+  chamadas.append(linhas)
+  return pd.DataFrame({'valor': np.arange(linhas, dtype=np.int64)})
+
+@memo.memorizar
+def indice_espacial(df):
+  chamadas.append('indice')
+  return {'chaves': np.arange(600, dtype=np.int64), 'posicoes': np.arange(600, dtype=np.int64)}
+
+@memo.memorizar
+def grafico(df):
+  # Como as figuras de ferramentas.py sobre as tabelas de consultas.py
+  return {'tabela': memo.sem_cache(contar)(df)}
+
+@pytest.fixture(autouse=True)
+def cache_vazio():
+  memo.limpar()
+  chamadas.clear()
+  orcamento = memo.estatisticas()['orcamento']
+  yield
+  memo.definir_orcamento(orcamento)
+  memo.limpar()
+
+def dados(chave='a'):
+  return memo.marcar(pd.DataFrame({'x': [1, 1, 2], 'y': [3, 4, 4]}), chave)
+
+#######################################
+# Testes
+#######################################
+
+def test_sem_impressao_digital_nao_usa_o_cache():
+  df = pd.DataFrame({'x': [1, 1, 2]})
+  contar(df)
+  contar(df)
+  assert chamadas == ['x', 'x']
+  estatisticas = memo.estatisticas()
+  assert (estatisticas['acertos'], estatisticas['falhas'], estatisticas['resultados']) == (0, 0, 0)
+
+def test_acerto_devolve_uma_copia():
+  primeiro = contar(dados())
+  primeiro['Quantidade'] = 0
+  segundo = contar(dados())
+  assert chamadas == ['x']
+  assert segundo['Quantidade'].tolist() == [2, 1]
+  estatisticas = memo.estatisticas()
+  assert (estatisticas['acertos'], estatisticas['falhas']) == (1, 1)
+
+def test_chave_com_filtros_e_argumentos():
+  contar(dados('a'))
+  contar(dados('b'))
+  contar(dados('a'), coluna='y')
+  contar(dados('a'), coluna='y')
+  assert chamadas == ['x', 'x', 'y']
+  assert memo.estatisticas()['resultados'] == 3
+
+def test_lru_dentro_do_orcamento():
+  # Cada tabela ocupa um pouco mais de 8 KB: cabem duas
+  memo.definir_orcamento(20_000)
+  tabela_grande(dados(), 1000)
+  tabela_grande(dados(), 1001)
+  tabela_grande(dados(), 1000)   # a primeira passa a ser a mais recente
+  tabela_grande(dados(), 1002)   # despeja a de 1001
+  estatisticas = memo.estatisticas()
+  assert estatisticas['despejos'] == 1
+  assert estatisticas['resultados'] == 2
+  assert estatisticas['bytes'] <= 20_000
+  chamadas.clear()
+  tabela_grande(dados(), 1000)
+  tabela_grande(dados(), 1001)
+  assert chamadas == [1001]
+
+def test_resultado_maior_que_o_orcamento_fica_sozinho():
+  memo.definir_orcamento(1_000)
+  tabela_grande(dados(), 1000)
+  estatisticas = memo.estatisticas()
+  assert estatisticas['resultados'] == 1
+  assert estatisticas['bytes'] > 1_000
+
+def test_dicionario_de_arrays_contado_pelos_arrays():
+  indice_espacial(dados())
+  assert memo.estatisticas()['bytes'] >= 2 * 600 * 8
+
+def test_funcao_sobre_outra_guarda_um_resultado():
+  grafico(dados())
+  grafico(dados())
+  assert chamadas == ['x']
+  assert memo.estatisticas()['resultados'] == 1
+  # A tabela chamada diretamente continua memorizada
+  contar(dados())
+  contar(dados())
+  assert chamadas == ['x', 'x']
+  assert memo.estatisticas()['resultados'] == 2
+
+def test_limpar_zera_os_contadores():
+  contar(dados())
+  contar(dados())
+  memo.limpar()
+  estatisticas = memo.estatisticas()
+  assert (estatisticas['acertos'], estatisticas['falhas'], estatisticas['bytes'], estatisticas['resultados']) == (0, 0, 0, 0)
@@ -0,0 +1,96 @@
+#######################################
+# Biblioteca
+#######################################
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import periodos
+
+#######################################
+# Dados
+#######################################
+
+def pedidos(inicio='2021-12-20', fim='2023-01-12'):
+  # Um pedido por dia, atravessando duas viradas de ano, com horários (e alguns vazios)
+  datas = pd.Series(pd.date_range(inicio, fim, freq='D'))
+  horarios = pd.to_timedelta(np.arange(len(datas)) % 24, unit='h').to_series().reset_index(drop=True)
+  horarios[::10] = pd.NaT
+  return pd.DataFrame({
+    'Data do pedido': datas,
+    'Horário do pedido': horarios,
+    'ID do entregador': np.arange(len(datas)) % 5,
+  })
+
+def com_chaves(df):
+  # As chaves criadas na limpeza, como no DataFrame carregado
+  return df.assign(**periodos.chaves_de_tempo(df))
+
+#######################################
+# Testes
+#######################################
+
+def test_semana_igual_ao_strftime():
+  df = pedidos()
+  esperado = df['Data do pedido'].dt.strftime('%Y').astype(int) * 100 + df['Data do pedido'].dt.strftime('%U').astype(int)
+  np.testing.assert_array_equal(periodos.semana_do_pedido(df['Data do pedido']), esperado)
+
+@pytest.mark.parametrize('preparar', [lambda df: df, com_chaves])
+@pytest.mark.parametrize('periodo, tamanho', [('dia', 1), ('dia', 7), ('semana', 1), ('semana', 2), ('semana', 4), ('mes', 1), ('mes', 3), ('hora', 1), ('hora', 6)])
+def test_chave_do_periodo(preparar, periodo, tamanho):
+  df = pedidos()
+  chave = periodos.chave_do_periodo(preparar(df), periodo, tamanho).to_numpy()
+  datas = df['Data do pedido']
+  if periodo == 'dia':
+    esperado = (datas - pd.Timestamp('1970-01-01')).dt.days // tamanho * tamanho
+  elif periodo == 'semana':
+    # Blocos dentro do ano: a semana 52 de um ano e a 0/1 do seguinte nunca se juntam
+    semana = datas.dt.strftime('%U').astype(int)
+    esperado = datas.dt.year * 100 + semana // tamanho * tamanho
+  elif periodo == 'mes':
+    esperado = ((datas.dt.year - 1970) * 12 + datas.dt.month - 1) // tamanho * tamanho
+  else:
+    horas = df['Horário do pedido'].dt.total_seconds() // 3600
+    esperado = np.where(horas.isna(), -1, horas.fillna(0) // tamanho * tamanho)
+  np.testing.assert_array_equal(chave, np.asarray(esperado))
+
+def test_blocos_de_semanas_nao_atravessam_o_ano():
+  df = pedidos('2022-12-18', '2023-01-14')
+  chave = periodos.chave_do_periodo(df, 'semana', 4).to_numpy()
+  np.testing.assert_array_equal(chave // 100, df['Data do pedido'].dt.year)
+  # Semanas 51 (bloco 48), 52 (bloco 52, o último do ano fica incompleto) e 1-2 de 2023 (bloco 0)
+  assert sorted(set(chave)) == [202248, 202252, 202300]
+
+def test_periodo_desconhecido():
+  with pytest.raises(ValueError):
+    periodos.chave_do_periodo(pedidos(), 'ano')
+
+def test_rotulos_das_semanas():
+  assert list(periodos.rotulos_do_periodo([202205, 202206], 'semana')) == ['05', '06']
+  assert list(periodos.rotulos_do_periodo([202252, 202300, 202301], 'semana')) == ['2022-52', '2023-00', '2023-01']
+
+def test_contar_por_periodo_em_varios_anos():
+  df = com_chaves(pedidos())
+  semanas = periodos.contar_por_periodo(df, 'semana')
+  assert semanas['Quantidade'].sum() == len(df)
+  # Rótulos com o ano, sem repetição, em ordem cronológica
+  rotulos = semanas['Semana'].tolist()
+  assert len(set(rotulos)) == len(rotulos)
+  assert rotulos == sorted(rotulos)
+  assert rotulos[0] == '2021-51' and rotulos[-1] == '2023-02'
+
+  meses = periodos.contar_por_periodo(df, 'mes', 3)
+  assert meses['Mês'].tolist() == list(pd.to_datetime(['2021-10-01', '2022-01-01', '2022-04-01', '2022-07-01', '2022-10-01', '2023-01-01']))
+  assert meses['Quantidade'].sum() == len(df)
+
+  # Os pedidos sem horário ficam fora da contagem por hora
+  horas = periodos.contar_por_periodo(df, 'hora', 6)
+  assert horas['Hora do pedido'].tolist() == [0, 6, 12, 18]
+  assert horas['Quantidade'].sum() == df['Horário do pedido'].notna().sum()
+
+def test_distintos_por_periodo():
+  df = com_chaves(pedidos())
+  semanas = periodos.distintos_por_periodo(df, 'ID do entregador', 'semana')
+  esperado = df.groupby(df['Data do pedido'].dt.strftime('%Y-%U'))['ID do entregador'].nunique()
+  np.testing.assert_array_equal(semanas['Quantidade'], esperado.to_numpy())
@@ -0,0 +1,84 @@
+#######################################
+# Biblioteca
+#######################################
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import quantis as qt
+
+#######################################
+# Dados
+#######################################
+
+QUANTIS = (0.1, 0.5, 0.9, 0.99)
+
+def medidas_continuas(linhas=40000, semente=0):
+  # Dois grupos grandes com distribuições diferentes (o t-digest comprime) e um pequeno, com menos de COMPRESSAO / 2 valores (exato)
+  aleatorio = np.random.default_rng(semente)
+  grupos = aleatorio.choice(['A', 'B', 'C'], linhas, p=[0.6, 0.398, 0.002])
+  valores = np.where(grupos == 'A', aleatorio.lognormal(3, 0.5, linhas), aleatorio.normal(20, 4, linhas))
+  valores[aleatorio.random(linhas) < 0.01] = np.nan
+  return pd.DataFrame({'Grupo': pd.Categorical(grupos), 'Valor': valores})
+
+def erro_de_posto(valores, estimativa, q):
+  '''
+  Distância entre q e o posto (entre 0 e 1) da estimativa nos valores.
+  '''
+  valores = np.sort(valores)
+  abaixo = np.searchsorted(valores, estimativa, side='left') / len(valores)
+  ate = np.searchsorted(valores, estimativa, side='right') / len(valores)
+  return max(abaixo - q, q - ate, 0.0)
+
+def limite_do_erro(q, compressao=qt.COMPRESSAO):
+  # Metade da faixa de postos de um centróide (ver quantis.py), com folga para a interpolação
+  return 2 * np.pi * np.sqrt(q * (1 - q)) / compressao / 2 + 2e-3
+
+#######################################
+# Testes
+#######################################
+
+def test_quantis_dentro_do_erro_do_esboco():
+  df = medidas_continuas()
+  esbocos = qt.construir_esbocos(df, ['Grupo'], ['Valor'])
+  resultado = qt.agregar_esbocos(esbocos, ['Grupo'], 'Valor', QUANTIS).set_index('Grupo')
+  for grupo, valores in df.dropna().groupby('Grupo')['Valor']:
+    for q in QUANTIS:
+      assert erro_de_posto(valores.to_numpy(), resultado.loc[grupo, qt.nome_do_quantil(q)], q) <= limite_do_erro(q), (grupo, q)
+
+def test_grupo_pequeno_exato():
+  df = medidas_continuas()
+  esbocos = qt.construir_esbocos(df, ['Grupo'], ['Valor'])
+  resultado = qt.agregar_esbocos(esbocos, ['Grupo'], 'Valor').set_index('Grupo')
+  assert resultado.loc['C', 'Mediana'] == pytest.approx(df.loc[df['Grupo'] == 'C', 'Valor'].median())
+
+def test_quantidade_media_e_desvio_exatos():
+  df = medidas_continuas()
+  esbocos = qt.construir_esbocos(df, ['Grupo'], ['Valor'])
+  resultado = qt.agregar_esbocos(esbocos, ['Grupo'], 'Valor').set_index('Grupo')
+  esperado = df.groupby('Grupo')['Valor'].agg(['count', 'mean', 'std'])
+  np.testing.assert_array_equal(resultado['Quantidade'], esperado['count'])
+  np.testing.assert_allclose(resultado['Média'], esperado['mean'], rtol=1e-9)
+  np.testing.assert_allclose(resultado['Desvio padrão'], esperado['std'], rtol=1e-6)
+
+def test_esbocos_combinados():
+  # Esboços de duas metades juntados valem como o esboço do todo
+  df = medidas_continuas()
+  metade = len(df) // 2
+  combinados = qt.combinar_esbocos(
+    qt.construir_esbocos(df.iloc[:metade], ['Grupo'], ['Valor']),
+    qt.construir_esbocos(df.iloc[metade:], ['Grupo'], ['Valor']))
+  resultado = qt.agregar_esbocos(combinados, [], 'Valor', QUANTIS).iloc[0]
+  valores = df['Valor'].dropna().to_numpy()
+  assert resultado['Quantidade'] == len(valores)
+  for q in QUANTIS:
+    assert erro_de_posto(valores, resultado[qt.nome_do_quantil(q)], q) <= limite_do_erro(q), q
+
+def test_medianas_exatas_com_poucos_valores_distintos(dados_limpos):
+  # Tempo em minutos e avaliação têm poucos valores distintos: as medianas são as do pandas
+  esbocos = qt.construir_esbocos(dados_limpos)
+  for medida in ['Tempo de entrega (min)', 'Avaliação do entregador']:
+    resultado = qt.agregar_esbocos(esbocos, ['Tipo de área'], medida).set_index('Tipo de área')['Mediana']
+    esperado = dados_limpos.groupby('Tipo de área')[medida].median()
+    np.testing.assert_allclose(resultado.loc[esperado.index].to_numpy(), esperado.to_numpy(), err_msg=medida)
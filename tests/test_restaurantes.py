@@ -0,0 +1,80 @@
+#######################################
+# Biblioteca
+#######################################
+
+import numpy as np
+import pytest
+
+import grade_espacial as grade
+import restaurantes as rs
+from distancias import distancia_haversine
+
+#######################################
+# Centros das buscas
+#######################################
+# Pontos aleatórios na região dos dados e as posições de alguns
+# restaurantes (e, nas entregas, de alguns pedidos), com raios de menos de
+# uma célula a vários graus.
+#######################################
+
+RAIOS = [0.5, 5.0, 30.0, 300.0]
+
+FILTROS = {
+  'Densidade de tráfego': ['Baixo', 'Alto'],
+  'Tipo de área': ['Urbana', 'Metropolitana'],
+}
+
+def centros(restaurantes, semente=0):
+  aleatorio = np.random.default_rng(semente)
+  pontos = list(zip(aleatorio.uniform(9, 31, 5), aleatorio.uniform(9, 31, 5)))
+  return pontos + list(restaurantes[['Latitude', 'Longitude']].iloc[::60].itertuples(index=False, name=None))
+
+def no_raio(latitudes, longitudes, latitude, longitude, raio_km):
+  distancia = distancia_haversine(latitude, longitude, np.asarray(latitudes, np.float64), np.asarray(longitudes, np.float64))
+  return distancia <= raio_km
+
+#######################################
+# Testes
+#######################################
+
+@pytest.mark.parametrize('raio_km', RAIOS)
+def test_restaurantes_no_raio_igual_a_forca_bruta(dados_limpos, raio_km):
+  restaurantes = rs.obter_restaurantes(dados_limpos)
+  indice = rs.obter_indice(dados_limpos, 'dimensao')
+  for latitude, longitude in centros(restaurantes):
+    encontrados = rs.restaurantes_no_raio(restaurantes, latitude, longitude, raio_km, indice)
+    esperados = restaurantes[no_raio(restaurantes['Latitude'], restaurantes['Longitude'], latitude, longitude, raio_km)]
+    assert set(encontrados.index) == set(esperados.index)
+    assert encontrados['Distância do ponto (km)'].is_monotonic_increasing
+
+@pytest.mark.parametrize('local', ['entrega', 'restaurante'])
+@pytest.mark.parametrize('raio_km', RAIOS)
+def test_entregas_no_raio_igual_a_forca_bruta(dados_limpos, local, raio_km):
+  df = dados_limpos
+  coluna_da_latitude, coluna_da_longitude = grade.COORDENADAS[local]
+  selecao = np.ones(len(df), dtype=bool)
+  for dimensao, valores in FILTROS.items():
+    selecao &= df[dimensao].isin(valores).to_numpy()
+  # Também em volta dos próprios pontos, onde os raios pequenos encontram entregas
+  pontos = list(df[[coluna_da_latitude, coluna_da_longitude]].astype(float).iloc[::300].itertuples(index=False, name=None))
+  for latitude, longitude in centros(rs.obter_restaurantes(df)) + pontos:
+    perto = no_raio(df[coluna_da_latitude], df[coluna_da_longitude], latitude, longitude, raio_km)
+    encontradas = rs.entregas_no_raio(df, latitude, longitude, raio_km, local=local)
+    assert list(encontradas.index) == list(df.index[perto])
+    filtradas = rs.entregas_no_raio(df, latitude, longitude, raio_km, FILTROS, local)
+    assert list(filtradas.index) == list(df.index[perto & selecao])
+
+def test_entregas_do_restaurante(dados_limpos):
+  df = dados_limpos
+  celulas = rs.celulas_dos_restaurantes(df)
+  restaurantes = rs.obter_restaurantes(df)
+  assert restaurantes['Pedidos'].sum() == len(df)
+  for restaurante in restaurantes.index[::25]:
+    mesma_celula = celulas == rs.celula_do_restaurante(restaurante)
+    entregas = rs.entregas_do_restaurante(df, restaurante)
+    assert list(entregas.index) == list(df.index[mesma_celula])
+    assert len(entregas) == restaurantes.loc[restaurante, 'Pedidos']
+
+def test_id_invalido():
+  with pytest.raises(ValueError):
+    rs.celula_do_restaurante('X123')
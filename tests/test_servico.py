@@ -0,0 +1,139 @@
+#######################################
+# Biblioteca
+#######################################
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import servico
+
+#######################################
+# Leitura dos pedidos
+#######################################
+# Os parâmetros chegam como em urllib.parse.parse_qs: {nome: [valores]}.
+#######################################
+
+def test_pedido_sem_parametros():
+  filtros, argumentos = servico.ler_pedido('pedidos_por_tipo_de_trafego', {})
+  assert argumentos == {}
+  # Sem filtro na URL, a dimensão fica com todas as opções
+  assert filtros == {dimensao: list(valores) for dimensao, valores in servico.paineis.OPCOES_DOS_FILTROS.items()}
+
+def test_pedido_convertido():
+  filtros, argumentos = servico.ler_pedido('celulas_no_mapa', {
+    'trafego': ['Baixo,Alto'], 'zoom': ['3', '7'], 'limites': ['10,20,11,21'], 'local': ['restaurante']})
+  assert filtros['Densidade de tráfego'] == ['Baixo', 'Alto']
+  # O último valor repetido vale
+  assert argumentos == {'zoom': 7, 'limites': (10.0, 20.0, 11.0, 21.0), 'local': 'restaurante'}
+
+  _, argumentos = servico.ler_pedido('restaurantes_no_raio', {'latitude': ['12.5'], 'longitude': ['-3'], 'raio_km': ['2']})
+  assert argumentos == {'latitude': 12.5, 'longitude': -3.0, 'raio_km': 2.0}
+
+  _, argumentos = servico.ler_pedido('percentis_do_tempo_de_entrega_por_tipo_de_trafego', {'quantis': ['0.25,0.75']})
+  assert argumentos == {'quantis': (0.25, 0.75)}
+
+@pytest.mark.parametrize('consulta, parametros, mensagem', [
+  ('pedidos_por_tipo_de_trafego', {'cidade': ['Rio']}, 'parâmetro desconhecido'),
+  ('pedidos_por_tipo_de_trafego', {'zoom': ['5']}, 'parâmetro desconhecido'),
+  ('pedidos_por_tipo_de_trafego', {'area': ['']}, 'nenhum valor para area'),
+  ('pedidos_por_tipo_de_trafego', {'area': [',']}, 'nenhum valor para area'),
+  ('pedidos_por_tipo_de_trafego', {'area': ['Urbana,Rural']}, 'valores inválidos para area: Rural'),
+  ('restaurantes_no_raio', {}, 'parâmetros obrigatórios ausentes: latitude, longitude'),
+  ('restaurantes_no_raio', {'latitude': ['12']}, 'parâmetros obrigatórios ausentes: longitude'),
+  ('restaurantes_no_raio', {'latitude': ['100'], 'longitude': ['0']}, 'valor inválido para latitude'),
+  ('restaurantes_no_raio', {'latitude': ['0'], 'longitude': ['0'], 'raio_km': ['0']}, 'valor inválido para raio_km'),
+  ('celulas_no_mapa', {'zoom': ['25']}, 'valor inválido para zoom'),
+  ('celulas_no_mapa', {'limites': ['1,2,3']}, 'valor inválido para limites'),
+  ('celulas_no_mapa', {'modo': ['Satélite']}, 'valor inválido para modo'),
+  ('percentis_do_tempo_de_entrega_por_tipo_de_trafego', {'quantis': ['0.5,1']}, 'valor inválido para quantis'),
+  ('ranking_de_entregadores', {'n': ['0']}, 'valor inválido para n'),
+])
+def test_pedido_recusado(consulta, parametros, mensagem):
+  with pytest.raises(ValueError, match=mensagem):
+    servico.ler_pedido(consulta, parametros)
+
+def test_pedido_com_tipo_errado():
+  # Texto onde se espera um número: o ValueError da conversão
+  with pytest.raises(ValueError):
+    servico.ler_pedido('celulas_no_mapa', {'zoom': ['perto']})
+
+#######################################
+# Servidor
+#######################################
+
+@pytest.fixture(scope='module')
+def url_do_servico(arquivo_bruto, tmp_path_factory):
+  '''
+  Endereço de um serviço numa porta livre, com o cache dos dados num diretório temporário.
+  '''
+  with pytest.MonkeyPatch.context() as patch:
+    patch.chdir(tmp_path_factory.mktemp('servico'))
+    servidor = servico.servir('127.0.0.1', 0, arquivo_bruto)
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:{}'.format(servidor.server_address[1])
+    servidor.shutdown()
+    servidor.server_close()
+
+def pedir(url, **cabecalhos):
+  '''
+  (situação, cabeçalhos, corpo) de um GET, inclusive nas respostas de erro.
+  '''
+  try:
+    with urllib.request.urlopen(urllib.request.Request(url, headers=cabecalhos)) as resposta:
+      return resposta.status, resposta.headers, resposta.read()
+  except urllib.error.HTTPError as erro:
+    with erro:
+      return erro.code, erro.headers, erro.read()
+
+def test_lista_de_consultas(url_do_servico):
+  situacao, _, corpo = pedir(url_do_servico + '/consultas')
+  assert situacao == 200
+  assert json.loads(corpo) == json.loads(json.dumps(servico.CONSULTAS))
+
+@pytest.mark.parametrize('caminho', ['/consultas/desconhecida', '/outro', '/consultas/pedidos_por_tipo_de_trafego/mais'])
+def test_caminho_desconhecido(url_do_servico, caminho):
+  situacao, _, corpo = pedir(url_do_servico + caminho)
+  assert situacao == 404
+  assert 'erro' in json.loads(corpo)
+
+@pytest.mark.parametrize('consulta', [
+  'pedidos_por_tipo_de_trafego?area=',
+  'pedidos_por_tipo_de_trafego?area=Rural',
+  'pedidos_por_tipo_de_trafego?cidade=Rio',
+  'restaurantes_no_raio?latitude=12',
+  'celulas_no_mapa?zoom=perto',
+])
+def test_pedido_invalido(url_do_servico, consulta):
+  situacao, _, corpo = pedir(url_do_servico + '/consultas/' + consulta)
+  assert situacao == 400
+  assert json.loads(corpo)['erro']
+
+def test_etag_e_304(url_do_servico):
+  url = url_do_servico + '/consultas/pedidos_por_tipo_de_trafego?area=Urbana,Metropolitana'
+  situacao, cabecalhos, corpo = pedir(url)
+  assert situacao == 200
+  resposta = json.loads(corpo)
+  assert resposta['filtros']['Tipo de área'] == ['Urbana', 'Metropolitana']
+  assert sum(linha['ID da entrega'] for linha in resposta['resultado']) == resposta['linhas_selecionadas']
+  etag = cabecalhos['ETag']
+
+  # A mesma pergunta com o ETag recebe 304, sem corpo
+  situacao, cabecalhos, corpo = pedir(url, **{'If-None-Match': etag})
+  assert (situacao, cabecalhos['ETag'], corpo) == (304, etag, b'')
+  # Um ETag antigo recebe o corpo de novo
+  situacao, _, corpo = pedir(url, **{'If-None-Match': '"antigo"'})
+  assert situacao == 200 and json.loads(corpo) == resposta
+
+  # Outros filtros, outro ETag
+  _, cabecalhos, _ = pedir(url_do_servico + '/consultas/pedidos_por_tipo_de_trafego?area=Urbana')
+  assert cabecalhos['ETag'] != etag
+
+def test_metricas(url_do_servico):
+  situacao, cabecalhos, _ = pedir(url_do_servico + '/metricas')
+  assert situacao == 200
+  assert cabecalhos['Content-Type'].startswith('text/plain')